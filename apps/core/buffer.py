@@ -0,0 +1,208 @@
+"""
+Write-behind buffering for hot-path inserts.
+
+Events are queued in memory per worker process and handed to a flush
+function in batches, either when the buffer reaches ``max_size`` or when the
+oldest event is ``max_delay`` seconds old. Batches that fail to flush are
+spooled to JSON-lines files and replayed later, so a database hiccup does
+not lose events. Remaining events are flushed when the process exits.
+
+A spooled batch that still fails on replay is retried event by event;
+events that fail on their own (e.g. a scan of a QR code deleted since) are
+moved to a ``.failed`` file for inspection instead of blocking the spool.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    In-process buffer that flushes JSON-serialisable events in batches.
+
+    Args:
+        name: Buffer name, used for spool file names and logging
+        flush_func: Called with a list of events; must write them all or raise
+        max_size: Flush as soon as this many events are queued
+        max_delay: Flush events at the latest after this many seconds
+        spool_dir: Directory for batches that could not be flushed
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: Callable[[List[dict]], None],
+        max_size: int = 200,
+        max_delay: float = 2.0,
+        spool_dir: Optional[str] = None,
+    ):
+        self.name = name
+        self.flush_func = flush_func
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.spool_dir = spool_dir
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._events: List[dict] = []
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+        atexit.register(self.flush)
+
+    def add(self, event: dict) -> None:
+        """Queue ``event``; flushes inline when the buffer is full."""
+        self._ensure_thread()
+        with self._lock:
+            self._events.append(event)
+            full = len(self._events) >= self.max_size
+        if full:
+            self.flush()
+        else:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write all queued events now.
+
+        Returns:
+            Number of events taken from the buffer
+        """
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+            try:
+                self.flush_func(events)
+            except Exception as e:
+                logger.error(f"{self.name}: flush of {len(events)} events failed: {e}")
+                self._spool(events)
+            return len(events)
+
+    def replay_spool(self) -> int:
+        """
+        Flush batches spooled by earlier failures.
+
+        Each file is claimed by renaming it first, so several processes can
+        replay the same directory. Replay only stops early while the
+        database is unreachable.
+
+        Returns:
+            Number of events written
+        """
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return 0
+
+        written = 0
+        prefix = f"{self.name}-"
+        for filename in sorted(os.listdir(self.spool_dir)):
+            if not (filename.startswith(prefix) and filename.endswith(".jsonl")):
+                continue
+            path = os.path.join(self.spool_dir, filename)
+            claimed = f"{path}.{os.getpid()}.replaying"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # Taken by another process
+
+            with open(claimed) as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            try:
+                self.flush_func(events)
+            except Exception as e:
+                logger.error(f"{self.name}: replay of {filename} failed: {e}")
+                if not self._database_available():
+                    os.rename(claimed, path)
+                    break
+                written += self._replay_one_by_one(events, path)
+            else:
+                written += len(events)
+            os.remove(claimed)
+        return written
+
+    def _replay_one_by_one(self, events: List[dict], path: str) -> int:
+        """Write events singly; quarantine those that fail on their own."""
+        failed = []
+        for event in events:
+            try:
+                self.flush_func([event])
+            except Exception as e:
+                logger.error(f"{self.name}: event in {path} failed: {e}")
+                failed.append(event)
+        if failed:
+            self._write_jsonl(f"{path}.failed", failed)
+            logger.error(
+                f"{self.name}: {len(failed)} of {len(events)} events moved to "
+                f"{path}.failed"
+            )
+        return len(events) - len(failed)
+
+    @staticmethod
+    def _database_available() -> bool:
+        try:
+            with connections["default"].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _spool(self, events: List[dict]) -> None:
+        if not self.spool_dir:
+            logger.error(f"{self.name}: no spool directory, {len(events)} events lost")
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        filename = f"{self.name}-{time.time():.6f}-{uuid.uuid4().hex[:8]}.jsonl"
+        self._write_jsonl(os.path.join(self.spool_dir, filename), events)
+
+    @staticmethod
+    def _write_jsonl(path: str, events: List[dict]) -> None:
+        """Write ``events`` to ``path`` atomically (temporary file, then rename)."""
+        directory, filename = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{filename}")
+        with open(tmp_path, "w") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _ensure_thread(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            if self._pid is not None and self._pid != pid:
+                # Forked: the parent's events and thread don't belong to us
+                self._events = []
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.max_delay)
+            self._wakeup.clear()
+            try:
+                if self.flush():
+                    self.replay_spool()
+            except Exception as e:
+                logger.error(f"{self.name}: background flush failed: {e}")
+            finally:
+                connections.close_all()
@@ -0,0 +1,199 @@
+"""
+Circuit breaker for calls to external providers.
+
+State lives in the default cache, so all worker processes trip and recover
+together:
+
+- closed: calls go through. Outcomes are counted in time buckets over the
+  last ``WINDOW`` seconds; a call is a failure if it raised, returned a
+  provider error (5xx) or took longer than ``SLOW_CALL`` seconds. Once at
+  least ``MIN_CALLS`` calls were made and the failure share reaches
+  ``FAILURE_RATE``, the breaker opens.
+- open: calls fail fast for ``OPEN_SECONDS``.
+- half-open: after that, a single probe call is let through (claimed with
+  ``cache.add``). Success closes the breaker, failure opens it again.
+
+Settings are read per call as ``<PREFIX>_<NAME>``, e.g.
+``ESKIZ_BREAKER_FAILURE_RATE``.
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "breaker:"
+BUCKETS_PER_WINDOW = 6
+
+DEFAULTS = {
+    "FAILURE_RATE": 0.5,
+    "MIN_CALLS": 10,
+    "WINDOW": 60,
+    "OPEN_SECONDS": 30,
+    "SLOW_CALL": 5.0,
+}
+
+_registry: Dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitOpen(Exception):
+    """Raised (or reported) when a call is refused by an open breaker."""
+
+
+class CircuitBreaker:
+    """
+    Shared circuit breaker.
+
+    Args:
+        name: Breaker name, used in cache keys and metrics
+        settings_prefix: Prefix of the settings that tune this breaker
+    """
+
+    def __init__(self, name: str, settings_prefix: str):
+        self.name = name
+        self.settings_prefix = settings_prefix
+        self._key = f"{KEY_PREFIX}{name}"
+
+        self.trips = Counter(
+            f"breaker.{name}.trips", f"Times the {name} breaker opened"
+        )
+        self.rejected = Counter(
+            f"breaker.{name}.rejected", f"Calls refused by the open {name} breaker"
+        )
+        self.probes = Counter(
+            f"breaker.{name}.probes", f"Half-open probe calls to {name}"
+        )
+        _registry[name] = self
+
+    def _setting(self, name: str):
+        return getattr(settings, f"{self.settings_prefix}_{name}", DEFAULTS[name])
+
+    # Public API
+
+    def allow(self) -> bool:
+        """Whether a call may be made now (False means fail fast)."""
+        opened = cache.get(f"{self._key}:open")
+        if opened is None:
+            return True
+
+        if time.time() - opened < self._setting("OPEN_SECONDS"):
+            self.rejected.increment()
+            return False
+
+        # Half-open: exactly one worker gets to probe
+        if cache.add(f"{self._key}:probe", 1, timeout=self._setting("OPEN_SECONDS")):
+            self.probes.increment()
+            logger.info(f"Circuit {self.name}: half-open, probing")
+            return True
+        self.rejected.increment()
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until a probe may be made (0 when closed or half-open)."""
+        opened = cache.get(f"{self._key}:open")
+        if opened is None:
+            return 0.0
+        return max(0.0, opened + self._setting("OPEN_SECONDS") - time.time())
+
+    def is_open(self) -> bool:
+        """Whether calls are being refused outright (does not claim a probe)."""
+        return self.retry_after() > 0
+
+    def record(self, success: bool, duration: float = 0.0) -> None:
+        """Record the outcome of a call made after ``allow()``."""
+        failed = not success or duration > self._setting("SLOW_CALL")
+
+        if cache.get(f"{self._key}:open") is not None:
+            # Result of the half-open probe
+            if failed:
+                self._open()
+            else:
+                self._close()
+            return
+
+        self._count("calls")
+        if failed:
+            self._count("failures")
+            calls, failures = self._window_totals()
+            if calls >= self._setting(
+                "MIN_CALLS"
+            ) and failures / calls >= self._setting("FAILURE_RATE"):
+                self._open()
+
+    def status(self) -> Dict:
+        """Current state and window counts, for monitoring."""
+        opened = cache.get(f"{self._key}:open")
+        calls, failures = self._window_totals()
+        if opened is None:
+            state = "closed"
+        elif time.time() - opened < self._setting("OPEN_SECONDS"):
+            state = "open"
+        else:
+            state = "half_open"
+        return {
+            "state": state,
+            "opened_at": opened,
+            "window_calls": calls,
+            "window_failures": failures,
+            "failure_rate": round(failures / calls, 3) if calls else 0.0,
+        }
+
+    def reset(self) -> None:
+        self._close()
+
+    # Internals
+
+    def _bucket_keys(self, kind: str) -> List[str]:
+        size = self._setting("WINDOW") / BUCKETS_PER_WINDOW
+        current = int(time.time() // size)
+        return [
+            f"{self._key}:{kind}:{bucket}"
+            for bucket in range(current - BUCKETS_PER_WINDOW + 1, current + 1)
+        ]
+
+    def _count(self, kind: str) -> None:
+        key = self._bucket_keys(kind)[-1]
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=int(self._setting("WINDOW")) * 2):
+                cache.incr(key)
+
+    def _window_totals(self):
+        call_keys = self._bucket_keys("calls")
+        failure_keys = self._bucket_keys("failures")
+        values = cache.get_many(call_keys + failure_keys)
+        calls = sum(values.get(key, 0) for key in call_keys)
+        failures = sum(values.get(key, 0) for key in failure_keys)
+        return calls, failures
+
+    def _open(self) -> None:
+        cache.set(f"{self._key}:open", time.time(), timeout=None)
+        cache.delete(f"{self._key}:probe")
+        self.trips.increment()
+        logger.warning(
+            f"Circuit {self.name}: open for {self._setting('OPEN_SECONDS')}s"
+        )
+
+    def _close(self) -> None:
+        cache.delete_many(
+            [f"{self._key}:open", f"{self._key}:probe"]
+            + self._bucket_keys("calls")
+            + self._bucket_keys("failures")
+        )
+        logger.info(f"Circuit {self.name}: closed")
+
+
+def get_breaker(name: str) -> Optional[CircuitBreaker]:
+    return _registry.get(name)
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Status of every registered breaker."""
+    return {name: breaker.status() for name, breaker in sorted(_registry.items())}
@@ -0,0 +1,159 @@
+"""
+File downloads handed to the reverse proxy.
+
+Views check permissions and then call ``send_file``:
+
+- With ``DOWNLOADS_ACCEL_REDIRECT`` enabled (production behind nginx) the
+  response has no body, only an ``X-Accel-Redirect`` header pointing at the
+  internal ``DOWNLOADS_ACCEL_PREFIX`` location (``/protected/``, an alias of
+  MEDIA_ROOT). nginx sends the file itself, with Range and conditional
+  request support, and the gunicorn worker is free at once.
+- Otherwise (development, runserver) Django sends the file, answering
+  ``Range``/``If-Range``, ``If-None-Match`` and ``If-Modified-Since``, so
+  interrupted downloads can be resumed there too.
+"""
+
+import os
+import re
+from typing import Iterator, Optional
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_http_date_safe,
+)
+
+BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def accel_redirect_enabled() -> bool:
+    return getattr(settings, "DOWNLOADS_ACCEL_REDIRECT", False)
+
+
+def file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[tuple]:
+    """
+    First and last byte of a single-range ``Range`` header.
+
+    Returns:
+        (start, end) tuple, None for a header we do not handle (multiple
+        ranges, other units; the whole file is sent), or () if the range
+        cannot be satisfied
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return ()
+    return start, end
+
+
+def _if_range_matches(request, etag: str, mtime: float) -> bool:
+    """Whether a Range request may be answered partially (RFC 9110 13.1.5)."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    modified = parse_http_date_safe(if_range)
+    return modified is not None and int(mtime) <= modified
+
+
+def _read_range(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def _accel_response(path: str) -> HttpResponse:
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    relative = os.path.relpath(os.path.realpath(path), media_root)
+    if relative.startswith(".."):
+        raise ValueError(f"{path} is outside MEDIA_ROOT")
+    prefix = getattr(settings, "DOWNLOADS_ACCEL_PREFIX", "/protected/")
+    response = HttpResponse()
+    response["X-Accel-Redirect"] = prefix + quote(relative.replace(os.sep, "/"))
+    return response
+
+
+def _python_response(request, path: str) -> HttpResponse:
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    # 304 for If-None-Match / If-Modified-Since, 412 for If-Match
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if request.headers.get("Range") and _if_range_matches(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers["Range"], size)
+
+    if byte_range == ():
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_read_range(path, start, length), status=206)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+    else:
+        # FileResponse uses wsgi.file_wrapper (sendfile) where available
+        response = FileResponse(open(path, "rb"))
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def send_file(
+    request, path: str, filename: Optional[str] = None, content_type: str = None
+) -> HttpResponse:
+    """
+    Response that downloads the file at ``path`` (inside MEDIA_ROOT).
+
+    Permissions must be checked by the caller; the file must exist.
+
+    Args:
+        request: The request, for Range and conditional headers
+        path: Absolute file path
+        filename: Download name (default: the file's own name)
+        content_type: MIME type (default: application/octet-stream)
+    """
+    if accel_redirect_enabled():
+        response = _accel_response(path)
+    else:
+        response = _python_response(request, path)
+
+    if response.status_code in (200, 206):
+        response["Content-Type"] = content_type or "application/octet-stream"
+        response["Content-Disposition"] = content_disposition_header(
+            True, filename or os.path.basename(path)
+        )
+    return response
@@ -0,0 +1,234 @@
+"""
+Shared outbound HTTP client.
+
+All calls to external services (Eskiz, Telegram) go through this module:
+
+- One ``requests.Session`` per host and process, so connections are kept
+  alive and TCP/TLS handshakes are paid once instead of per message.
+- Explicit (connect, read) timeouts, optionally capped by a ``Deadline``
+  that a request handler passes down to bound the total time it spends on
+  outbound calls.
+- Connect time (TCP + TLS) and transfer time are measured per call and
+  added to the shared metrics.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+_timing = threading.local()
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The time budget of a request ran out before an outbound call."""
+
+
+class Deadline:
+    """
+    Time budget shared by several outbound calls.
+
+    Each call gets at most the remaining budget as its connect and read
+    timeout. Read timeouts apply per socket read, so a slow trickle can
+    overrun the budget slightly; a call never starts once it is spent.
+    """
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def for_request(cls) -> "Deadline":
+        """Budget for the outbound calls made while serving one API request."""
+        return cls(getattr(settings, "HTTP_REQUEST_BUDGET", 8.0))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def limit(self, connect: float, read: float) -> Tuple[float, float]:
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Outbound request budget exhausted")
+        return min(connect, remaining), min(read, remaining)
+
+
+def _add_connect_time(seconds: float) -> None:
+    _timing.connect = getattr(_timing, "connect", 0.0) + seconds
+    _timing.connections = getattr(_timing, "connections", 0) + 1
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Includes the TLS handshake
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class _HostMetrics:
+    def __init__(self, host: str):
+        self.requests = Counter(f"http.{host}.requests", f"Requests to {host}")
+        self.errors = Counter(f"http.{host}.errors", f"Failed requests to {host}")
+        self.connections = Counter(
+            f"http.{host}.connections", f"New connections to {host}"
+        )
+        self.connect_ms = Counter(
+            f"http.{host}.connect_ms", f"Time spent connecting to {host} (TCP+TLS)"
+        )
+        self.transfer_ms = Counter(
+            f"http.{host}.transfer_ms", f"Time spent sending and receiving on {host}"
+        )
+
+
+_sessions: Dict[str, requests.Session] = {}
+_metrics: Dict[str, _HostMetrics] = {}
+_sessions_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """Pooled keep-alive session for the host of ``url``."""
+    global _sessions_pid
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+
+    with _lock:
+        if _sessions_pid != os.getpid():
+            # Sockets must not be shared with the parent after a fork
+            _sessions.clear()
+            _sessions_pid = os.getpid()
+
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = _TimedAdapter(
+                pool_connections=1,
+                pool_maxsize=getattr(settings, "HTTP_POOL_MAXSIZE", 10),
+                max_retries=0,
+            )
+            session.mount(f"{parts.scheme}://", adapter)
+            _sessions[key] = session
+    return session
+
+
+def _get_metrics(host: str) -> _HostMetrics:
+    metrics = _metrics.get(host)
+    if metrics is None:
+        metrics = _metrics[host] = _HostMetrics(host)
+    return metrics
+
+
+def request(
+    method: str,
+    url: str,
+    deadline: Optional[Deadline] = None,
+    timeout: Optional[Tuple[float, float]] = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Send a request through the pooled session of the target host.
+
+    Args:
+        method: HTTP method
+        url: Full URL
+        deadline: Budget shared with other calls; caps the timeouts
+        timeout: (connect, read) timeouts in seconds, defaults from settings
+        **kwargs: Passed to ``requests.Session.request``
+
+    Returns:
+        The response, with ``connect_time`` and ``transfer_time`` (seconds)
+        attributes set
+
+    Raises:
+        DeadlineExceeded: The deadline expired before the call
+        requests.RequestException: The call failed
+    """
+    connect_timeout, read_timeout = timeout or (
+        getattr(settings, "HTTP_CONNECT_TIMEOUT", 3.0),
+        getattr(settings, "HTTP_READ_TIMEOUT", 10.0),
+    )
+    if deadline is not None:
+        connect_timeout, read_timeout = deadline.limit(connect_timeout, read_timeout)
+
+    host = urlsplit(url).hostname or "unknown"
+    metrics = _get_metrics(host)
+    session = get_session(url)
+
+    _timing.connect = 0.0
+    _timing.connections = 0
+    started = time.perf_counter()
+    try:
+        response = session.request(
+            method, url, timeout=(connect_timeout, read_timeout), **kwargs
+        )
+    except requests.RequestException:
+        metrics.errors.increment()
+        raise
+    finally:
+        total = time.perf_counter() - started
+        connect_time = _timing.connect
+        metrics.requests.increment()
+        if _timing.connections:
+            metrics.connections.increment(_timing.connections)
+            metrics.connect_ms.increment(int(connect_time * 1000))
+        metrics.transfer_ms.increment(int((total - connect_time) * 1000))
+
+    response.connect_time = connect_time
+    response.transfer_time = total - connect_time
+    logger.debug(
+        f"{method} {host}: {response.status_code} "
+        f"connect={connect_time * 1000:.0f}ms "
+        f"transfer={response.transfer_time * 1000:.0f}ms"
+    )
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,323 @@
+"""
+Pluggable primary key allocation for models using GapFillingIDMixin.
+
+Available strategies:
+
+- ``scan``: legacy behaviour, reads every existing ID and returns the first
+  gap. O(n) per insert, kept for comparison and small tables.
+- ``sequence``: database sequence (PostgreSQL ``nextval``). O(1), never
+  reuses IDs.
+- ``gap_reuse``: pops the smallest ID from a free-list table maintained on
+  delete, falls back to the sequence when the free-list is empty.
+- ``time_ordered``: 64-bit time-ordered IDs (timestamp + node + counter).
+  Requires a BigIntegerField primary key; GapFillingIDMixin declares a
+  32-bit one, so a model opts in by overriding ``id`` (ScanLog does).
+
+The strategy is declared on the model (``id_strategy`` attribute) and can be
+overridden per model with ``settings.ID_ALLOCATION_STRATEGIES``, e.g.
+``{"scans.ScanLog": "sequence"}``.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Set
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Max
+
+DEFAULT_STRATEGY = "gap_reuse"
+
+
+def sequence_name(model) -> str:
+    """Name of the PostgreSQL sequence backing IDs of ``model``."""
+    return f"{model._meta.db_table}_idalloc_seq"
+
+
+def _is_postgres() -> bool:
+    return connection.vendor == "postgresql"
+
+
+class IDStrategy:
+    """Base class for ID allocation strategies."""
+
+    name = ""
+
+    def allocate(self, model) -> int:
+        """Return a single free ID for ``model``."""
+        return self.allocate_many(model, 1)[0]
+
+    def allocate_many(self, model, count: int) -> List[int]:
+        """Return ``count`` free IDs for ``model`` in ascending order."""
+        raise NotImplementedError
+
+    def release(self, model, ids: Iterable[int]) -> None:
+        """Called after rows of ``model`` were deleted."""
+        return None
+
+
+class ScanStrategy(IDStrategy):
+    """
+    Legacy strategy: load all IDs into memory and walk upwards to the first gap.
+
+    For House, IDs still referenced by QRCode.house_id are treated as used.
+    """
+
+    name = "scan"
+
+    def allocate_many(self, model, count: int) -> List[int]:
+        used_ids = set(model.objects.values_list("id", flat=True))
+        used_ids |= model.get_reserved_ids()
+
+        result = []
+        candidate = 1
+        while len(result) < count:
+            if candidate not in used_ids:
+                result.append(candidate)
+            candidate += 1
+        return result
+
+
+class SequenceStrategy(IDStrategy):
+    """
+    Allocate IDs from a database sequence.
+
+    On PostgreSQL each model has its own sequence (created by the core app's
+    post_migrate handler). ``nextval`` is non-transactional, so concurrent
+    inserts never wait on each other. Other databases (SQLite in development)
+    fall back to ``MAX(id) + 1``.
+    """
+
+    name = "sequence"
+
+    _synced: Set[str] = set()
+    _lock = threading.Lock()
+
+    def allocate_many(self, model, count: int) -> List[int]:
+        if not _is_postgres():
+            queryset = model.objects.all()
+            if model.id_sequence_max:
+                queryset = queryset.filter(id__lte=model.id_sequence_max)
+            current = queryset.aggregate(max_id=Max("id"))["max_id"] or 0
+            ids = list(range(current + 1, current + 1 + count))
+        else:
+            self.sync(model)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(%s) FROM generate_series(1, %s)",
+                    [sequence_name(model), count],
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+
+        # Skip IDs that are still referenced elsewhere (House <- QRCode).
+        reserved = model.get_reserved_ids(ids)
+        if reserved:
+            ids = [value for value in ids if value not in reserved]
+            ids += self.allocate_many(model, count - len(ids))
+        return sorted(ids)
+
+    @classmethod
+    def ensure_sequence(cls, model, cursor) -> None:
+        """Create the sequence for ``model`` and move it past the current MAX(id)."""
+        quote_name = cursor.db.ops.quote_name
+        name = sequence_name(model)
+
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {quote_name(name)}")
+        max_query = (
+            f"SELECT COALESCE(MAX(id), 0) FROM {quote_name(model._meta.db_table)}"
+        )
+        params = []
+        if model.id_sequence_max:
+            # Ignore outliers above the sequence range (e.g. random claim IDs)
+            max_query += " WHERE id <= %s"
+            params.append(model.id_sequence_max)
+        cursor.execute(max_query, params)
+        max_id = cursor.fetchone()[0]
+        cursor.execute(f"SELECT last_value, is_called FROM {quote_name(name)}")
+        last_value, is_called = cursor.fetchone()
+        current = last_value if is_called else last_value - 1
+
+        # Only ever move the sequence forward; setval is non-transactional.
+        if max_id > current:
+            cursor.execute("SELECT setval(%s, %s, true)", [name, max_id])
+
+    def sync(self, model) -> None:
+        """Sync the sequence once per process (covers rows inserted with explicit IDs)."""
+        label = model._meta.label
+        if label in self._synced:
+            return
+        with self._lock:
+            if label in self._synced:
+                return
+            with connection.cursor() as cursor:
+                self.ensure_sequence(model, cursor)
+            self._synced.add(label)
+
+
+class GapReuseStrategy(IDStrategy):
+    """
+    Reuse IDs of deleted rows through a free-list table.
+
+    Allocation pops the smallest released IDs with ``SELECT ... FOR UPDATE
+    SKIP LOCKED`` so concurrent inserts do not block each other. Released IDs
+    that are still reserved (``get_reserved_ids``) are skipped but stay in
+    the free-list. When the free-list is empty, new IDs come from the
+    model's sequence.
+
+    Popping runs in a nested transaction: called inside the transaction of
+    the insert (as ``GapFillingIDMixin.save`` does), popped IDs return to
+    the free-list if that transaction rolls back.
+    """
+
+    name = "gap_reuse"
+
+    def __init__(self):
+        self.fallback = SequenceStrategy()
+
+    def allocate_many(self, model, count: int) -> List[int]:
+        from apps.core.models import ReleasedID
+
+        label = model._meta.label
+        ids = []
+        # Free-list rows of IDs that are still referenced; they stay listed
+        # until the reference is gone.
+        skipped = []
+        with transaction.atomic():
+            while len(ids) < count:
+                released = list(
+                    ReleasedID.objects.select_for_update(skip_locked=True)
+                    .filter(model_label=label)
+                    .exclude(pk__in=skipped)
+                    .order_by("value")
+                    .values_list("pk", "value")[: count - len(ids)]
+                )
+                if not released:
+                    break
+
+                values = [value for _, value in released]
+                # IDs re-used explicitly leave the free-list for good.
+                taken = set(
+                    model.objects.filter(id__in=values).values_list("id", flat=True)
+                )
+                reserved = model.get_reserved_ids(values) - taken
+                skipped += [pk for pk, value in released if value in reserved]
+                ReleasedID.objects.filter(
+                    pk__in=[pk for pk, value in released if value not in reserved]
+                ).delete()
+                ids += [
+                    value
+                    for value in values
+                    if value not in taken and value not in reserved
+                ]
+
+        if len(ids) < count:
+            ids += self.fallback.allocate_many(model, count - len(ids))
+        return sorted(ids)
+
+    def release(self, model, ids: Iterable[int]) -> None:
+        from apps.core.models import ReleasedID
+
+        label = model._meta.label
+        ReleasedID.objects.bulk_create(
+            [ReleasedID(model_label=label, value=value) for value in ids],
+            ignore_conflicts=True,
+        )
+
+
+class TimeOrderedStrategy(IDStrategy):
+    """
+    Collision-free, time-ordered 63-bit IDs.
+
+    Layout: 41 bits of milliseconds since ``EPOCH_MS``, 10 bits of node ID,
+    12 bits of per-millisecond counter. The node ID is leased from a
+    PostgreSQL sequence once per process, so up to 1024 concurrent processes
+    never produce the same ID.
+    """
+
+    name = "time_ordered"
+
+    EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+    NODE_BITS = 10
+    COUNTER_BITS = 12
+    NODE_SEQUENCE = "core_idalloc_node_seq"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._node_id = None
+        self._last_ms = -1
+        self._counter = 0
+
+    def _get_node_id(self) -> int:
+        if self._node_id is None:
+            if _is_postgres():
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT nextval(%s)", [self.NODE_SEQUENCE])
+                    value = cursor.fetchone()[0]
+            else:
+                value = os.getpid()
+            self._node_id = value % (1 << self.NODE_BITS)
+        return self._node_id
+
+    def _next(self) -> int:
+        now_ms = int(time.time() * 1000)
+        if now_ms < self._last_ms:
+            # Clock moved backwards: keep issuing from the last timestamp.
+            now_ms = self._last_ms
+
+        if now_ms == self._last_ms:
+            self._counter = (self._counter + 1) & ((1 << self.COUNTER_BITS) - 1)
+            if self._counter == 0:
+                # Counter exhausted for this millisecond, wait for the next one.
+                while now_ms <= self._last_ms:
+                    now_ms = int(time.time() * 1000)
+        else:
+            self._counter = 0
+
+        self._last_ms = now_ms
+        return (
+            ((now_ms - self.EPOCH_MS) << (self.NODE_BITS + self.COUNTER_BITS))
+            | (self._get_node_id() << self.COUNTER_BITS)
+            | self._counter
+        )
+
+    def allocate_many(self, model, count: int) -> List[int]:
+        if model._meta.pk.get_internal_type() != "BigIntegerField":
+            raise ImproperlyConfigured(
+                f"{model._meta.label} needs a BigIntegerField primary key "
+                f"to use the time_ordered ID strategy."
+            )
+        with self._lock:
+            return [self._next() for _ in range(count)]
+
+
+STRATEGIES: Dict[str, IDStrategy] = {
+    strategy.name: strategy
+    for strategy in (
+        ScanStrategy(),
+        SequenceStrategy(),
+        GapReuseStrategy(),
+        TimeOrderedStrategy(),
+    )
+}
+
+
+def get_strategy(name: str) -> IDStrategy:
+    """Return the strategy registered under ``name``."""
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown ID allocation strategy '{name}'. "
+            f"Choose one of: {', '.join(sorted(STRATEGIES))}."
+        )
+
+
+def get_strategy_for_model(model) -> IDStrategy:
+    """Resolve the strategy for ``model`` (settings override, then model default)."""
+    overrides = getattr(settings, "ID_ALLOCATION_STRATEGIES", {})
+    name = overrides.get(model._meta.label) or getattr(
+        model, "id_strategy", DEFAULT_STRATEGY
+    )
+    return get_strategy(name)
@@ -0,0 +1,150 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+
+from apps.core.id_allocation import STRATEGIES, SequenceStrategy, sequence_name
+from apps.core.models import ReleasedID
+from apps.utils import GapFillingIDMixin
+
+SEED_BATCH_SIZE = 10000
+TABLE_NAME = "core_idalloc_benchmark"
+BIG_TABLE_NAME = "core_idalloc_benchmark_big"
+
+
+def _make_benchmark_model(name: str, db_table: str, big_pk: bool):
+    """Build a throwaway GapFillingIDMixin model backed by its own table."""
+    attrs = {
+        "__module__": __name__,
+        "name": models.CharField(max_length=20),
+        "Meta": type("Meta", (), {"app_label": "core", "db_table": db_table}),
+    }
+    if big_pk:
+        attrs["id"] = models.BigIntegerField(primary_key=True, verbose_name="ID")
+    return type(name, (GapFillingIDMixin,), attrs)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare insert latency of the ID allocation strategies at different "
+        "table sizes. Uses a temporary table, existing data is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help="Table sizes to benchmark",
+        )
+        parser.add_argument(
+            "--inserts",
+            type=int,
+            default=50,
+            help="Number of single-row inserts timed per strategy and size",
+        )
+        parser.add_argument(
+            "--strategies",
+            nargs="+",
+            default=sorted(STRATEGIES),
+            choices=sorted(STRATEGIES),
+        )
+        parser.add_argument(
+            "--gap-every",
+            type=int,
+            default=10,
+            help="Leave every Nth ID unused to simulate deleted rows (0 = no gaps)",
+        )
+
+    def handle(self, *args, **options):
+        if options["gap_every"] == 1:
+            raise CommandError("--gap-every must be 0 or greater than 1")
+
+        small = _make_benchmark_model("IDBenchmarkRow", TABLE_NAME, big_pk=False)
+        big = _make_benchmark_model("IDBenchmarkBigRow", BIG_TABLE_NAME, big_pk=True)
+
+        with connection.schema_editor() as editor:
+            editor.create_model(small)
+            editor.create_model(big)
+
+        try:
+            self.stdout.write(
+                f"{'rows':>10} {'strategy':>14} {'mean ms':>10} {'p50 ms':>10} "
+                f"{'p95 ms':>10} {'p99 ms':>10}"
+            )
+            for rows in options["rows"]:
+                for name in options["strategies"]:
+                    # time_ordered IDs need a 64-bit primary key
+                    model = big if name == "time_ordered" else small
+                    self.seed(model, rows, options["gap_every"])
+                    timings = self.run_inserts(model, name, options["inserts"])
+                    self.report(rows, name, timings)
+                    self.reset(model)
+        finally:
+            with connection.schema_editor() as editor:
+                editor.delete_model(small)
+                editor.delete_model(big)
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    for model in (small, big):
+                        cursor.execute(
+                            f"DROP SEQUENCE IF EXISTS "
+                            f"{connection.ops.quote_name(sequence_name(model))}"
+                        )
+            ReleasedID.objects.filter(
+                model_label__in=[small._meta.label, big._meta.label]
+            ).delete()
+
+    def seed(self, model, rows: int, gap_every: int):
+        """Insert ``rows`` rows, leaving every ``gap_every``-th ID free."""
+        label = model._meta.label
+        batch, gaps = [], []
+        value = 0
+        inserted = 0
+
+        while inserted < rows:
+            value += 1
+            if gap_every and value % gap_every == 0:
+                gaps.append(ReleasedID(model_label=label, value=value))
+                continue
+            batch.append(model(id=value, name=str(value)))
+            inserted += 1
+            if len(batch) >= SEED_BATCH_SIZE:
+                model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+
+        ReleasedID.objects.bulk_create(gaps, batch_size=SEED_BATCH_SIZE)
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                SequenceStrategy.ensure_sequence(model, cursor)
+
+    def run_inserts(self, model, strategy_name: str, count: int):
+        strategy = STRATEGIES[strategy_name]
+        timings = []
+        for i in range(count):
+            started = time.perf_counter()
+            new_id = strategy.allocate(model)
+            model(id=new_id, name=f"bench-{i}").save(force_insert=True)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def reset(self, model):
+        model.objects.all()._raw_delete(model.objects.db)
+        ReleasedID.objects.filter(model_label=model._meta.label).delete()
+
+    def report(self, rows: int, name: str, timings):
+        timings = sorted(timings)
+
+        def percentile(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+        self.stdout.write(
+            f"{rows:>10} {name:>14} {statistics.mean(timings):>10.2f} "
+            f"{percentile(0.50):>10.2f} {percentile(0.95):>10.2f} "
+            f"{percentile(0.99):>10.2f}"
+        )
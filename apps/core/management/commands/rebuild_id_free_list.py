@@ -0,0 +1,77 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.core.models import ReleasedID
+from apps.utils import GapFillingIDMixin
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the free-list used by the gap_reuse ID strategy from the gaps "
+        "currently present in each table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            help="Model labels to rebuild (e.g. houses.House). Default: all models.",
+        )
+        parser.add_argument(
+            "--max-gap",
+            type=int,
+            default=100000,
+            help="Skip gaps wider than this (e.g. between random claim IDs).",
+        )
+
+    def handle(self, *args, **options):
+        models = [
+            model for model in apps.get_models() if issubclass(model, GapFillingIDMixin)
+        ]
+        if options["models"]:
+            labels = {label.lower() for label in options["models"]}
+            unknown = labels - {model._meta.label_lower for model in models}
+            if unknown:
+                raise CommandError(f"Unknown models: {', '.join(sorted(unknown))}")
+            models = [model for model in models if model._meta.label_lower in labels]
+
+        for model in models:
+            count = self.rebuild(model, options["max_gap"])
+            self.stdout.write(
+                self.style.SUCCESS(f"✓ {model._meta.label}: {count} free IDs")
+            )
+
+    def rebuild(self, model, max_gap: int) -> int:
+        """Replace the free-list of ``model`` with the gaps below its MAX(id)."""
+        label = model._meta.label
+        reserved = model.get_reserved_ids()
+        total = 0
+
+        with transaction.atomic():
+            ReleasedID.objects.filter(model_label=label).delete()
+
+            batch = []
+            expected = 1
+            ids = model.objects.order_by("id").values_list("id", flat=True)
+            for current in ids.iterator(chunk_size=BATCH_SIZE):
+                if current - expected > max_gap:
+                    expected = current + 1
+                    continue
+                for value in range(expected, current):
+                    if value in reserved:
+                        continue
+                    batch.append(ReleasedID(model_label=label, value=value))
+                    if len(batch) >= BATCH_SIZE:
+                        ReleasedID.objects.bulk_create(batch)
+                        total += len(batch)
+                        batch = []
+                expected = current + 1
+
+            if batch:
+                ReleasedID.objects.bulk_create(batch)
+                total += len(batch)
+
+        return total
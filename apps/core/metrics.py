@@ -0,0 +1,71 @@
+"""
+Operational counters shared by all worker processes.
+
+Counters live in the default cache, so every gunicorn worker increments the
+same value. They are lost when the cache is cleared and, with the database
+cache backend, increments are not atomic; use them to watch trends, not for
+accounting.
+"""
+
+import logging
+from typing import Dict
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "metrics:"
+
+_registry: Dict[str, "Counter"] = {}
+
+
+class Counter:
+    """
+    Named counter in the shared cache.
+
+    Args:
+        name: Dotted metric name, e.g. ``"eskiz.token.refreshes"``
+        description: Short explanation shown by the metrics endpoint
+    """
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        _registry[name] = self
+
+    @property
+    def key(self) -> str:
+        return f"{KEY_PREFIX}{self.name}"
+
+    def increment(self, delta: int = 1) -> None:
+        # Metrics must never break the code path they measure
+        try:
+            try:
+                cache.incr(self.key, delta)
+            except ValueError:
+                if not cache.add(self.key, delta, timeout=None):
+                    cache.incr(self.key, delta)
+        except Exception as e:
+            logger.warning(f"Could not increment metric {self.name}: {e}")
+
+    def get(self) -> int:
+        return cache.get(self.key, 0)
+
+    def reset(self) -> None:
+        cache.delete(self.key)
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Current value and description of every registered counter."""
+    values = cache.get_many([counter.key for counter in _registry.values()])
+    return {
+        name: {
+            "value": values.get(counter.key, 0),
+            "description": counter.description,
+        }
+        for name, counter in sorted(_registry.items())
+    }
+
+
+def reset_all() -> None:
+    cache.delete_many([counter.key for counter in _registry.values()])
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ReleasedID",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model_label", models.CharField(max_length=100, verbose_name="Model")),
+                ("value", models.BigIntegerField(verbose_name="ID")),
+                (
+                    "released_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Released at"),
+                ),
+            ],
+            options={
+                "verbose_name": "Released ID",
+                "verbose_name_plural": "Released IDs",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("model_label", "value"), name="core_releasedid_unique"
+                    )
+                ],
+            },
+        ),
+    ]
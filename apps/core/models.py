@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class ReleasedID(models.Model):
+    """
+    Free-list entry for the gap-reuse ID allocation strategy.
+
+    When a row of a gap-reusing model is deleted its ID is stored here,
+    and the next insert pops the smallest free ID instead of scanning
+    the whole table for gaps.
+    """
+
+    model_label = models.CharField(max_length=100, verbose_name="Model")
+    value = models.BigIntegerField(verbose_name="ID")
+    released_at = models.DateTimeField(auto_now_add=True, verbose_name="Released at")
+
+    class Meta:
+        verbose_name = "Released ID"
+        verbose_name_plural = "Released IDs"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model_label", "value"], name="core_releasedid_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} #{self.value}"
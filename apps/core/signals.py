@@ -0,0 +1,50 @@
+import logging
+
+from django.apps import apps as django_apps
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate
+from django.dispatch import receiver
+
+from apps.utils import GapFillingIDMixin
+from .id_allocation import SequenceStrategy, TimeOrderedStrategy
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_delete)
+def release_deleted_id(sender, instance, **kwargs):
+    """Hand the ID of a deleted record back to its allocation strategy."""
+    if not isinstance(instance, GapFillingIDMixin) or instance.id is None:
+        return
+
+    try:
+        # Savepoint: a failed INSERT must not break the caller's transaction
+        with transaction.atomic():
+            sender.get_id_strategy().release(sender, [instance.id])
+    except Exception as e:
+        logger.error(f"Failed to release {sender.__name__} ID {instance.id}: {e}")
+
+
+@receiver(post_migrate)
+def create_id_sequences(sender, using="default", **kwargs):
+    """
+    Create and sync PostgreSQL sequences for every GapFillingIDMixin model.
+
+    Runs after each ``migrate``, so switching a model to the ``sequence`` or
+    ``gap_reuse`` strategy never requires a manual step.
+    """
+    if sender.name != "apps.core":
+        return
+
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE SEQUENCE IF NOT EXISTS "
+            f"{connection.ops.quote_name(TimeOrderedStrategy.NODE_SEQUENCE)}"
+        )
+        for model in django_apps.get_models():
+            if issubclass(model, GapFillingIDMixin):
+                SequenceStrategy.ensure_sequence(model, cursor)
@@ -0,0 +1,453 @@
+"""
+Telegram Bot API client and background sender.
+
+Notifications are handed to a per-process thread pool once the current
+transaction commits, so request handlers never wait on Telegram and nothing
+is announced for changes that were rolled back. Every chat gets its own
+task: one slow or unreachable chat does not hold up the others.
+
+Sending respects Telegram's limits:
+
+- A global and a per-chat token bucket (TELEGRAM_GLOBAL_RATE and
+  TELEGRAM_CHAT_RATE messages per second), shared by all workers through
+  the cache.
+- A 429 answer pauses the chat for the ``retry_after`` seconds Telegram
+  asks for.
+
+Messages that cannot go out yet are not dropped: they wait in the sender's
+delay queue and are retried when a token is free, the pause is over, or (for
+network and 5xx errors) after a backoff. Messages still queued when the
+process exits are spooled to WRITE_BEHIND_SPOOL_DIR and sent by the next
+sender that starts.
+"""
+
+import atexit
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Iterable, List, Optional
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import http
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+messages_sent = Counter("telegram.sent", "Telegram messages delivered")
+messages_failed = Counter("telegram.failed", "Telegram messages given up on")
+messages_deferred = Counter(
+    "telegram.deferred", "Telegram messages queued for a later attempt"
+)
+rate_limited = Counter("telegram.rate_limited", "Telegram 429 responses")
+
+BUCKET_PREFIX = "telegram:bucket:"
+# Seconds to defer a message when a bucket's lock could not be taken
+LOCK_RETRY = 0.05
+PAUSE_PREFIX = "telegram:pause:"
+
+
+def api_url(method: str) -> str:
+    return f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/{method}"
+
+
+def api_request(
+    method: str, payload: Optional[dict] = None, deadline=None
+) -> requests.Response:
+    """Call a Bot API method through the pooled HTTP client."""
+    if payload is None:
+        return http.get(api_url(method), deadline=deadline)
+    return http.post(api_url(method), json=payload, deadline=deadline)
+
+
+def chat_ids() -> List[str]:
+    """Configured TELEGRAM_CHAT_IDS without blanks."""
+    return [
+        chat_id.strip()
+        for chat_id in getattr(settings, "TELEGRAM_CHAT_IDS", [])
+        if chat_id.strip()
+    ]
+
+
+# Rate limiting
+
+
+class TokenBucket:
+    """
+    Token bucket shared by all workers through the cache.
+
+    Args:
+        key: Cache key of the bucket state
+        rate: Tokens added per second
+        capacity: Maximum burst
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float):
+        self.key = key
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+
+    def take(self) -> float:
+        """
+        Take one token if available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is
+            available (nothing is taken then)
+        """
+        with _cache_lock(self.key) as locked:
+            if not locked:
+                # Another worker is holding the bucket; try again shortly
+                # instead of writing over its update
+                return LOCK_RETRY
+            now = time.time()
+            state = cache.get(self.key) or {"tokens": self.capacity, "at": now}
+            tokens = min(
+                self.capacity, state["tokens"] + (now - state["at"]) * self.rate
+            )
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            cache.set(self.key, {"tokens": tokens, "at": now}, timeout=3600)
+            return wait
+
+    def give_back(self) -> None:
+        """Return a token taken for a message that was not sent."""
+        with _cache_lock(self.key) as locked:
+            state = cache.get(self.key) if locked else None
+            if state:
+                state["tokens"] = min(self.capacity, state["tokens"] + 1)
+                cache.set(self.key, state, timeout=3600)
+
+
+class _cache_lock:
+    """
+    Short cross-process lock around a read-modify-write of a cache key.
+
+    Entering yields whether the lock was acquired. Callers must not touch
+    the key when it was not: another worker is in the middle of its update.
+    """
+
+    _local = threading.Lock()
+
+    def __init__(self, key: str):
+        self.lock_key = f"{key}:lock"
+        self.token = uuid.uuid4().hex
+        self.acquired = False
+
+    def __enter__(self) -> bool:
+        self._local.acquire()
+        give_up = time.monotonic() + 1.0
+        # A crashed holder's lock expires after 2 seconds
+        while not cache.add(self.lock_key, self.token, timeout=2):
+            if time.monotonic() >= give_up:
+                return False
+            time.sleep(0.005)
+        self.acquired = True
+        return True
+
+    def __exit__(self, *exc):
+        try:
+            # Only release our own lock, never one taken over after expiry
+            if self.acquired and cache.get(self.lock_key) == self.token:
+                cache.delete(self.lock_key)
+        finally:
+            self._local.release()
+
+
+def _global_bucket() -> TokenBucket:
+    rate = getattr(settings, "TELEGRAM_GLOBAL_RATE", 25.0)
+    return TokenBucket(f"{BUCKET_PREFIX}global", rate, rate)
+
+
+def _chat_bucket(chat_id: str) -> TokenBucket:
+    return TokenBucket(
+        f"{BUCKET_PREFIX}chat:{chat_id}",
+        getattr(settings, "TELEGRAM_CHAT_RATE", 1.0),
+        getattr(settings, "TELEGRAM_CHAT_BURST", 3),
+    )
+
+
+def reserve(chat_id: str) -> float:
+    """
+    Reserve a slot to send one message to ``chat_id``.
+
+    Returns:
+        0 if the message may be sent now, otherwise seconds to wait
+    """
+    paused_until = cache.get(f"{PAUSE_PREFIX}{chat_id}")
+    if paused_until and paused_until > time.time():
+        return paused_until - time.time()
+
+    chat_bucket = _chat_bucket(chat_id)
+    wait = chat_bucket.take()
+    if wait:
+        return wait
+    wait = _global_bucket().take()
+    if wait:
+        chat_bucket.give_back()
+    return wait
+
+
+def pause_chat(chat_id: str, seconds: float) -> None:
+    """Hold back messages to ``chat_id`` for ``seconds`` (Telegram's retry_after)."""
+    cache.set(
+        f"{PAUSE_PREFIX}{chat_id}", time.time() + seconds, timeout=int(seconds) + 1
+    )
+
+
+# Sending
+
+
+@dataclass
+class SendResult:
+    ok: bool
+    # Seconds Telegram asked us to wait (429)
+    retry_after: Optional[float] = None
+    # Network or server error; worth another attempt
+    retryable: bool = False
+
+
+def send_message(
+    chat_id: str,
+    text: str,
+    deadline: Optional[http.Deadline] = None,
+    label: str = "Telegram message",
+) -> SendResult:
+    """Send ``text`` to one chat now (blocking, no rate limiting)."""
+    payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+    try:
+        response = api_request("sendMessage", payload, deadline)
+    except requests.RequestException as e:
+        logger.error(f"Failed to send {label} to chat {chat_id}: {e}")
+        return SendResult(ok=False, retryable=True)
+
+    if response.status_code == 200:
+        logger.info(f"{label} sent to chat {chat_id}")
+        return SendResult(ok=True)
+
+    if response.status_code == 429:
+        try:
+            retry_after = response.json()["parameters"]["retry_after"]
+        except (ValueError, KeyError, TypeError):
+            retry_after = 5
+        logger.warning(
+            f"Telegram rate limit for chat {chat_id}: retry in {retry_after}s"
+        )
+        return SendResult(ok=False, retry_after=float(retry_after))
+
+    logger.error(f"Failed to send {label} to chat {chat_id}: {response.text}")
+    return SendResult(ok=False, retryable=response.status_code >= 500)
+
+
+@dataclass
+class _Message:
+    chat_id: str
+    text: str
+    label: str
+    attempts: int = 0
+
+
+class _Sender:
+    """Thread pool plus a delay queue for messages that have to wait."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "TELEGRAM_SENDER_WORKERS", 4),
+            thread_name_prefix="telegram",
+        )
+        self._delayed = []  # heap of (due, seq, message)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        threading.Thread(
+            target=self._run_delayed, name="telegram-delayed", daemon=True
+        ).start()
+
+    def submit(self, message: _Message) -> None:
+        try:
+            self.executor.submit(self._deliver, message)
+        except RuntimeError:
+            # Interpreter shutting down: keep it queued so it gets spooled
+            with self._cond:
+                self._closed = True
+                heapq.heappush(self._delayed, (0, next(self._seq), message))
+
+    def defer(self, message: _Message, delay: float) -> None:
+        messages_deferred.increment()
+        with self._cond:
+            heapq.heappush(
+                self._delayed, (time.monotonic() + delay, next(self._seq), message)
+            )
+            self._cond.notify()
+
+    def pending(self) -> List[_Message]:
+        with self._cond:
+            return [message for _, _, message in self._delayed]
+
+    def _run_delayed(self) -> None:
+        while True:
+            with self._cond:
+                while not self._delayed or self._closed:
+                    self._cond.wait()
+                due, _, message = self._delayed[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._delayed)
+            self.submit(message)
+
+    def _deliver(self, message: _Message) -> None:
+        try:
+            wait = reserve(message.chat_id)
+            if wait:
+                self.defer(message, wait)
+                return
+
+            message.attempts += 1
+            deadline = http.Deadline(getattr(settings, "TELEGRAM_SEND_BUDGET", 10))
+            result = send_message(
+                message.chat_id, message.text, deadline, message.label
+            )
+        except Exception as e:
+            logger.error(
+                f"Error sending {message.label} to chat {message.chat_id}: {e}"
+            )
+            result = SendResult(ok=False, retryable=True)
+
+        if result.ok:
+            messages_sent.increment()
+        elif result.retry_after is not None:
+            # Rate limits don't count as failed attempts
+            rate_limited.increment()
+            message.attempts -= 1
+            pause_chat(message.chat_id, result.retry_after)
+            self.defer(message, result.retry_after)
+        elif result.retryable and message.attempts < getattr(
+            settings, "TELEGRAM_MAX_ATTEMPTS", 5
+        ):
+            self.defer(message, min(2**message.attempts, 300))
+        else:
+            messages_failed.increment()
+            logger.error(
+                f"{message.label} to chat {message.chat_id} dropped after "
+                f"{message.attempts} attempts"
+            )
+
+
+_sender: Optional[_Sender] = None
+_sender_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _spool_dir() -> str:
+    return os.path.join(
+        getattr(settings, "WRITE_BEHIND_SPOOL_DIR", "spool"), "telegram"
+    )
+
+
+def _get_sender() -> _Sender:
+    global _sender, _sender_pid
+    with _lock:
+        if _sender is None or _sender_pid != os.getpid():
+            # Threads do not survive a fork; each worker gets its own sender
+            _sender = _Sender()
+            _sender_pid = os.getpid()
+            replay = True
+        else:
+            replay = False
+    if replay:
+        _replay_spool(_sender)
+    return _sender
+
+
+def _spool_pending() -> None:
+    """Save messages still waiting in the delay queue (at process exit)."""
+    if _sender is None or _sender_pid != os.getpid():
+        return
+    pending = _sender.pending()
+    if not pending:
+        return
+    directory = _spool_dir()
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}.jsonl"
+    tmp_path = os.path.join(directory, f".{filename}")
+    with open(tmp_path, "w") as f:
+        for message in pending:
+            f.write(json.dumps(asdict(message)) + "\n")
+    os.replace(tmp_path, os.path.join(directory, filename))
+    logger.info(f"Telegram: {len(pending)} queued messages spooled")
+
+
+def _replay_spool(sender: _Sender) -> int:
+    directory = _spool_dir()
+    if not os.path.isdir(directory):
+        return 0
+    replayed = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".jsonl"):
+            continue
+        path = os.path.join(directory, filename)
+        claimed = f"{path}.{os.getpid()}.replaying"
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            continue  # Taken by another process
+        with open(claimed) as f:
+            for line in f:
+                if line.strip():
+                    sender.submit(_Message(**json.loads(line)))
+                    replayed += 1
+        os.remove(claimed)
+    if replayed:
+        logger.info(f"Telegram: {replayed} spooled messages requeued")
+    return replayed
+
+
+atexit.register(_spool_pending)
+
+
+def broadcast(
+    text: str,
+    label: str = "Telegram message",
+    to: Optional[Iterable[str]] = None,
+) -> int:
+    """
+    Queue ``text`` for every chat; sent concurrently in the background.
+
+    Args:
+        text: Message (HTML)
+        label: Name used in logs
+        to: Chat IDs, defaults to TELEGRAM_CHAT_IDS
+
+    Returns:
+        Number of chats the message was queued for
+    """
+    sender = _get_sender()
+    targets = chat_ids() if to is None else list(to)
+    for chat_id in targets:
+        sender.submit(_Message(chat_id=chat_id, text=text, label=label))
+    return len(targets)
+
+
+def broadcast_on_commit(
+    text: str,
+    label: str = "Telegram message",
+    to: Optional[Iterable[str]] = None,
+) -> None:
+    """``broadcast`` once the current transaction commits (at once outside one)."""
+    to = chat_ids() if to is None else list(to)
+    transaction.on_commit(lambda: broadcast(text, label, to))
@@ -0,0 +1,320 @@
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.core import telegram
+from apps.core.circuit_breaker import CircuitBreaker
+from apps.core.downloads import parse_range, send_file
+from apps.core.id_allocation import get_strategy
+from apps.core.models import ReleasedID
+from apps.regions.models import Region
+from apps.scans.models import ScanLog
+
+
+class IDAllocationTests(TestCase):
+    def create_regions(self, count):
+        return [Region.objects.create(name=f"Region {i}") for i in range(count)]
+
+    def test_gap_reuse_fills_smallest_released_id(self):
+        first, second, third = self.create_regions(3)
+        third.delete()
+        second.delete()
+
+        self.assertEqual(Region.objects.create(name="New").id, 2)
+        self.assertEqual(Region.objects.create(name="New").id, 3)
+        self.assertEqual(Region.objects.create(name="New").id, 4)
+        self.assertFalse(ReleasedID.objects.exists())
+
+    @override_settings(ID_ALLOCATION_STRATEGIES={"regions.Region": "sequence"})
+    def test_sequence_never_reuses_ids(self):
+        first, second, third = self.create_regions(3)
+        second.delete()
+
+        self.assertEqual(Region.objects.create(name="New").id, 4)
+
+    def test_allocate_ids_returns_ascending_block(self):
+        self.create_regions(2)
+        Region.objects.get(id=1).delete()
+
+        self.assertEqual(Region.allocate_ids(3), [1, 3, 4])
+
+    def test_failed_insert_puts_popped_id_back(self):
+        self.create_regions(3)
+        Region.objects.get(id=2).delete()
+
+        region = Region(name="Broken")
+        with mock.patch.object(
+            Region, "save_base", side_effect=IntegrityError("insert failed")
+        ):
+            with self.assertRaises(IntegrityError):
+                region.save()
+
+        self.assertIsNone(region.id)
+        self.assertTrue(
+            ReleasedID.objects.filter(model_label="regions.Region", value=2).exists()
+        )
+        self.assertEqual(Region.objects.create(name="New").id, 2)
+
+    def test_reserved_id_stays_in_free_list(self):
+        self.create_regions(3)
+        Region.objects.get(id=2).delete()
+
+        with mock.patch.object(
+            Region, "get_reserved_ids", side_effect=lambda ids=None: {2} & set(ids)
+        ):
+            self.assertEqual(Region.objects.create(name="New").id, 4)
+
+        self.assertTrue(
+            ReleasedID.objects.filter(model_label="regions.Region", value=2).exists()
+        )
+        self.assertEqual(Region.objects.create(name="New").id, 2)
+
+    def test_failed_release_does_not_break_delete(self):
+        region, other = self.create_regions(2)
+        with mock.patch.object(
+            ReleasedID.objects, "bulk_create", side_effect=IntegrityError("boom")
+        ):
+            with self.assertLogs("apps.core.signals", level="ERROR"):
+                region.delete()
+
+        self.assertFalse(Region.objects.filter(id=1).exists())
+        self.assertEqual(Region.objects.count(), 1)
+
+    def test_time_ordered_ids_increase(self):
+        strategy = get_strategy("time_ordered")
+        ids = strategy.allocate_many(ScanLog, 5000)
+
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertLess(ids[-1], 2**63)
+
+    def test_time_ordered_needs_64_bit_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_strategy("time_ordered").allocate(Region)
+
+    def test_unknown_strategy(self):
+        with override_settings(ID_ALLOCATION_STRATEGIES={"regions.Region": "nope"}):
+            with self.assertRaises(ImproperlyConfigured):
+                Region.objects.create(name="New")
+
+
+@override_settings(
+    TEST_BREAKER_MIN_CALLS=4,
+    TEST_BREAKER_FAILURE_RATE=0.5,
+    TEST_BREAKER_OPEN_SECONDS=30,
+    TEST_BREAKER_SLOW_CALL=1.0,
+)
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker("test", settings_prefix="TEST_BREAKER")
+
+    def record(self, *outcomes):
+        for success in outcomes:
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(success)
+
+    def test_stays_closed_below_min_calls(self):
+        self.record(False, False, False)
+
+        self.assertEqual(self.breaker.status()["state"], "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_opens_at_failure_rate(self):
+        self.record(True, True, False, False)
+
+        self.assertEqual(self.breaker.status()["state"], "open")
+        self.assertFalse(self.breaker.allow())
+        self.assertGreater(self.breaker.retry_after(), 29)
+
+    def test_slow_calls_count_as_failures(self):
+        for _ in range(4):
+            self.breaker.record(True, duration=2.0)
+
+        self.assertTrue(self.breaker.is_open())
+
+    def test_half_open_lets_one_probe_through(self):
+        self.record(False, False, False, False)
+
+        with mock.patch("apps.core.circuit_breaker.time.time") as now:
+            now.return_value = cache.get("breaker:test:open") + 31
+            self.assertEqual(self.breaker.status()["state"], "half_open")
+            self.assertTrue(self.breaker.allow())
+            self.assertFalse(self.breaker.allow())
+
+            self.breaker.record(True)
+
+        self.assertEqual(self.breaker.status()["state"], "closed")
+        self.assertEqual(self.breaker.status()["window_calls"], 0)
+
+    def test_failed_probe_opens_again(self):
+        self.record(False, False, False, False)
+
+        with mock.patch("apps.core.circuit_breaker.time.time") as now:
+            now.return_value = cache.get("breaker:test:open") + 31
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(False)
+            self.assertEqual(self.breaker.status()["state"], "open")
+            self.assertFalse(self.breaker.allow())
+
+
+@override_settings(
+    TELEGRAM_GLOBAL_RATE=25.0, TELEGRAM_CHAT_RATE=1.0, TELEGRAM_CHAT_BURST=3
+)
+class TelegramRateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_allows_burst_then_waits(self):
+        bucket = telegram.TokenBucket("test:bucket", rate=1.0, capacity=3)
+
+        self.assertEqual([bucket.take() for _ in range(3)], [0, 0, 0])
+        wait = bucket.take()
+        self.assertGreater(wait, 0.9)
+        self.assertLessEqual(wait, 1.0)
+
+    def test_bucket_refills_over_time(self):
+        bucket = telegram.TokenBucket("test:bucket", rate=2.0, capacity=3)
+        cache.set("test:bucket", {"tokens": 0, "at": time.time() - 1})
+
+        self.assertEqual([bucket.take() for _ in range(2)], [0, 0])
+        self.assertGreater(bucket.take(), 0)
+
+    def test_reserve_returns_chat_token_when_global_is_empty(self):
+        global_key = f"{telegram.BUCKET_PREFIX}global"
+        cache.set(global_key, {"tokens": 0, "at": time.time()})
+
+        self.assertGreater(telegram.reserve("42"), 0)
+        chat_state = cache.get(f"{telegram.BUCKET_PREFIX}chat:42")
+        self.assertEqual(chat_state["tokens"], 3)
+
+    def test_paused_chat_waits_for_retry_after(self):
+        telegram.pause_chat("42", 10)
+
+        self.assertGreater(telegram.reserve("42"), 9)
+        self.assertEqual(telegram.reserve("43"), 0)
+
+    def test_contended_bucket_is_left_alone(self):
+        bucket = telegram.TokenBucket("test:bucket", rate=1.0, capacity=3)
+        cache.set("test:bucket:lock", "other", timeout=5)
+
+        with mock.patch.object(telegram.time, "sleep"):
+            clock = itertools.count(step=0.5)
+            with mock.patch.object(telegram.time, "monotonic", side_effect=clock):
+                self.assertEqual(bucket.take(), telegram.LOCK_RETRY)
+
+        self.assertIsNone(cache.get("test:bucket"))
+        self.assertEqual(cache.get("test:bucket:lock"), "other")
+
+    def test_lock_taken_over_after_expiry_is_kept(self):
+        with telegram._cache_lock("test:bucket") as locked:
+            self.assertTrue(locked)
+            # Our lock expired and another worker took it
+            cache.set("test:bucket:lock", "other", timeout=5)
+
+        self.assertEqual(cache.get("test:bucket:lock"), "other")
+
+    def test_lock_is_released(self):
+        with telegram._cache_lock("test:bucket"):
+            pass
+
+        self.assertIsNone(cache.get("test:bucket:lock"))
+
+
+class DownloadTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, DOWNLOADS_ACCEL_REDIRECT=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.path = os.path.join(self.media_root, "exports", "uylar.xlsx")
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "wb") as f:
+            f.write(bytes(range(100)))
+
+    def get(self, **headers):
+        request = RequestFactory().get("/download/", headers=headers)
+        return send_file(request, self.path)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-500", 100), (0, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+        self.assertEqual(parse_range("bytes=100-", 100), ())
+        self.assertEqual(parse_range("bytes=9-0", 100), ())
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(parse_range("items=0-1", 100))
+        self.assertIsNone(parse_range("bytes=-", 100))
+
+    def test_full_download(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(100)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn('filename="uylar.xlsx"', response["Content-Disposition"])
+        response.close()
+
+    def test_range_is_partial_content(self):
+        response = self.get(Range="bytes=10-19")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range="bytes=200-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_stale_if_range_sends_whole_file(self):
+        response = self.get(Range="bytes=10-19", If_Range='"old"')
+
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_current_if_range_sends_range(self):
+        etag = self.get(Range="bytes=0-0")["ETag"]
+
+        response = self.get(Range="bytes=10-19", If_Range=etag)
+
+        self.assertEqual(response.status_code, 206)
+
+    def test_if_none_match_is_not_modified(self):
+        full = self.get()
+        full.close()
+
+        response = self.get(If_None_Match=full["ETag"])
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_accel_redirect_hands_file_to_proxy(self):
+        with override_settings(
+            DOWNLOADS_ACCEL_REDIRECT=True, DOWNLOADS_ACCEL_PREFIX="/protected/"
+        ):
+            response = self.get(Range="bytes=10-19")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected/exports/uylar.xlsx")
+        self.assertEqual(response.content, b"")
+
+    def test_accel_redirect_refuses_files_outside_media_root(self):
+        with override_settings(DOWNLOADS_ACCEL_REDIRECT=True):
+            with self.assertRaises(ValueError):
+                send_file(RequestFactory().get("/"), os.path.abspath(__file__))
@@ -0,0 +1,32 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import circuit_breaker, metrics
+
+
+class MetricsAPIView(APIView):
+    """
+    Operational counters (token cache hits, refreshes, ...) and circuit
+    breaker states.
+    Faqat admin va gov foydalanuvchilari uchun.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if getattr(request.user, "role", None) not in ["admin", "gov"]:
+            return Response(
+                {
+                    "error": "Sizda bu ma'lumotni ko'rish huquqi yo'q",
+                    "error_en": "You do not have permission to view this data",
+                },
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        return Response(
+            {
+                "metrics": metrics.snapshot(),
+                "breakers": circuit_breaker.snapshot(),
+            }
+        )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import House
+from .models import House, HouseNotification
 
 
 @admin.register(House)
@@ -7,3 +7,10 @@ class HouseAdmin(admin.ModelAdmin):
     list_display = ("id", "address", "owner", "mahalla")
     list_filter = ("mahalla",)
     search_fields = ("address",)
+
+
+@admin.register(HouseNotification)
+class HouseNotificationAdmin(admin.ModelAdmin):
+    list_display = ("id", "house", "kind", "created_at", "sent_at")
+    list_filter = ("kind",)
+    raw_id_fields = ("house",)
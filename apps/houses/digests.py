@@ -0,0 +1,150 @@
+"""
+Telegram digests of house registrations.
+
+With ``TELEGRAM_NOTIFICATION_MODE = "digest"`` a new house is recorded as a
+``HouseNotification`` row (in the transaction that created it) instead of
+being announced on its own. ``send_house_digests`` then sends one summary
+per group (``TELEGRAM_DIGEST_GROUP_BY``: region, district or mahalla) and
+chat once the group's oldest unsent registration is
+``TELEGRAM_DIGEST_WINDOW`` seconds old, so each group produces at most one
+message per window.
+"""
+
+import logging
+from collections import Counter as TallyCounter
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.core import telegram
+from apps.core.metrics import Counter
+from .models import HouseNotification
+
+logger = logging.getLogger(__name__)
+
+digests_sent = Counter("telegram.digests", "House digests queued for Telegram")
+
+GROUP_LOOKUPS = {
+    "region": "house__mahalla__district__region",
+    "district": "house__mahalla__district",
+    "mahalla": "house__mahalla",
+}
+
+# House IDs listed in one digest before the rest are only counted
+DIGEST_MAX_IDS = 30
+
+
+def digest_mode() -> bool:
+    return getattr(settings, "TELEGRAM_NOTIFICATION_MODE", "immediate") == "digest"
+
+
+def _group_by() -> str:
+    group_by = getattr(settings, "TELEGRAM_DIGEST_GROUP_BY", "district")
+    if group_by not in GROUP_LOOKUPS:
+        raise ValueError(
+            f"TELEGRAM_DIGEST_GROUP_BY must be one of {', '.join(GROUP_LOOKUPS)}"
+        )
+    return group_by
+
+
+def record_house_event(house, kind: str = "registration") -> HouseNotification:
+    """Buffer a registration for the next digest (in the caller's transaction)."""
+    return HouseNotification.objects.create(house=house, kind=kind)
+
+
+def _place(house, group_by: str) -> str:
+    mahalla = house.mahalla
+    district = mahalla.district
+    place = f"{district.region.name} viloyati"
+    if group_by in ("district", "mahalla"):
+        place += f", {district.name} tumani"
+    if group_by == "mahalla":
+        place += f", {mahalla.name} mahallasi"
+    return place
+
+
+def build_digest_message(events: List[HouseNotification], group_by: str) -> str:
+    houses = [event.house for event in events]
+    start = min(event.created_at for event in events).strftime("%d.%m.%Y %H:%M")
+    end = max(event.created_at for event in events).strftime("%d.%m.%Y %H:%M")
+
+    per_mahalla = TallyCounter(house.mahalla.name for house in houses)
+    mahalla_lines = "\n".join(
+        f"• {name}: {count} ta" for name, count in per_mahalla.most_common()
+    )
+    agent_count = sum(1 for event in events if event.kind == "agent")
+
+    ids = ", ".join(str(house.id) for house in houses[:DIGEST_MAX_IDS])
+    if len(houses) > DIGEST_MAX_IDS:
+        ids += f" va yana {len(houses) - DIGEST_MAX_IDS} ta"
+
+    return f"""
+📢 Bildirishnoma (jamlanma)
+
+{_place(houses[0], group_by)}da {len(houses)} ta uy davlat uy reyestriga kiritildi.
+
+📅 Davr: {start} — {end}
+🏘 Mahallalar:
+{mahalla_lines}
+👨‍💼 Agent tomonidan: {agent_count} ta
+🆔 ID: {ids}
+
+Ma'lumotlar to'g'riligini tekshirib chiqing.
+"""
+
+
+def _send_group(lookup: str, group_id, group_by: str, now) -> bool:
+    with transaction.atomic():
+        events = list(
+            HouseNotification.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(sent_at__isnull=True, **{lookup: group_id})
+            .select_related("house__mahalla__district__region")
+            .order_by("created_at")
+        )
+        if not events:
+            # Taken by another sender
+            return False
+
+        HouseNotification.objects.filter(id__in=[e.id for e in events]).update(
+            sent_at=now
+        )
+        telegram.broadcast_on_commit(
+            build_digest_message(events, group_by), "House digest"
+        )
+
+    logger.info(f"House digest for {group_by} {group_id}: {len(events)} houses")
+    digests_sent.increment()
+    return True
+
+
+def send_due_digests(now=None) -> int:
+    """
+    Send the digests whose window has closed.
+
+    Returns:
+        int: Number of digests queued for Telegram
+    """
+    now = now or timezone.now()
+    window = timedelta(seconds=getattr(settings, "TELEGRAM_DIGEST_WINDOW", 300))
+    group_by = _group_by()
+    lookup = GROUP_LOOKUPS[group_by]
+
+    due = (
+        HouseNotification.objects.filter(sent_at__isnull=True)
+        .values(lookup)
+        .annotate(first_at=Min("created_at"))
+        .filter(first_at__lte=now - window)
+    )
+    return sum(_send_group(lookup, row[lookup], group_by, now) for row in list(due))
+
+
+def purge_sent(days: int = 7) -> int:
+    """Delete digest rows sent more than ``days`` days ago."""
+    deleted, _ = HouseNotification.objects.filter(
+        sent_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.houses.services import notify_mahalla_owners
+from apps.regions.models import Mahalla
+
+
+class Command(BaseCommand):
+    help = "Queue an SMS to every client owning a house in a mahalla"
+
+    def add_arguments(self, parser):
+        parser.add_argument("mahalla_id", type=int, help="Mahalla ID")
+        parser.add_argument(
+            "message", help="SMS text (must match an approved Eskiz template)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            mahalla = Mahalla.objects.get(id=options["mahalla_id"])
+        except Mahalla.DoesNotExist:
+            raise CommandError(f"Mahalla {options['mahalla_id']} not found")
+
+        queued = notify_mahalla_owners(mahalla, options["message"])
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {queued} SMS queued for {mahalla.name}")
+        )
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.houses.digests import purge_sent, send_due_digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Send Telegram digests of house registrations "
+        '(TELEGRAM_NOTIFICATION_MODE = "digest")'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the due digests and exit instead of polling",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30.0,
+            help="Seconds between checks for closed digest windows",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Sending house digests")
+        retention = getattr(settings, "TELEGRAM_DIGEST_RETENTION_DAYS", 7)
+
+        try:
+            while True:
+                sent = send_due_digests()
+                if sent:
+                    self.stdout.write(self.style.SUCCESS(f"✓ {sent} digests sent"))
+                purge_sent(retention)
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("houses", "0002_alter_house_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HouseNotification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("registration", "Registration"),
+                            ("agent", "Added by agent"),
+                        ],
+                        default="registration",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Sent at"),
+                ),
+                (
+                    "house",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notifications",
+                        to="houses.house",
+                        verbose_name="House",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "House notification",
+                "verbose_name_plural": "House notifications",
+                "ordering": ["created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["sent_at", "created_at"],
+                        name="houses_hous_sent_at_5d95ee_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -11,6 +11,9 @@ class House(GapFillingIDMixin, models.Model):
     A house belongs to a mahalla (neighborhood) and can have an owner.
     """
 
+    # Random 10-digit IDs from older claims live above this range
+    id_sequence_max = 999_999_999
+
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,6 +46,60 @@ class House(GapFillingIDMixin, models.Model):
         verbose_name_plural = "Houses"
         ordering = ["-created_at"]
 
+    @classmethod
+    def get_reserved_ids(cls, candidates=None):
+        """
+        House IDs still referenced by QRCode.house_id cannot be reused.
+
+        Args:
+            candidates: Only check these IDs. If None, return all reserved IDs.
+
+        Returns:
+            set: Reserved house IDs
+        """
+        # Import here to avoid circular imports
+        from apps.qrcodes.models import QRCode
+
+        queryset = QRCode.objects.filter(house_id__isnull=False)
+        if candidates is not None:
+            candidates = list(candidates)
+            if not candidates:
+                return set()
+            queryset = queryset.filter(house_id__in=candidates)
+        return set(queryset.values_list("house_id", flat=True))
+
     def __str__(self):
         owner_name = self.owner.phone if self.owner else "No owner"
         return f"{self.address} ({self.mahalla.name}) - {owner_name}"
+
+
+class HouseNotification(models.Model):
+    """House registration waiting for the next Telegram digest.
+
+    Only written with TELEGRAM_NOTIFICATION_MODE = "digest"; the
+    send_house_digests command turns unsent rows into summary messages.
+    """
+
+    KIND_CHOICES = [
+        ("registration", "Registration"),
+        ("agent", "Added by agent"),
+    ]
+
+    house = models.ForeignKey(
+        House,
+        on_delete=models.CASCADE,
+        related_name="notifications",
+        verbose_name="House",
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default="registration")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created at")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Sent at")
+
+    class Meta:
+        verbose_name = "House notification"
+        verbose_name_plural = "House notifications"
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["sent_at", "created_at"])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - house {self.house_id}"
@@ -1,22 +1,46 @@
 import logging
-import requests
-from django.conf import settings
 from datetime import datetime
-from apps.users.services import EskizSMSService
+from apps.core import telegram
+from .digests import digest_mode, record_house_event
+from apps.users.services import send_registration_success_sms
 
 logger = logging.getLogger(__name__)
 
 
+def _notify_chats(message, label, house):
+    """
+    Queue ``message`` for every TELEGRAM_CHAT_IDS chat.
+
+    The message is sent by the background Telegram sender after the current
+    transaction commits; nothing is sent if it rolls back.
+
+    Returns:
+        bool: True if the message was queued for at least one chat
+    """
+    chat_ids = telegram.chat_ids()
+    if not chat_ids:
+        logger.warning(f"TELEGRAM_CHAT_IDS not set. House ID: {house.id}")
+        return False
+
+    telegram.broadcast_on_commit(message, label, chat_ids)
+    logger.info(f"{label} queued for {len(chat_ids)} chats. House ID: {house.id}")
+    return True
+
+
 def send_agent_house_notification(house):
     """
     Send notification when agent adds a house to the database.
-    Sends both Telegram notification and SMS to owner if phone exists.
+    Queues both Telegram notification and SMS to owner if phone exists.
+
+    No network I/O happens here: the SMS goes to the outbox and the Telegram
+    message to the background sender, both after the current transaction
+    commits.
 
     Args:
         house: House instance that was just created by agent
 
     Returns:
-        bool: True if message was successfully sent to at least one chat,
+        bool: True if message was queued for at least one chat,
               False otherwise
     """
     try:
@@ -29,23 +53,20 @@ def send_agent_house_notification(house):
                 )
             else:
                 try:
-                    sms_service = EskizSMSService()
-                    # Using approved Eskiz template - same as registration success
-                    message = (
-                        "Siz QR MAHALLA tizimida muvaffaqiyatli ro'yxatdan o'tdingiz."
-                    )
-
+                    # Queued in the outbox, sent once the house is committed
                     logger.info(
-                        f"Attempting to send SMS to house owner {house.owner.phone} for house ID: {house.id}"
+                        f"Queueing SMS to house owner {house.owner.phone} for house ID: {house.id}"
+                    )
+                    sms_queued = send_registration_success_sms(
+                        house.owner.phone, user=house.owner
                     )
-                    sms_sent = sms_service.send_sms(house.owner.phone, message)
-                    if sms_sent:
+                    if sms_queued:
                         logger.info(
-                            f"✅ SMS successfully sent to house owner {house.owner.phone} for house ID: {house.id}"
+                            f"✅ SMS queued for house owner {house.owner.phone} for house ID: {house.id}"
                         )
                     else:
                         logger.warning(
-                            f"❌ Failed to send SMS to house owner {house.owner.phone} for house ID: {house.id}"
+                            f"❌ Failed to queue SMS to house owner {house.owner.phone} for house ID: {house.id}"
                         )
                 except Exception as e:
                     logger.error(f"💥 Error sending SMS to house owner: {e}")
@@ -54,8 +75,9 @@ def send_agent_house_notification(house):
                 f"⚠️ No owner or phone number for house ID: {house.id}. SMS not sent."
             )
 
-        # Continue with existing Telegram notification logic
-        bot_token = settings.TELEGRAM_BOT_TOKEN
+        if digest_mode():
+            record_house_event(house, "agent")
+            return True
 
         # Get region, district, mahalla names
         mahalla = house.mahalla
@@ -80,35 +102,8 @@ def send_agent_house_notification(house):
 ✅ Uy muvaffaqiyatli ro'yxatga olindi.
 """
 
-        chat_ids = getattr(settings, "TELEGRAM_CHAT_IDS", [])
-
-        if chat_ids:
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-            success_count = 0
-
-            for chat_id in chat_ids:
-                chat_id = chat_id.strip()
-                if not chat_id:
-                    continue
-
-                payload = {"chat_id": chat_id, "text": message, "parse_mode": "HTML"}
-                response = requests.post(url, json=payload, timeout=5)
-
-                if response.status_code == 200:
-                    logger.info(f"Agent house notification sent to chat {chat_id}")
-                    success_count += 1
-                else:
-                    logger.error(
-                        f"Failed to send agent house notification to chat {chat_id}: {response.text}"
-                    )
-
-            if success_count > 0:
-                logger.info(
-                    f"Agent house notification sent to {success_count}/{len(chat_ids)} chats"
-                )
-                return True
-        else:
-            logger.warning(f"TELEGRAM_CHAT_IDS not set. House ID: {house.id}")
+        if _notify_chats(message, "Agent house notification", house):
+            return True
 
         logger.info(
             f"[Agent House Registration] House ID: {house.id}, Address: {house.address}"
@@ -129,15 +124,19 @@ def send_house_registration_notification(house):
         house: House instance that was just created
 
     Returns:
-        bool: True if message was successfully sent to at least one chat,
+        bool: True if message was queued for at least one chat,
               False otherwise
 
     Note:
-        Sends to all configured TELEGRAM_CHAT_IDS in settings.
-        Falls back to logging if Telegram delivery fails.
+        Sends to all configured TELEGRAM_CHAT_IDS in settings, concurrently
+        and after the current transaction commits (apps.core.telegram).
+        Falls back to logging if no chat is configured. In digest mode the
+        house is only recorded for the next summary (apps.houses.digests).
     """
     try:
-        bot_token = settings.TELEGRAM_BOT_TOKEN
+        if digest_mode():
+            record_house_event(house)
+            return True
 
         # Get region, district, mahalla names
         mahalla = house.mahalla
@@ -161,37 +160,8 @@ def send_house_registration_notification(house):
 Ma'lumotlar to'g'riligini tekshirib chiqing.
 """
 
-        chat_ids = getattr(settings, "TELEGRAM_CHAT_IDS", [])
-
-        if chat_ids:
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-            success_count = 0
-
-            for chat_id in chat_ids:
-                chat_id = chat_id.strip()
-                if not chat_id:
-                    continue
-
-                payload = {"chat_id": chat_id, "text": message, "parse_mode": "HTML"}
-                response = requests.post(url, json=payload, timeout=5)
-
-                if response.status_code == 200:
-                    logger.info(
-                        f"House registration notification sent to chat {chat_id}"
-                    )
-                    success_count += 1
-                else:
-                    logger.error(
-                        f"Failed to send house notification to chat {chat_id}: {response.text}"
-                    )
-
-            if success_count > 0:
-                logger.info(
-                    f"House registration notification sent to {success_count}/{len(chat_ids)} chats"
-                )
-                return True
-        else:
-            logger.warning(f"TELEGRAM_CHAT_IDS not set. House ID: {house.id}")
+        if _notify_chats(message, "House registration notification", house):
+            return True
 
         logger.info(
             f"[House Registration] House ID: {house.id}, Address: {house.address}"
@@ -202,3 +172,33 @@ Ma'lumotlar to'g'riligini tekshirib chiqing.
         logger.error(f"Error sending house registration notification: {e}")
         logger.info(f"[House Registration] House ID: {house.id}")
         return False
+
+
+def notify_mahalla_owners(mahalla, message, sms_type="notification"):
+    """
+    Queue an SMS to every client owning a house in ``mahalla``.
+
+    The messages go out through the SMS outbox, which groups them into
+    Eskiz batch requests.
+
+    Args:
+        mahalla: Mahalla instance
+        message: SMS text (must match an approved Eskiz template)
+        sms_type: SMSLog.sms_type
+
+    Returns:
+        int: Number of queued messages
+    """
+    from apps.users.models import User
+    from apps.users.outbox import enqueue_bulk_sms
+
+    owners = (
+        User.objects.filter(houses__mahalla=mahalla, role="client")
+        .exclude(phone="")
+        .distinct()
+    )
+    logs = enqueue_bulk_sms(
+        ((owner.phone, owner) for owner in owners.iterator()), message, sms_type
+    )
+    logger.info(f"{len(logs)} SMS queued for owners in mahalla {mahalla.id}")
+    return len(logs)
@@ -15,6 +15,9 @@ def house_post_save(sender, instance, created, **kwargs):
     """
     Send notification when a new house is created.
     Different notification for agent vs client created houses.
+
+    Only queues work: Telegram messages are sent in the background after
+    the transaction commits, SMS go through the outbox.
     """
     if created:
         logger.info(
@@ -23,13 +26,13 @@ def house_post_save(sender, instance, created, **kwargs):
         try:
             if instance.created_by_agent:
                 logger.info(
-                    f"📨 Sending agent house notification for house ID: {instance.id}"
+                    f"📨 Queueing agent house notification for house ID: {instance.id}"
                 )
                 # Send agent house notification
                 send_agent_house_notification(instance)
             else:
                 logger.info(
-                    f"📨 Sending regular house notification for house ID: {instance.id}"
+                    f"📨 Queueing regular house notification for house ID: {instance.id}"
                 )
                 # Send regular house notification
                 send_house_registration_notification(instance)
@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from apps.regions.models import District, Mahalla, Region
+from apps.users.models import User
+from apps.users.models_sms import SMSLog
+from .models import House
+
+
+@override_settings(SMS_OUTBOX_ENABLED=True)
+class NotifyMahallaOwnersTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name="Toshkent")
+        district = District.objects.create(region=region, name="Chilonzor")
+        self.mahalla = Mahalla.objects.create(district=district, name="Qatortol")
+        other = Mahalla.objects.create(district=district, name="Boshqa")
+
+        owner = User.objects.create(phone="+998901111111", role="client")
+        agent = User.objects.create(phone="+998902222222", role="agent")
+        outsider = User.objects.create(phone="+998903333333", role="client")
+        # Two houses, one SMS
+        House.objects.create(owner=owner, mahalla=self.mahalla, address="1-uy")
+        House.objects.create(owner=owner, mahalla=self.mahalla, address="2-uy")
+        House.objects.create(owner=agent, mahalla=self.mahalla, address="3-uy")
+        House.objects.create(owner=outsider, mahalla=other, address="4-uy")
+
+    def test_queues_one_sms_per_client_owner(self):
+        out = StringIO()
+        call_command("notify_mahalla_owners", self.mahalla.id, "Yig'ilish", stdout=out)
+
+        self.assertIn("1 SMS queued", out.getvalue())
+        self.assertEqual(
+            list(SMSLog.objects.values_list("phone", "status", "sms_type")),
+            [("+998901111111", "pending", "notification")],
+        )
+
+    def test_unknown_mahalla(self):
+        with self.assertRaises(CommandError):
+            call_command("notify_mahalla_owners", 999999, "Yig'ilish")
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import QRCode
+from .models import QRCode, QRGenerationJob
 
 
 @admin.register(QRCode)
@@ -24,3 +24,12 @@ class QRCodeAdmin(admin.ModelAdmin):
         return obj.get_qr_url()
 
     qr_url_display.short_description = "QR URL"
+
+
+@admin.register(QRGenerationJob)
+class QRGenerationJobAdmin(admin.ModelAdmin):
+    """Admin interface for background QR generation jobs."""
+
+    list_display = ("id", "status", "count", "generated", "created_by", "created_at")
+    list_filter = ("status", "created_at")
+    readonly_fields = ("id", "created_at", "started_at", "finished_at")
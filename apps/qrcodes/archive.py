@@ -0,0 +1,133 @@
+"""
+Streaming ZIP archives for QR code images.
+
+PNG data is already compressed, so entries are stored (ZIP_STORED) instead
+of deflated again. Archives are produced chunk by chunk: nothing but the
+current entry is held in memory, whether the output goes to a file on disk
+or to a ``StreamingHttpResponse``.
+"""
+
+import contextlib
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, List, Tuple
+
+from django.core.files.storage import default_storage
+
+from .rendering import render_png
+
+QUERY_CHUNK_SIZE = 500
+
+
+class _StreamSink:
+    """
+    Write-only, non-seekable file object that collects written chunks.
+
+    zipfile detects the missing ``seek`` and switches to data descriptors,
+    which lets it write an archive strictly front to back.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> List[bytes]:
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def _zip_info(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    return info
+
+
+def iter_zip(entries: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of ``entries`` chunk by chunk.
+
+    Args:
+        entries: Iterable of (file name, file contents) pairs, consumed lazily
+
+    Yields:
+        Raw archive bytes
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zip_file:
+        for name, data in entries:
+            zip_file.writestr(_zip_info(name), data)
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def write_zip(path: str, entries: Iterable[Tuple[str, bytes]]) -> int:
+    """
+    Stream a ZIP archive of ``entries`` to ``path``.
+
+    The archive is written to a temporary file first and renamed when
+    complete, so readers never see a partial archive.
+
+    Returns:
+        Size of the written archive in bytes
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.part"
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter_zip(entries):
+                f.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        # open() itself may have failed; keep the original error
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return size
+
+
+def qr_png_name(qr) -> str:
+    """File name of a QR code image inside an archive."""
+    return f"qr_{qr.uuid}.png"
+
+
+def get_qr_png(qr) -> bytes:
+    """PNG bytes for ``qr``: the stored image if present, otherwise rendered."""
+    if qr.image and default_storage.exists(qr.image.name):
+        with default_storage.open(qr.image.name, "rb") as f:
+            return f.read()
+    return render_png(qr.get_qr_url())
+
+
+def iter_qr_entries(uuids: List[str]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield archive entries for the QR codes with the given UUIDs.
+
+    Codes are loaded in chunks, in the order of ``uuids``; unknown UUIDs
+    are skipped.
+    """
+    from .models import QRCode
+
+    for start in range(0, len(uuids), QUERY_CHUNK_SIZE):
+        chunk = uuids[start : start + QUERY_CHUNK_SIZE]
+        codes = {
+            qr.uuid: qr
+            for qr in QRCode.objects.filter(uuid__in=chunk).only("id", "uuid", "image")
+        }
+        for qr_uuid in chunk:
+            qr = codes.get(qr_uuid)
+            if qr is not None:
+                yield qr_png_name(qr), get_qr_png(qr)
@@ -0,0 +1,189 @@
+"""
+House claim engine.
+
+A claim is decided by one conditional UPDATE instead of a row lock and a
+retry loop:
+
+- QR code without a house: ``UPDATE qrcode SET house_id = <new id> WHERE
+  uuid = ... AND house_id IS NULL``, then the house is inserted (the
+  foreign key is checked at commit).
+- QR code with an unowned house: ``UPDATE house SET owner_id = ... WHERE
+  id = ... AND owner_id IS NULL``.
+- Agent claims always insert a new house and relink the QR
+  code with ``UPDATE qrcode SET house_id = <new id> WHERE uuid = ... AND
+  house_id = <old id>``. An unowned house the code pointed to is kept
+  unchanged.
+
+If the UPDATE matches no row, another request won the race and the claim
+fails with ``HouseAlreadyClaimed``. House IDs come from the model's ID
+allocation strategy, so there are no ID collisions to retry on either.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from django.db import transaction
+
+from apps.houses.models import House
+from apps.regions.export_jobs import bump_data_version
+from apps.regions.tree import bump_tree_version
+from .models import QRCode
+from .scan_cache import invalidate_scan_cache, invalidate_scan_cache_for
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimError(Exception):
+    """Base class for claims that cannot be completed."""
+
+
+class QRCodeNotFound(ClaimError):
+    pass
+
+
+class HouseAlreadyClaimed(ClaimError):
+    def __init__(self, house_id: int, owner_id: Optional[int], owner_phone: str = ""):
+        super().__init__(f"House {house_id} is already claimed")
+        self.house_id = house_id
+        self.owner_id = owner_id
+        self.owner_phone = owner_phone
+
+
+class ClaimConflict(ClaimError):
+    """The QR code changed while the claim ran; the client may retry."""
+
+
+@dataclass
+class ClaimResult:
+    """Outcome of a successful claim."""
+
+    qr: QRCode
+    house: House
+    created: bool
+
+
+def _get_claim_target(uuid: str) -> dict:
+    row = (
+        QRCode.objects.filter(uuid=uuid)
+        .values(
+            "id",
+            "uuid",
+            "house_id",
+            "house__id",
+            "house__owner_id",
+            "house__owner__phone",
+        )
+        .first()
+    )
+    if row is None:
+        raise QRCodeNotFound(uuid)
+    if row["house__id"] and row["house__owner_id"]:
+        raise HouseAlreadyClaimed(
+            row["house_id"], row["house__owner_id"], row["house__owner__phone"]
+        )
+    return row
+
+
+def _lost_race(uuid: str) -> ClaimError:
+    """Error for a claim whose conditional UPDATE matched no row."""
+    try:
+        _get_claim_target(uuid)
+    except ClaimError as e:
+        return e
+    return ClaimConflict(uuid)
+
+
+def _claim(
+    uuid: str, owner, house_fields: dict, new_house: bool = False
+) -> ClaimResult:
+    row = _get_claim_target(uuid)
+    qr = QRCode(id=row["id"], uuid=row["uuid"], house_id=row["house_id"])
+
+    with transaction.atomic():
+        if new_house or row["house__id"] is None:
+            # No house yet, house_id points to a deleted house, or the
+            # caller always creates one
+            house_id = House.get_next_available_id()
+            linked = QRCode.objects.filter(id=qr.id, house_id=row["house_id"]).update(
+                house_id=house_id
+            )
+            if not linked:
+                raise _lost_race(uuid)
+
+            house = House(id=house_id, owner=owner, **house_fields)
+            house.save(force_insert=True)
+            qr.house_id = house_id
+            created = True
+        else:
+            house_id = row["house_id"]
+            taken = House.objects.filter(id=house_id, owner__isnull=True).update(
+                owner=owner, **house_fields
+            )
+            if not taken:
+                raise _lost_race(uuid)
+
+            house = House(id=house_id, owner=owner, **house_fields)
+            created = False
+
+    # .update() bypasses the signals that drop cached scan responses
+    # and house exports
+    if created:
+        invalidate_scan_cache([qr.uuid])
+    else:
+        invalidate_scan_cache_for(house_id=house.id)
+        bump_data_version()
+        bump_tree_version()
+
+    logger.info(
+        f"QR {qr.uuid} claimed by user {owner.id} "
+        f"({'new' if created else 'existing'} house {house.id})"
+    )
+    return ClaimResult(qr=qr, house=house, created=created)
+
+
+def claim_house(
+    uuid: str, user, mahalla, address: str, house_number: str = ""
+) -> ClaimResult:
+    """
+    Make ``user`` the owner of the house behind QR code ``uuid``.
+
+    Raises:
+        QRCodeNotFound: No QR code with this UUID
+        HouseAlreadyClaimed: The house has an owner (possibly since a moment ago)
+    """
+    return _claim(
+        uuid,
+        user,
+        {"mahalla": mahalla, "address": address, "house_number": house_number},
+    )
+
+
+def agent_claim_house(
+    uuid: str, new_user, mahalla, address: str, house_number: str = ""
+) -> ClaimResult:
+    """
+    Create a house for a user registered by an agent and link QR code ``uuid``
+    to it.
+
+    A new house is created even if the QR code points to an unowned house;
+    the agent's data describes a new registration, so it does not overwrite
+    that house. Must run inside the transaction that created ``new_user`` so
+    a lost race also rolls back the user.
+
+    Raises:
+        QRCodeNotFound: No QR code with this UUID
+        HouseAlreadyClaimed: The house has an owner
+    """
+    return _claim(
+        uuid,
+        new_user,
+        {
+            "mahalla": mahalla,
+            "address": address,
+            "house_number": house_number,
+            "created_by_agent": True,
+        },
+        # Announced by the post_save signal of the new house
+        new_house=True,
+    )
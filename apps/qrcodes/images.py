@@ -0,0 +1,59 @@
+"""
+On-demand QR code images.
+
+A QR code image is fully determined by ``QRCode.get_qr_url()``, so images
+are rendered when requested instead of being stored per row. Rendered
+images are kept in a bounded in-process LRU cache, and the ETag is derived
+from the encoded URL so it can be checked without rendering anything.
+"""
+
+import hashlib
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+from .rendering import RENDERER_VERSION, render_png, render_svg
+
+RENDERERS: Dict[str, Callable[[str], bytes]] = {
+    "png": render_png,
+    "svg": render_svg,
+}
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+_render_cached: Optional[Callable[[str, str], bytes]] = None
+
+
+def _get_render_cached() -> Callable[[str, str], bytes]:
+    global _render_cached
+    if _render_cached is None:
+
+        @lru_cache(maxsize=getattr(settings, "QR_IMAGE_CACHE_SIZE", 1024))
+        def render(url: str, fmt: str) -> bytes:
+            return RENDERERS[fmt](url)
+
+        _render_cached = render
+    return _render_cached
+
+
+def image_etag(url: str, fmt: str) -> str:
+    """Strong ETag for the image of ``url`` in format ``fmt``."""
+    digest = hashlib.sha256(f"{RENDERER_VERSION}:{fmt}:{url}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def get_image(url: str, fmt: str) -> bytes:
+    """
+    Image bytes of the QR code for ``url``, rendered at most once per process
+    while it stays in the LRU cache.
+
+    Raises:
+        KeyError: If ``fmt`` is not a supported format
+    """
+    if fmt not in RENDERERS:
+        raise KeyError(fmt)
+    return _get_render_cached()(url, fmt)
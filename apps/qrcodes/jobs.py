@@ -0,0 +1,158 @@
+"""
+Background bulk QR code generation.
+
+Jobs are created by ``BulkQRCodeGenerateView`` and processed by the
+``run_qr_generation_jobs`` management command. Codes are generated and
+committed in chunks, so a job of 100k codes never holds more than one
+chunk of PNGs in memory or one long transaction open, and its progress is
+visible while it runs.
+"""
+
+import logging
+import os
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import qr_png_name, write_zip
+from .generation import generate_qr_codes
+from .models import QRGenerationJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobLost(Exception):
+    """The job stopped being ours (failed as stale) while it was running."""
+
+
+def get_chunk_size() -> int:
+    return getattr(settings, "QR_JOB_CHUNK_SIZE", 1000)
+
+
+def job_filename(job: QRGenerationJob) -> str:
+    """Name of the ZIP file a job writes to MEDIA_ROOT/qr_downloads."""
+    return f"qrcodes_{job.created_by_id}_{job.id.hex[:12]}.zip"
+
+
+def fail_stale_jobs() -> int:
+    """
+    Fail jobs whose worker died mid-run (OOM, restart during a deploy).
+
+    Such jobs cannot be resumed: the codes generated so far are kept, but
+    they are not in any ZIP file, so the job is failed and the client stops
+    polling. A running job whose worker reported no progress (``heartbeat_at``)
+    for QR_JOB_TIMEOUT seconds counts as dead, however long it has run.
+
+    Returns:
+        Number of jobs failed
+    """
+    timeout = getattr(settings, "QR_JOB_TIMEOUT", 600)
+    cutoff = timezone.now() - timezone.timedelta(seconds=timeout)
+    failed = QRGenerationJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff)
+        | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status="running",
+    ).update(
+        status="failed",
+        error_message="Worker stopped before the job finished",
+        finished_at=timezone.now(),
+    )
+    if failed:
+        logger.warning(f"Failed {failed} stale QR generation jobs")
+    return failed
+
+
+def claim_next_job() -> Optional[QRGenerationJob]:
+    """
+    Mark the oldest pending job as running and return it.
+
+    Rows locked by other workers are skipped, so several workers can run
+    side by side.
+    """
+    with transaction.atomic():
+        job = (
+            QRGenerationJob.objects.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=["status", "started_at", "heartbeat_at"])
+    return job
+
+
+def _iter_job_entries(
+    job: QRGenerationJob, chunk_size: int
+) -> Iterator[Tuple[str, bytes]]:
+    """Generate the job's codes chunk by chunk, yielding archive entries."""
+    while job.generated < job.count:
+        size = min(chunk_size, job.count - job.generated)
+        result = generate_qr_codes(size)
+
+        job.generated += size
+        job.heartbeat_at = timezone.now()
+        updated = QRGenerationJob.objects.filter(id=job.id, status="running").update(
+            generated=job.generated, heartbeat_at=job.heartbeat_at
+        )
+        if not updated:
+            raise JobLost(f"Job {job.id} is no longer running")
+
+        for qr in result.codes:
+            yield qr_png_name(qr), result.images[qr.uuid]
+
+
+def run_job(job: QRGenerationJob, chunk_size: Optional[int] = None) -> None:
+    """
+    Generate all codes of a running job and write them to its ZIP file.
+
+    Failures are stored on the job; codes of chunks that were already
+    committed are kept. The final status is only written while the job is
+    still running, so a job failed as stale in the meantime stays failed.
+    """
+    job.filename = job_filename(job)
+    zip_path = os.path.join(settings.MEDIA_ROOT, "qr_downloads", job.filename)
+
+    try:
+        write_zip(zip_path, _iter_job_entries(job, chunk_size or get_chunk_size()))
+    except Exception as e:
+        logger.exception(f"QR generation job {job.id} failed")
+        job.status = "failed"
+        job.error_message = str(e)
+        job.filename = ""
+    else:
+        job.status = "completed"
+        logger.info(f"QR generation job {job.id} completed: {job.count} codes")
+
+    job.finished_at = timezone.now()
+    finished = QRGenerationJob.objects.filter(id=job.id, status="running").update(
+        status=job.status,
+        error_message=job.error_message,
+        filename=job.filename,
+        finished_at=job.finished_at,
+    )
+    if not finished:
+        logger.warning(f"QR generation job {job.id} was no longer running")
+        job.refresh_from_db()
+
+
+def run_pending_jobs(chunk_size: Optional[int] = None) -> int:
+    """
+    Process pending jobs until none are left.
+
+    Returns:
+        Number of jobs processed
+    """
+    fail_stale_jobs()
+    processed = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return processed
+        run_job(job, chunk_size)
+        processed += 1
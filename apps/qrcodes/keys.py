@@ -0,0 +1,238 @@
+"""
+QR keys and cheap rejection of unknown keys.
+
+A QR key is 16 lowercase hex characters. New keys are 12 random hex
+characters followed by a 4 hex character HMAC tag, so a key issued by this
+server can be recognised without a database lookup. Legacy keys (16 random
+hex characters) keep working: unsigned keys are checked against a Bloom
+filter of all keys in the database and a bounded negative cache of keys
+known to be missing, and only reach the ORM if both let them through.
+
+The Bloom filter is built and rebuilt by a background thread per process,
+started from ``config/wsgi.py`` and ``config/asgi.py`` when a server worker
+loads the application. Until the first build finishes, unsigned keys go to
+the database as if there were no filter.
+"""
+
+import hashlib
+import hmac
+import logging
+import math
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils.crypto import salted_hmac
+
+logger = logging.getLogger(__name__)
+
+KEY_LENGTH = 16
+RANDOM_LENGTH = 12
+KEY_RE = re.compile(r"[0-9a-f]{16}")
+
+_KEY_SALT = "apps.qrcodes.keys"
+
+
+def _tag(random_part: str) -> str:
+    secret = getattr(settings, "QR_KEY_SECRET", None) or None
+    digest = salted_hmac(_KEY_SALT, random_part, secret=secret, algorithm="sha256")
+    return digest.hexdigest()[: KEY_LENGTH - RANDOM_LENGTH]
+
+
+def generate_key() -> str:
+    """Generate a new signed 16-character QR key."""
+    random_part = secrets.token_hex(RANDOM_LENGTH // 2)
+    return random_part + _tag(random_part)
+
+
+def is_well_formed(key: str) -> bool:
+    """Whether ``key`` has the format of a QR key (signed or legacy)."""
+    return bool(key) and KEY_RE.fullmatch(key) is not None
+
+
+def is_signed(key: str) -> bool:
+    """Whether ``key`` carries a valid tag, i.e. was issued by this server."""
+    if not is_well_formed(key):
+        return False
+    return hmac.compare_digest(key[RANDOM_LENGTH:], _tag(key[:RANDOM_LENGTH]))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class NegativeCache:
+    """Bounded LRU of keys known to be missing, each kept for ``ttl`` seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+
+class KeyIndex:
+    """
+    Per-process index answering "might this key exist?" without the ORM.
+
+    The Bloom filter is built from the database by a background thread
+    (see ``start``) and rebuilt every ``QR_KEY_BLOOM_REBUILD_SECONDS``, so
+    lookups never wait for a table scan.
+    """
+
+    def __init__(self):
+        self._bloom: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.missing = NegativeCache(
+            getattr(settings, "QR_NEGATIVE_CACHE_SIZE", 10000),
+            getattr(settings, "QR_NEGATIVE_CACHE_TTL", 300),
+        )
+
+    def build(self, keys: Optional[Iterable[str]] = None) -> BloomFilter:
+        """Rebuild the Bloom filter from ``keys`` (default: all QR keys)."""
+        from .models import QRCode
+
+        if keys is None:
+            capacity = QRCode.objects.count()
+            keys = QRCode.objects.values_list("uuid", flat=True).iterator(
+                chunk_size=10000
+            )
+        else:
+            keys = list(keys)
+            capacity = len(keys)
+
+        bloom = BloomFilter(capacity + 1024)
+        for key in keys:
+            bloom.add(key)
+
+        self._bloom = bloom
+        return bloom
+
+    def start(self) -> None:
+        """Start the thread that builds and rebuilds the Bloom filter."""
+        with self._lock:
+            # Threads do not survive a fork, so a forked worker starts its own
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._refresh_loop, name="qr-key-bloom", daemon=True
+            )
+            self._thread.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            delay = getattr(settings, "QR_KEY_BLOOM_REBUILD_SECONDS", 3600)
+            try:
+                started = time.monotonic()
+                bloom = self.build()
+                logger.info(
+                    f"QR key Bloom filter built: {bloom.size} bits in "
+                    f"{time.monotonic() - started:.1f}s"
+                )
+            except Exception:
+                logger.exception("Failed to build the QR key Bloom filter")
+                delay = min(delay, 60)
+            finally:
+                # The thread's own connection, idle until the next rebuild
+                connection.close()
+            time.sleep(delay)
+
+    def _get_bloom(self) -> Optional[BloomFilter]:
+        if self._pid != os.getpid():
+            # Not started in this process (runserver, forked worker)
+            self.start()
+        return self._bloom
+
+    def may_exist(self, key: str) -> bool:
+        """
+        False if ``key`` certainly does not exist; True means "ask the DB".
+        """
+        if not is_well_formed(key):
+            return False
+        if is_signed(key):
+            return True
+        if key in self.missing:
+            return False
+        bloom = self._get_bloom()
+        # No filter yet: the first build is still running
+        return bloom is None or key in bloom
+
+
+_index: Optional[KeyIndex] = None
+
+
+def get_key_index() -> KeyIndex:
+    global _index
+    if _index is None:
+        _index = KeyIndex()
+    return _index
+
+
+def start_key_index() -> None:
+    """Build the Bloom filter of QR keys in the background (server startup)."""
+    get_key_index().start()
+
+
+def may_exist(key: str) -> bool:
+    """Shortcut for ``get_key_index().may_exist(key)``."""
+    return get_key_index().may_exist(key)
+
+
+def remember_missing(key: str) -> None:
+    """Record that ``key`` was looked up and not found."""
+    if is_well_formed(key) and not is_signed(key):
+        get_key_index().missing.add(key)
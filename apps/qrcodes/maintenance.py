@@ -0,0 +1,95 @@
+"""
+Periodic data maintenance for QR codes.
+
+Run through the ``cleanup_orphaned_qr_houses`` management command, not in
+the request path.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from apps.houses.models import House
+from .models import QRCode
+from .scan_cache import invalidate_scan_cache
+
+logger = logging.getLogger(__name__)
+
+REPORT_SAMPLE_SIZE = 20
+
+
+@dataclass
+class OrphanCleanupReport:
+    """What an orphaned house_id cleanup found and fixed."""
+
+    found: int = 0
+    fixed: int = 0
+    batches: int = 0
+    dry_run: bool = False
+    duration: float = 0.0
+    # (QR id, missing house id) pairs, first REPORT_SAMPLE_SIZE only
+    sample: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def orphaned_qrcodes():
+    """QR codes whose house_id points to a house that no longer exists."""
+    return QRCode.objects.filter(house_id__isnull=False).filter(
+        ~Exists(House.objects.filter(id=OuterRef("house_id")))
+    )
+
+
+def cleanup_orphaned_house_ids(
+    batch_size: int = 1000, dry_run: bool = False
+) -> OrphanCleanupReport:
+    """
+    Unlink QR codes from houses that no longer exist.
+
+    Orphans are found with a single anti-join and fixed in batches, each
+    batch in its own short transaction.
+
+    Args:
+        batch_size: QR codes updated per transaction
+        dry_run: Only count and sample the orphans
+
+    Returns:
+        OrphanCleanupReport
+    """
+    started = time.perf_counter()
+    report = OrphanCleanupReport(dry_run=dry_run)
+
+    report.found = orphaned_qrcodes().count()
+    report.sample = list(
+        orphaned_qrcodes()
+        .order_by("id")
+        .values_list("id", "house_id")[:REPORT_SAMPLE_SIZE]
+    )
+
+    if not dry_run:
+        while True:
+            batch = list(
+                orphaned_qrcodes().order_by("id").values_list("id", "uuid")[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                # Re-checked inside the update, a house may have been restored
+                fixed = (
+                    orphaned_qrcodes()
+                    .filter(id__in=[qr_id for qr_id, _ in batch])
+                    .update(house_id=None)
+                )
+                invalidate_scan_cache(qr_uuid for _, qr_uuid in batch)
+            report.fixed += fixed
+            report.batches += 1
+
+    report.duration = time.perf_counter() - started
+    if report.found and not dry_run:
+        logger.warning(
+            f"Orphaned house_ids: found {report.found}, fixed {report.fixed} "
+            f"in {report.batches} batches ({report.duration:.2f}s)"
+        )
+    return report
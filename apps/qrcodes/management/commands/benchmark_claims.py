@@ -0,0 +1,158 @@
+import statistics
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models.signals import post_save
+
+from apps.houses.models import House
+from apps.houses.signals import house_post_save
+from apps.qrcodes.claims import ClaimError, claim_house
+from apps.qrcodes.models import QRCode
+from apps.regions.models import District, Mahalla, Region
+from apps.users.models import User
+
+PHONE_PREFIX = "+99800"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent house claims against the configured database and "
+        "report throughput, latency and outcomes. Creates its own region, "
+        "users and QR codes and removes them afterwards. Meant for a local "
+        "PostgreSQL database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Number of concurrent clients"
+        )
+        parser.add_argument(
+            "--qrcodes",
+            type=int,
+            default=50,
+            help="Number of QR codes the clients compete for",
+        )
+        parser.add_argument(
+            "--claims",
+            type=int,
+            default=50,
+            help="Claims attempted by each client",
+        )
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads < 1 or options["qrcodes"] < 1 or options["claims"] < 1:
+            raise CommandError("--threads, --qrcodes and --claims must be positive")
+        if connection.vendor != "postgresql":
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Running on {connection.vendor}; contention numbers are "
+                    f"only meaningful on PostgreSQL."
+                )
+            )
+
+        # No Telegram/SMS notifications for benchmark houses
+        post_save.disconnect(house_post_save, sender=House)
+        region = Region.objects.create(name="Claim benchmark")
+        district = District.objects.create(region=region, name="Benchmark")
+        mahalla = Mahalla.objects.create(district=district, name="Benchmark")
+        users = [
+            User.objects.create(phone=f"{PHONE_PREFIX}{i:07d}") for i in range(threads)
+        ]
+        uuids = [QRCode.objects.create().uuid for _ in range(options["qrcodes"])]
+
+        try:
+            results = [None] * threads
+            barrier = threading.Barrier(threads)
+            workers = [
+                threading.Thread(
+                    target=self.run_client,
+                    args=(i, users[i], mahalla, uuids, options["claims"]),
+                    kwargs={"barrier": barrier, "results": results},
+                )
+                for i in range(threads)
+            ]
+
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+            outcomes = self.report(results, elapsed)
+            self.verify(uuids, users, outcomes["claimed"])
+        finally:
+            House.objects.filter(mahalla=mahalla).delete()
+            QRCode.objects.filter(uuid__in=uuids).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+            region.delete()
+            post_save.connect(house_post_save, sender=House)
+
+    def run_client(self, index, user, mahalla, uuids, claims, barrier, results):
+        timings = []
+        outcomes = Counter()
+        # Clients walk the codes from different offsets so they collide
+        offset = index * len(uuids) // len(results)
+        try:
+            barrier.wait()
+            for i in range(claims):
+                uuid = uuids[(offset + i) % len(uuids)]
+                started = time.perf_counter()
+                try:
+                    claim_house(uuid, user, mahalla, address=f"Benchmark {i}")
+                    outcomes["claimed"] += 1
+                except ClaimError as e:
+                    outcomes[type(e).__name__] += 1
+                except Exception as e:
+                    outcomes[f"error: {type(e).__name__}"] += 1
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+        results[index] = (timings, outcomes)
+
+    def report(self, results, elapsed: float):
+        timings = sorted(t for result in results for t in result[0])
+        outcomes = Counter()
+        for result in results:
+            outcomes.update(result[1])
+
+        quantiles = (
+            statistics.quantiles(timings, n=100, method="inclusive")
+            if len(timings) > 1
+            else timings * 99
+        )
+        self.stdout.write(
+            f"{len(timings)} claims by {len(results)} clients in {elapsed:.2f}s "
+            f"({len(timings) / elapsed:.0f} claims/s)"
+        )
+        self.stdout.write(
+            f"latency ms: mean {statistics.mean(timings):.2f}, "
+            f"p50 {quantiles[49]:.2f}, p95 {quantiles[94]:.2f}, "
+            f"p99 {quantiles[98]:.2f}, max {timings[-1]:.2f}"
+        )
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f"  {outcome}: {count}")
+        return outcomes
+
+    def verify(self, uuids, users, claimed: int):
+        """Each successful claim owns one code and no code has two owners."""
+        owned = (
+            QRCode.objects.filter(uuid__in=uuids, house__owner__in=users)
+            .values("house_id")
+            .distinct()
+            .count()
+        )
+        houses = House.objects.filter(owner__in=users).count()
+
+        if not owned == houses == claimed:
+            raise CommandError(
+                f"Inconsistent result: {claimed} successful claims, "
+                f"{houses} houses, {owned} owned QR codes"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"{claimed} codes claimed, each by exactly one user")
+        )
@@ -0,0 +1,217 @@
+import statistics
+import time
+from io import BytesIO
+
+import qrcode
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from qrcode.util import mask_func
+
+from apps.qrcodes.models import QRCode
+from apps.qrcodes.rendering import (
+    BORDER,
+    BOX_SIZE,
+    ERROR_CORRECTION,
+    fixed_format,
+    make_fixed_qr,
+    render_png,
+    render_png_reference,
+)
+
+
+def _png_to_matrix(png: bytes, size: int):
+    """Read the module matrix back from a rendered PNG."""
+    img = Image.open(BytesIO(png)).convert("L")
+    offset = BORDER * BOX_SIZE + BOX_SIZE // 2
+    return [
+        [
+            img.getpixel((offset + x * BOX_SIZE, offset + y * BOX_SIZE)) < 128
+            for x in range(size)
+        ]
+        for y in range(size)
+    ]
+
+
+def _module_layout(version: int):
+    """
+    Module positions of a ``version`` symbol by role.
+
+    Returns:
+        tuple: (finder, alignment and timing pattern positions, data and
+        error correction positions); format and version information,
+        which depend on the mask, are in neither
+    """
+    template = qrcode.QRCode(version=version, error_correction=ERROR_CORRECTION)
+    template.modules_count = version * 4 + 17
+    template.modules = [
+        [None] * template.modules_count for _ in range(template.modules_count)
+    ]
+
+    def positions(filled: bool):
+        return [
+            (row, col)
+            for row, line in enumerate(template.modules)
+            for col, value in enumerate(line)
+            if (value is not None) == filled
+        ]
+
+    template.setup_position_probe_pattern(0, 0)
+    template.setup_position_probe_pattern(template.modules_count - 7, 0)
+    template.setup_position_probe_pattern(0, template.modules_count - 7)
+    template.setup_position_adjust_pattern()
+    template.setup_timing_pattern()
+    patterns = positions(filled=True)
+    template.setup_type_info(True, 0)
+    if version >= 7:
+        template.setup_type_number(True)
+    return patterns, positions(filled=False)
+
+
+def _unmasked(modules, mask_pattern: int, positions):
+    """Data modules with the mask removed, i.e. the encoded bits."""
+    is_masked = mask_func(mask_pattern)
+    return [modules[row][col] != is_masked(row, col) for row, col in positions]
+
+
+def _decode(png: bytes):
+    """
+    Decode a QR code PNG with pyzbar or OpenCV, whichever is installed.
+
+    Returns:
+        The decoded text, or None if no decoder is installed
+    """
+    try:
+        from pyzbar.pyzbar import decode
+    except ImportError:
+        pass
+    else:
+        results = decode(Image.open(BytesIO(png)))
+        return results[0].data.decode() if results else ""
+
+    try:
+        import cv2
+        import numpy
+    except ImportError:
+        return None
+    image = cv2.imdecode(numpy.frombuffer(png, numpy.uint8), cv2.IMREAD_GRAYSCALE)
+    text, _, _ = cv2.QRCodeDetector().detectAndDecode(image)
+    return text
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the fixed-format QR encoder with the library's full search "
+        "and PIL rendering, and verify that both produce the same codes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=500, help="Number of codes to render"
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Check every fast-path code module by module",
+        )
+
+    def handle(self, *args, **options):
+        urls = [
+            QRCode(uuid=QRCode.generate_uuid()).get_qr_url()
+            for _ in range(options["count"])
+        ]
+        version, mask_pattern = fixed_format(urls[0])
+        self.stdout.write(
+            f"URL length {len(urls[0])}: version {version}, mask {mask_pattern}"
+        )
+
+        for name, render in (
+            ("reference", render_png_reference),
+            ("fast", render_png),
+        ):
+            timings, sizes = [], []
+            for url in urls:
+                started = time.perf_counter()
+                png = render(url)
+                timings.append((time.perf_counter() - started) * 1000)
+                sizes.append(len(png))
+            self.stdout.write(
+                f"{name:>10}: {statistics.mean(timings):.3f} ms/code, "
+                f"{1000 / statistics.mean(timings):.0f} codes/s, "
+                f"{statistics.mean(sizes):.0f} bytes/PNG"
+            )
+
+        if options["verify"]:
+            self.verify(urls)
+
+    def verify(self, urls):
+        """
+        Check that each fast-path code encodes its URL.
+
+        The fast path reuses the mask chosen for the first URL of the same
+        length, so its mask usually differs from the one a full search picks
+        for a given URL. Any of the eight masks is valid: decoders read it
+        from the format information. Each code is checked
+
+        - against an independent full-search encoding (own version and
+          mask): same version, same function patterns, and the same data
+          and error correction bits once each matrix's mask is removed;
+        - against the library at the fast path's mask, which also covers
+          the format information for that mask;
+        - by decoding the PNG back to the URL, if pyzbar or OpenCV is
+          installed; and the PNG must reproduce the matrix pixel for pixel.
+        """
+        decoded = 0
+        layouts = {}
+        for url in urls:
+            fast = make_fixed_qr(url)
+
+            expected = qrcode.QRCode(
+                version=fast.version,
+                error_correction=ERROR_CORRECTION,
+                mask_pattern=fast.mask_pattern,
+            )
+            expected.add_data(url)
+            expected.make(fit=False)
+            if fast.modules != expected.modules:
+                raise CommandError(f"Matrix mismatch for {url}")
+
+            # What make(fit=True) does, keeping the mask the search picked
+            searched = qrcode.QRCode(error_correction=ERROR_CORRECTION)
+            searched.add_data(url)
+            searched.best_fit()
+            searched_mask = searched.best_mask_pattern()
+            searched.makeImpl(False, searched_mask)
+            if searched.version != fast.version:
+                raise CommandError(
+                    f"Version mismatch for {url}: "
+                    f"{fast.version} != {searched.version}"
+                )
+            if fast.version not in layouts:
+                layouts[fast.version] = _module_layout(fast.version)
+            patterns, data = layouts[fast.version]
+            if any(
+                fast.modules[row][col] != searched.modules[row][col]
+                for row, col in patterns
+            ):
+                raise CommandError(f"Function patterns differ for {url}")
+            if _unmasked(fast.modules, fast.mask_pattern, data) != _unmasked(
+                searched.modules, searched_mask, data
+            ):
+                raise CommandError(f"Encoded data differs for {url}")
+
+            png = render_png(url)
+            if _png_to_matrix(png, len(fast.modules)) != fast.modules:
+                raise CommandError(f"PNG does not match the matrix for {url}")
+            text = _decode(png)
+            if text is not None:
+                if text != url:
+                    raise CommandError(f"PNG decodes to {text!r}, not {url}")
+                decoded += 1
+
+        if decoded:
+            self.stdout.write(f"Decoded {decoded} PNGs back to their URLs")
+        else:
+            self.stdout.write(
+                "No QR decoder installed (pyzbar or opencv-python), " "decoding skipped"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✓ {len(urls)} codes verified"))
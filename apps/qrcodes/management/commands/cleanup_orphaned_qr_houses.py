@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from apps.qrcodes.maintenance import cleanup_orphaned_house_ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Unlink QR codes whose house_id points to a deleted house. "
+        "Meant to run periodically (cron or systemd timer)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the orphaned QR codes",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="QR codes updated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        report = cleanup_orphaned_house_ids(
+            batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+
+        if not report.found:
+            self.stdout.write(self.style.SUCCESS("✓ No orphaned house_ids found"))
+            return
+
+        self.stdout.write(f"Found {report.found} QR codes with orphaned house_ids")
+        for qr_id, house_id in report.sample:
+            self.stdout.write(f"  QR #{qr_id} -> missing house #{house_id}")
+        if report.found > len(report.sample):
+            self.stdout.write(f"  ... and {report.found - len(report.sample)} more")
+
+        if report.dry_run:
+            self.stdout.write("Dry run, nothing changed")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✓ Fixed {report.fixed} QR codes in {report.batches} batches "
+                    f"({report.duration:.2f}s)"
+                )
+            )
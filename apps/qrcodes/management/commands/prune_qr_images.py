@@ -0,0 +1,54 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.qrcodes.models import QRCode
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored QR code PNGs and clear QRCode.image. Images are served "
+        "on demand by /api/qrcodes/<uuid>/image.png, so the files are redundant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many images would be removed",
+        )
+        parser.add_argument(
+            "--keep-files",
+            action="store_true",
+            help="Clear the field but leave the files in MEDIA_ROOT",
+        )
+
+    def handle(self, *args, **options):
+        queryset = QRCode.objects.exclude(image__isnull=True).exclude(image="")
+        total = queryset.count()
+
+        if options["dry_run"]:
+            self.stdout.write(f"{total} QR code images would be removed")
+            return
+
+        removed = 0
+        while True:
+            batch = list(
+                queryset.order_by("id").values_list("id", "image")[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+
+            if not options["keep_files"]:
+                for _, name in batch:
+                    if default_storage.exists(name):
+                        default_storage.delete(name)
+
+            QRCode.objects.filter(id__in=[qr_id for qr_id, _ in batch]).update(
+                image=None
+            )
+            removed += len(batch)
+            self.stdout.write(f"  {removed}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Removed {removed} QR code images"))
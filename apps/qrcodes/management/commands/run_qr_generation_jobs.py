@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.qrcodes.jobs import get_chunk_size, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Process background bulk QR code generation jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the pending jobs and exit instead of polling",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Codes generated and committed per step (default: QR_JOB_CHUNK_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"] or get_chunk_size()
+        self.stdout.write(f"Processing QR generation jobs (chunk size {chunk_size})")
+
+        try:
+            while True:
+                processed = run_pending_jobs(chunk_size)
+                if processed:
+                    self.stdout.write(self.style.SUCCESS(f"✓ {processed} jobs done"))
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
@@ -0,0 +1,94 @@
+# Generated by Django 5.2 on 2026-10-18 16:32
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("qrcodes", "0008_qrcode_is_scanned"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QRGenerationJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Status",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(verbose_name="Requested count")),
+                (
+                    "generated",
+                    models.PositiveIntegerField(default=0, verbose_name="Generated"),
+                ),
+                (
+                    "filename",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="ZIP file"
+                    ),
+                ),
+                (
+                    "error_message",
+                    models.TextField(blank=True, null=True, verbose_name="Error"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Started at"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Finished at"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="qr_generation_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Created by",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "QR Generation Job",
+                "verbose_name_plural": "QR Generation Jobs",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
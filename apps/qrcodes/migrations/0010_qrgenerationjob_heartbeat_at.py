@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("qrcodes", "0009_qrgenerationjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="qrgenerationjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Last progress at"
+            ),
+        ),
+    ]
@@ -1,14 +1,15 @@
 import uuid
-import qrcode
-from io import BytesIO
 from typing import Optional
 
 from django.db import models
-from django.core.files import File
+from django.core.files.base import ContentFile
 from django.conf import settings
+from django.urls import reverse
 
 from apps.houses.models import House
 from apps.utils import GapFillingIDMixin
+from .keys import generate_key
+from .rendering import render_png
 
 
 class QRCode(GapFillingIDMixin, models.Model):
@@ -46,15 +47,19 @@ class QRCode(GapFillingIDMixin, models.Model):
         ordering = ["id"]
 
     def save(self, *args, **kwargs) -> None:
-        """Generate UUID and QR image if not exists before saving."""
+        """Generate UUID (and QR image if QR_STORE_IMAGES is on) before saving."""
         if not self.uuid:
-            self.uuid = uuid.uuid4().hex[:16]
+            self.uuid = self.generate_uuid()
 
         # Generate QR image if this is a new object or image doesn't exist
         is_new = self.pk is None
 
         super().save(*args, **kwargs)
 
+        # Images are rendered on demand unless storing them is enabled
+        if not getattr(settings, "QR_STORE_IMAGES", False):
+            return
+
         # Generate image after first save (so we have an ID)
         if is_new or not self.image:
             self.generate_qr_image()
@@ -62,6 +67,11 @@ class QRCode(GapFillingIDMixin, models.Model):
                 # Save again to update the image field
                 super().save(update_fields=["image"])
 
+    @staticmethod
+    def generate_uuid() -> str:
+        """Generate a new signed 16-character QR key (see apps.qrcodes.keys)."""
+        return generate_key()
+
     def get_qr_url(self) -> str:
         """
         Get Telegram bot URL with QR code ID.
@@ -74,6 +84,18 @@ class QRCode(GapFillingIDMixin, models.Model):
         bot_username = getattr(settings, "TELEGRAM_BOT_USERNAME", "qrmahallabot")
         return f"https://t.me/{bot_username}/start?startapp=QR_KEY_{self.uuid}"
 
+    def get_image_path(self, fmt: str = "png") -> str:
+        """
+        Get the path of the on-demand image endpoint.
+
+        Args:
+            fmt: Image format, "png" or "svg"
+
+        Returns:
+            URL path such as /api/qrcodes/{uuid}/image.png
+        """
+        return reverse("qr-image", kwargs={"uuid": self.uuid, "fmt": fmt})
+
     def generate_qr_image(self) -> None:
         """
         Generate QR code image with Telegram bot URL.
@@ -84,22 +106,77 @@ class QRCode(GapFillingIDMixin, models.Model):
         if self.image:
             return
 
-        qr_url = self.get_qr_url()
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_url)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        self.image.save(f"{self.uuid}.png", File(buffer), save=False)
+        png = render_png(self.get_qr_url())
+        self.image.save(f"{self.uuid}.png", ContentFile(png), save=False)
 
     def __str__(self) -> str:
         """String representation of QR code."""
         return f"QR #{self.id} - {self.uuid}"
+
+
+class QRGenerationJob(models.Model):
+    """
+    Bulk QR code generation running in the background.
+
+    Created by the bulk generation endpoint for large counts and processed
+    by the ``run_qr_generation_jobs`` management command.
+    """
+
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    )
+
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False, verbose_name="ID"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="pending",
+        verbose_name="Status",
+        db_index=True,
+    )
+
+    count = models.PositiveIntegerField(verbose_name="Requested count")
+    generated = models.PositiveIntegerField(default=0, verbose_name="Generated")
+
+    created_by = models.ForeignKey(
+        "users.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="qr_generation_jobs",
+        verbose_name="Created by",
+    )
+
+    filename = models.CharField(max_length=255, blank=True, verbose_name="ZIP file")
+    error_message = models.TextField(blank=True, null=True, verbose_name="Error")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created at")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started at")
+    # Updated by the worker after every chunk; a stale value means it died
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Last progress at"
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Finished at"
+    )
+
+    class Meta:
+        verbose_name = "QR Generation Job"
+        verbose_name_plural = "QR Generation Jobs"
+        ordering = ["-created_at"]
+
+    @property
+    def progress(self) -> float:
+        """Completed share of the job, in percent."""
+        if not self.count:
+            return 0.0
+        return round(self.generated * 100 / self.count, 1)
+
+    def __str__(self) -> str:
+        return f"Job {self.id} - {self.generated}/{self.count} ({self.status})"
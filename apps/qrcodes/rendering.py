@@ -0,0 +1,176 @@
+"""
+QR code image rendering.
+
+Kept free of Django imports so the functions can run in worker processes
+of a process pool.
+
+Every code encodes a Telegram start URL of the same shape, so the encoder
+runs in a fixed-format mode: the version and mask pattern are chosen once
+per URL length, instead of searching all versions and scoring all 8 mask
+patterns for every code. PNGs are written as 1-bit palette images straight
+from the module matrix, without drawing a PIL image.
+"""
+
+import struct
+import zlib
+from io import BytesIO
+from typing import Dict, List, Tuple
+
+import qrcode
+import qrcode.image.svg
+from qrcode.exceptions import DataOverflowError
+
+BOX_SIZE = 10
+BORDER = 4
+ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_L
+
+# Bump when the output of the renderers changes, so cached images
+# (ETags, browser and proxy caches) are invalidated
+RENDERER_VERSION = "2"
+
+# Palette index 0 is the light colour, index 1 the dark colour
+PNG_PALETTE = b"\xff\xff\xff\x00\x00\x00"
+
+# (version, mask pattern) per encoded data length
+_fixed_formats: Dict[int, Tuple[int, int]] = {}
+
+
+def _make_qr(data: str) -> qrcode.QRCode:
+    """Encode ``data`` with the library's full version and mask search."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=ERROR_CORRECTION,
+        box_size=BOX_SIZE,
+        border=BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def fixed_format(data: str) -> Tuple[int, int]:
+    """
+    Version and mask pattern used for all data of the same length as ``data``.
+
+    Chosen by a full search on the first value of each length seen by the
+    process and reused afterwards.
+    """
+    length = len(data.encode("utf-8"))
+    fmt = _fixed_formats.get(length)
+    if fmt is None:
+        qr = _make_qr(data)
+        fmt = _fixed_formats[length] = (qr.version, qr.best_mask_pattern())
+    return fmt
+
+
+def make_fixed_qr(data: str) -> qrcode.QRCode:
+    """Encode ``data`` with the fixed version and mask for its length."""
+    version, mask_pattern = fixed_format(data)
+    qr = qrcode.QRCode(
+        version=version,
+        error_correction=ERROR_CORRECTION,
+        box_size=BOX_SIZE,
+        border=BORDER,
+        mask_pattern=mask_pattern,
+    )
+    qr.add_data(data)
+    try:
+        qr.make(fit=False)
+    except DataOverflowError:
+        # Same length but a less compact encoding, use the full search
+        return _make_qr(data)
+    return qr
+
+
+def _png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(payload))
+        + kind
+        + payload
+        + struct.pack(">I", zlib.crc32(kind + payload))
+    )
+
+
+def matrix_to_png(
+    modules: List[List[bool]], box_size: int = BOX_SIZE, border: int = BORDER
+) -> bytes:
+    """
+    Write a QR module matrix as a 1-bit palette PNG.
+
+    Args:
+        modules: Module matrix without the quiet zone (True = dark)
+        box_size: Pixels per module
+        border: Quiet zone width in modules
+
+    Returns:
+        PNG file contents
+    """
+    count = len(modules) + border * 2
+    size = count * box_size
+    padding = -size % 8
+    row_bytes = (size + padding) // 8
+
+    light = b"\x00" + bytes(row_bytes)
+    quiet_zone = light * (border * box_size)
+
+    scanlines = [quiet_zone]
+    light_box = "0" * box_size
+    dark_box = "1" * box_size
+    edge = light_box * border
+    for row in modules:
+        bits = edge + "".join(dark_box if m else light_box for m in row) + edge
+        line = b"\x00" + int(bits + "0" * padding, 2).to_bytes(row_bytes, "big")
+        scanlines.append(line * box_size)
+    scanlines.append(quiet_zone)
+
+    header = struct.pack(">IIBBBBB", size, size, 1, 3, 0, 0, 0)
+    return b"".join(
+        (
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"PLTE", PNG_PALETTE),
+            _png_chunk(b"IDAT", zlib.compress(b"".join(scanlines))),
+            _png_chunk(b"IEND", b""),
+        )
+    )
+
+
+def render_png(data: str) -> bytes:
+    """
+    Render ``data`` as a black-on-white PNG QR code.
+
+    Args:
+        data: Text to encode (the Telegram bot URL)
+
+    Returns:
+        PNG file contents
+    """
+    return matrix_to_png(make_fixed_qr(data).modules)
+
+
+def render_png_reference(data: str) -> bytes:
+    """
+    Render ``data`` through the library's full search and PIL image.
+
+    Slow path, kept to benchmark and verify ``render_png`` against.
+    """
+    img = _make_qr(data).make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_svg(data: str) -> bytes:
+    """
+    Render ``data`` as an SVG QR code (a single path element).
+
+    Args:
+        data: Text to encode (the Telegram bot URL)
+
+    Returns:
+        SVG document bytes
+    """
+    img = make_fixed_qr(data).make_image(image_factory=qrcode.image.svg.SvgPathImage)
+    buffer = BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,157 @@
+"""
+Cache of QR scan payloads.
+
+The scan endpoints join QRCode, House, User, Mahalla, District and Region
+on every request, although these rows rarely change. The role-independent
+part of the payload (a "snapshot") is cached per UUID; role-specific fields
+are applied per request by the views.
+
+Snapshots are invalidated by the receivers in ``apps.qrcodes.signals``
+whenever one of the joined rows is saved or deleted. They live in the
+"scans" cache alias, whose culling cannot evict the coordination state kept
+in the default cache.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .keys import may_exist, remember_missing
+from .models import QRCode
+
+KEY_PREFIX = "qr:scan:"
+DELETE_CHUNK_SIZE = 500
+CACHE_ALIAS = "scans"
+
+
+def scan_cache():
+    """The cache holding scan snapshots ("default" if no "scans" alias)."""
+    if CACHE_ALIAS in settings.CACHES:
+        return caches[CACHE_ALIAS]
+    return caches["default"]
+
+
+def _cache_key(uuid: str) -> str:
+    return f"{KEY_PREFIX}{uuid}"
+
+
+def _get_location_data(house) -> Dict[str, Dict[str, Any]]:
+    """
+    Format location data consistently.
+
+    Args:
+        house: House object with related mahalla, district, and region
+
+    Returns:
+        Dictionary containing region, district, and mahalla info
+    """
+    return {
+        "region": {
+            "id": house.mahalla.district.region.id,
+            "name": house.mahalla.district.region.name,
+        },
+        "district": {
+            "id": house.mahalla.district.id,
+            "name": house.mahalla.district.name,
+        },
+        "mahalla": {
+            "id": house.mahalla.id,
+            "name": house.mahalla.name,
+        },
+    }
+
+
+def build_snapshot(qr: QRCode) -> Dict[str, Any]:
+    """
+    Build the role-independent scan data of ``qr``.
+
+    The owner entry holds every field any role may see; the views strip it
+    down per request.
+    """
+    snapshot = {
+        "qr": {
+            "id": qr.id,
+            "uuid": qr.uuid,
+            "qr_url": qr.get_qr_url(),
+        },
+        "house": None,
+        "owner": None,
+    }
+
+    if qr.house:
+        snapshot["house"] = {
+            "id": qr.house.id,
+            "address": qr.house.address,
+            "house_number": qr.house.house_number,
+            **_get_location_data(qr.house),
+        }
+        owner = qr.house.owner
+        if owner:
+            snapshot["owner"] = {
+                "id": owner.id,
+                "first_name": owner.first_name,
+                "last_name": owner.last_name,
+                "phone": owner.phone,
+                "role": owner.role,
+                "is_verified": owner.is_verified,
+            }
+
+    return snapshot
+
+
+def get_scan_snapshot(uuid: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the scan snapshot of the QR code ``uuid``, from cache if possible.
+
+    Returns:
+        Snapshot dictionary, or None if the QR code does not exist
+    """
+    # Malformed and unknown keys are rejected without touching the cache or DB
+    if not may_exist(uuid):
+        return None
+
+    key = _cache_key(uuid)
+    snapshot = scan_cache().get(key)
+    if snapshot is not None:
+        return snapshot
+
+    try:
+        qr = QRCode.objects.select_related(
+            "house__owner",
+            "house__mahalla__district__region",
+        ).get(uuid=uuid)
+    except QRCode.DoesNotExist:
+        remember_missing(uuid)
+        return None
+
+    snapshot = build_snapshot(qr)
+    scan_cache().set(key, snapshot, getattr(settings, "SCAN_CACHE_TIMEOUT", 3600))
+    return snapshot
+
+
+def _delete(keys) -> None:
+    for start in range(0, len(keys), DELETE_CHUNK_SIZE):
+        scan_cache().delete_many(keys[start : start + DELETE_CHUNK_SIZE])
+
+
+def invalidate_scan_cache(uuids: Iterable[str]) -> None:
+    """
+    Drop cached snapshots of the given QR codes.
+
+    Deleted now and again after the current transaction commits, so a
+    concurrent scan cannot re-cache the old rows in between.
+    """
+    keys = [_cache_key(uuid) for uuid in uuids if uuid]
+    if not keys:
+        return
+    _delete(keys)
+    transaction.on_commit(lambda: _delete(keys))
+
+
+def invalidate_scan_cache_for(**filters) -> None:
+    """Drop cached snapshots of all QR codes matching ``filters``."""
+    invalidate_scan_cache(
+        QRCode.objects.filter(**filters).values_list("uuid", flat=True).iterator()
+    )
@@ -1,22 +1,31 @@
 from typing import Optional
 
+from django.urls import reverse
 from rest_framework import serializers
 
-from apps.qrcodes.models import QRCode
+from apps.qrcodes.models import QRCode, QRGenerationJob
+
+BULK_GENERATE_MAX_COUNT = 100000
 
 
 class BulkQRCodeGenerateSerializer(serializers.Serializer):
     """
     Serializer for bulk QR code generation.
 
-    Validates the count of QR codes to generate.
+    Validates the count of QR codes to generate. Large counts are generated
+    by a background job.
     """
 
     count = serializers.IntegerField(
         min_value=1,
-        max_value=1000,
+        max_value=BULK_GENERATE_MAX_COUNT,
         required=True,
-        help_text="Number of QR codes to generate (1-1000)",
+        help_text=f"Number of QR codes to generate (1-{BULK_GENERATE_MAX_COUNT})",
+    )
+    background = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Run as a background job even for small counts",
     )
 
     def validate_count(self, value):
@@ -25,13 +34,60 @@ class BulkQRCodeGenerateSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 "Kamida 1 ta QR kod yaratish kerak. / At least 1 QR code must be generated."
             )
-        if value > 1000:
+        if value > BULK_GENERATE_MAX_COUNT:
             raise serializers.ValidationError(
-                "Bir vaqtning o'zida maksimal 1000 ta QR kod yaratish mumkin. / Maximum 1000 QR codes can be generated at once."
+                f"Bir vaqtning o'zida maksimal {BULK_GENERATE_MAX_COUNT} ta QR kod yaratish mumkin. / Maximum {BULK_GENERATE_MAX_COUNT} QR codes can be generated at once."
             )
         return value
 
 
+class QRGenerationJobSerializer(serializers.ModelSerializer):
+    """
+    Background generation job with progress and download URL.
+    """
+
+    progress = serializers.FloatField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = QRGenerationJob
+        fields = [
+            "id",
+            "status",
+            "count",
+            "generated",
+            "progress",
+            "filename",
+            "download_url",
+            "error_message",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj: QRGenerationJob) -> Optional[str]:
+        """Return the permission-checked ZIP download URL once completed."""
+        if obj.status != "completed" or not obj.filename:
+            return None
+        url = reverse("qr-bulk-download", kwargs={"filename": obj.filename})
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+class BulkQRCodeDownloadSerializer(serializers.Serializer):
+    """
+    Serializer for downloading a selection of QR codes as a ZIP archive.
+    """
+
+    uuids = serializers.ListField(
+        child=serializers.CharField(max_length=16),
+        min_length=1,
+        max_length=10000,
+        help_text="UUIDs of the QR codes to include (1-10000)",
+    )
+
+
 class QRCodeSerializer(serializers.ModelSerializer):
     """
     QR code serializer with basic information.
@@ -42,6 +98,7 @@ class QRCodeSerializer(serializers.ModelSerializer):
     is_claimed = serializers.SerializerMethodField()
     owner = serializers.SerializerMethodField()
     qr_url = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = QRCode
@@ -62,6 +119,12 @@ class QRCodeSerializer(serializers.ModelSerializer):
         """Return Telegram bot URL for QR code."""
         return obj.get_qr_url()
 
+    def get_image(self, obj: QRCode) -> str:
+        """Return stored image URL, or the on-demand image endpoint."""
+        url = obj.image.url if obj.image else obj.get_image_path()
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
 
 class QRCodeCreateSerializer(serializers.ModelSerializer):
     """
@@ -1,16 +1,24 @@
 import logging
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from apps.houses.models import House
+from apps.regions.models import District, Mahalla, Region
+from apps.users.models import User
 from .models import QRCode
+from .scan_cache import invalidate_scan_cache, invalidate_scan_cache_for
 
 logger = logging.getLogger(__name__)
 
 MINIMUM_UNCLAIMED_HOUSES = 10
 MINIMUM_UNCLAIMED_QRCODES = 10  # Maintain 10 unclaimed QR codes
 
+# QRCode fields that are not part of the cached scan snapshot
+SCAN_IGNORED_QR_FIELDS = {"is_scanned", "image"}
+# User fields that are part of the cached scan snapshot
+SCAN_SNAPSHOT_USER_FIELDS = {"first_name", "last_name", "phone", "role", "is_verified"}
+
 
 @receiver(post_save, sender=House)
 def create_qr_code_for_house(sender, instance, created, **kwargs):
@@ -110,3 +118,55 @@ def maintain_unclaimed_qrcodes(sender, instance, created, **kwargs):
     #         f"Created {qrcodes_needed} new unclaimed QR codes to maintain "
     #         f"minimum of {MINIMUM_UNCLAIMED_QRCODES}. Current unclaimed: {unclaimed_count + qrcodes_needed}"
     #     )
+
+
+@receiver([post_save, post_delete], sender=QRCode)
+def invalidate_qr_scan_snapshot(sender, instance, **kwargs):
+    """Drop the cached scan snapshot of a changed or deleted QR code."""
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= SCAN_IGNORED_QR_FIELDS:
+        return
+    invalidate_scan_cache([instance.uuid])
+
+
+@receiver([post_save, post_delete], sender=House)
+def invalidate_house_scan_snapshots(sender, instance, **kwargs):
+    """Drop cached scan snapshots of the QR codes linked to a house."""
+    if kwargs.get("created"):
+        return
+    invalidate_scan_cache_for(house_id=instance.id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_owner_scan_snapshots(sender, instance, **kwargs):
+    """Drop cached scan snapshots of the houses owned by a user."""
+    if kwargs.get("created"):
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields and not set(update_fields) & SCAN_SNAPSHOT_USER_FIELDS:
+        return
+    invalidate_scan_cache_for(house__owner_id=instance.id)
+
+
+@receiver([post_save, post_delete], sender=Mahalla)
+def invalidate_mahalla_scan_snapshots(sender, instance, **kwargs):
+    """Drop cached scan snapshots of the houses in a mahalla."""
+    if kwargs.get("created"):
+        return
+    invalidate_scan_cache_for(house__mahalla_id=instance.id)
+
+
+@receiver([post_save, post_delete], sender=District)
+def invalidate_district_scan_snapshots(sender, instance, **kwargs):
+    """Drop cached scan snapshots of the houses in a district."""
+    if kwargs.get("created"):
+        return
+    invalidate_scan_cache_for(house__mahalla__district_id=instance.id)
+
+
+@receiver([post_save, post_delete], sender=Region)
+def invalidate_region_scan_snapshots(sender, instance, **kwargs):
+    """Drop cached scan snapshots of the houses in a region."""
+    if kwargs.get("created"):
+        return
+    invalidate_scan_cache_for(house__mahalla__district__region_id=instance.id)
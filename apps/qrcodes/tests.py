@@ -0,0 +1,353 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.houses.models import House
+from apps.regions.models import District, Mahalla, Region
+from apps.users.models import User
+from . import claims
+from .claims import (
+    ClaimConflict,
+    HouseAlreadyClaimed,
+    QRCodeNotFound,
+    agent_claim_house,
+    claim_house,
+)
+from . import jobs, keys
+from .models import QRCode, QRGenerationJob
+from .scan_cache import get_scan_snapshot, scan_cache
+
+
+def stale_target(row):
+    """Patch the claim lookup to return ``row`` once, as if read before a race."""
+    lookup = claims._get_claim_target
+    rows = [row]
+    return mock.patch.object(
+        claims,
+        "_get_claim_target",
+        side_effect=lambda uuid: rows.pop() if rows else lookup(uuid),
+    )
+
+
+def create_mahalla():
+    region = Region.objects.create(name="Toshkent")
+    district = District.objects.create(region=region, name="Chilonzor")
+    return Mahalla.objects.create(district=district, name="Qatortol")
+
+
+class ClaimTests(TestCase):
+    def setUp(self):
+        self.mahalla = create_mahalla()
+        self.user = User.objects.create(phone="+998901111111", role="client")
+        self.other = User.objects.create(phone="+998902222222", role="client")
+        self.qr = QRCode.objects.create()
+
+    def test_claim_without_house_creates_one(self):
+        result = claim_house(self.qr.uuid, self.user, self.mahalla, "Ko'cha 1", "1")
+
+        self.assertTrue(result.created)
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.house_id, result.house.id)
+        self.assertEqual(self.qr.house.owner, self.user)
+
+    def test_claim_unowned_house_takes_it_over(self):
+        house = House.objects.create(mahalla=self.mahalla, address="Eski")
+        QRCode.objects.filter(id=self.qr.id).update(house=house)
+
+        result = claim_house(self.qr.uuid, self.user, self.mahalla, "Yangi")
+
+        self.assertFalse(result.created)
+        house.refresh_from_db()
+        self.assertEqual(house.owner, self.user)
+        self.assertEqual(house.address, "Yangi")
+        self.assertEqual(House.objects.count(), 1)
+
+    def test_claim_owned_house_fails(self):
+        claim_house(self.qr.uuid, self.user, self.mahalla, "Ko'cha 1")
+
+        with self.assertRaises(HouseAlreadyClaimed) as ctx:
+            claim_house(self.qr.uuid, self.other, self.mahalla, "Ko'cha 2")
+
+        self.assertEqual(ctx.exception.owner_id, self.user.id)
+        self.assertEqual(ctx.exception.owner_phone, self.user.phone)
+        self.assertEqual(House.objects.count(), 1)
+
+    def test_claim_unknown_code(self):
+        with self.assertRaises(QRCodeNotFound):
+            claim_house("0" * 16, self.user, self.mahalla, "Ko'cha 1")
+
+    def test_lost_race_reports_the_winner(self):
+        stale = claims._get_claim_target(self.qr.uuid)
+        claim_house(self.qr.uuid, self.other, self.mahalla, "Ko'cha 1")
+
+        with stale_target(stale):
+            with self.assertRaises(HouseAlreadyClaimed) as ctx:
+                claim_house(self.qr.uuid, self.user, self.mahalla, "Ko'cha 2")
+
+        self.assertEqual(ctx.exception.owner_id, self.other.id)
+        self.assertEqual(House.objects.count(), 1)
+
+    def test_lost_race_to_relink_is_a_conflict(self):
+        stale = claims._get_claim_target(self.qr.uuid)
+        house = House.objects.create(mahalla=self.mahalla, address="Boshqa")
+        QRCode.objects.filter(id=self.qr.id).update(house=house)
+
+        with stale_target(stale):
+            with self.assertRaises(ClaimConflict):
+                claim_house(self.qr.uuid, self.user, self.mahalla, "Ko'cha 1")
+
+        house.refresh_from_db()
+        self.assertIsNone(house.owner)
+        self.assertEqual(House.objects.count(), 1)
+
+    def test_agent_claim_keeps_unowned_house(self):
+        house = House.objects.create(mahalla=self.mahalla, address="Eski")
+        QRCode.objects.filter(id=self.qr.id).update(house=house)
+
+        result = agent_claim_house(self.qr.uuid, self.user, self.mahalla, "Yangi")
+
+        self.assertTrue(result.created)
+        self.assertNotEqual(result.house.id, house.id)
+        self.assertTrue(result.house.created_by_agent)
+        house.refresh_from_db()
+        self.assertIsNone(house.owner)
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.house_id, result.house.id)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class QRCodeImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.qr = QRCode.objects.create()
+        self.url = f"/api/qrcodes/{self.qr.uuid}/image.png"
+
+    def test_image_is_cached_forever(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_deleted_code_is_not_revalidated(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.qr.delete()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_code_and_format(self):
+        # A signed key is checked in the database, not the Bloom filter
+        unknown = QRCode.generate_uuid()
+        self.assertEqual(
+            self.client.get(f"/api/qrcodes/{unknown}/image.png").status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(f"/api/qrcodes/{self.qr.uuid}/image.gif").status_code,
+            404,
+        )
+
+
+@override_settings(QR_JOB_TIMEOUT=600)
+class QRGenerationJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def running_job(self, heartbeat_age, started_age=3600):
+        now = timezone.now()
+        return QRGenerationJob.objects.create(
+            count=10,
+            status="running",
+            started_at=now - timedelta(seconds=started_age),
+            heartbeat_at=(
+                now - timedelta(seconds=heartbeat_age)
+                if heartbeat_age is not None
+                else None
+            ),
+        )
+
+    def test_job_is_generated_in_chunks(self):
+        job = QRGenerationJob.objects.create(count=5)
+
+        self.assertEqual(jobs.run_pending_jobs(chunk_size=2), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.generated, 5)
+        self.assertEqual(QRCode.objects.count(), 5)
+        path = os.path.join(settings.MEDIA_ROOT, "qr_downloads", job.filename)
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(len(archive.namelist()), 5)
+
+    def test_stale_jobs_are_judged_by_heartbeat(self):
+        long_running = self.running_job(heartbeat_age=30)
+        silent = self.running_job(heartbeat_age=900)
+        never_reported = self.running_job(heartbeat_age=None)
+
+        self.assertEqual(jobs.fail_stale_jobs(), 2)
+
+        statuses = dict(QRGenerationJob.objects.values_list("id", "status"))
+        self.assertEqual(statuses[long_running.id], "running")
+        self.assertEqual(statuses[silent.id], "failed")
+        self.assertEqual(statuses[never_reported.id], "failed")
+
+    def test_job_failed_as_stale_midway_stays_failed(self):
+        job = QRGenerationJob.objects.create(count=4)
+        generate = jobs.generate_qr_codes
+
+        def generate_then_lose_job(count):
+            result = generate(count)
+            # Another worker judged this one dead
+            QRGenerationJob.objects.filter(id=job.id).update(
+                status="failed", error_message="Worker stopped"
+            )
+            return result
+
+        with mock.patch.object(jobs, "generate_qr_codes", generate_then_lose_job):
+            with self.assertLogs("apps.qrcodes.jobs", level="WARNING"):
+                jobs.run_pending_jobs(chunk_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error_message, "Worker stopped")
+        self.assertEqual(job.generated, 0)
+
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": LOCMEM,
+            "LOCATION": "default",
+            "OPTIONS": {"MAX_ENTRIES": 1000000},
+        },
+        "scans": {
+            "BACKEND": LOCMEM,
+            "LOCATION": "scans",
+            "OPTIONS": {"MAX_ENTRIES": 10},
+        },
+    }
+)
+class ScanCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        caches["scans"].clear()
+        self.mahalla = create_mahalla()
+        self.owner = User.objects.create(phone="+998901111111", role="client")
+        self.house = House.objects.create(
+            owner=self.owner, mahalla=self.mahalla, address="1-uy"
+        )
+        self.qr = QRCode.objects.create(house=self.house)
+
+    def test_snapshot_is_cached_in_its_own_alias(self):
+        get_scan_snapshot(self.qr.uuid)
+
+        with self.assertNumQueries(0):
+            snapshot = get_scan_snapshot(self.qr.uuid)
+
+        self.assertEqual(snapshot["owner"]["phone"], self.owner.phone)
+        self.assertEqual(snapshot["house"]["mahalla"]["name"], "Qatortol")
+        self.assertIs(scan_cache(), caches["scans"])
+        self.assertIsNone(cache.get(f"qr:scan:{self.qr.uuid}"))
+
+    def test_culling_scans_keeps_coordination_state(self):
+        cache.set("eskiz:token:test", "token", timeout=None)
+        for _ in range(30):
+            get_scan_snapshot(QRCode.objects.create().uuid)
+
+        self.assertEqual(cache.get("eskiz:token:test"), "token")
+
+    def test_changes_to_joined_rows_invalidate(self):
+        get_scan_snapshot(self.qr.uuid)
+        self.owner.first_name = "Ali"
+        self.owner.save()
+        self.assertEqual(get_scan_snapshot(self.qr.uuid)["owner"]["first_name"], "Ali")
+
+        self.mahalla.name = "Yangi"
+        self.mahalla.save()
+        snapshot = get_scan_snapshot(self.qr.uuid)
+        self.assertEqual(snapshot["house"]["mahalla"]["name"], "Yangi")
+
+        self.house.delete()
+        self.assertIsNone(get_scan_snapshot(self.qr.uuid))
+
+
+class QRKeyTests(SimpleTestCase):
+    def setUp(self):
+        self.index = keys.KeyIndex()
+        # As if the Bloom filter thread were running in this process
+        self.index._pid = os.getpid()
+
+    def test_generated_keys_are_signed(self):
+        key = keys.generate_key()
+
+        self.assertTrue(keys.is_well_formed(key))
+        self.assertTrue(keys.is_signed(key))
+        tampered = key[:-1] + ("0" if key[-1] != "0" else "1")
+        self.assertFalse(keys.is_signed(tampered))
+
+    def test_malformed_keys_are_rejected(self):
+        for key in ("", "abc", "0123456789ABCDEF", "0123456789abcdeg", "1" * 17):
+            self.assertFalse(self.index.may_exist(key), key)
+
+    def test_keys_signed_with_another_secret_are_unsigned(self):
+        with override_settings(QR_KEY_SECRET="first"):
+            key = keys.generate_key()
+        with override_settings(QR_KEY_SECRET="second"):
+            self.assertFalse(keys.is_signed(key))
+
+    def test_legacy_keys_are_checked_against_the_bloom_filter(self):
+        legacy = "0123456789abcdef"
+        unknown = "fedcba9876543210"
+
+        # First build still running: ask the database
+        self.assertTrue(self.index.may_exist(unknown))
+
+        self.index.build([legacy])
+        self.assertTrue(self.index.may_exist(legacy))
+        self.assertFalse(self.index.may_exist(unknown))
+        # Signed keys never depend on the filter
+        self.assertTrue(self.index.may_exist(keys.generate_key()))
+
+    def test_missing_keys_are_remembered(self):
+        legacy = "0123456789abcdef"
+        self.index.missing.add(legacy)
+
+        self.assertFalse(self.index.may_exist(legacy))
+
+    def test_negative_cache_is_bounded_and_expires(self):
+        missing = keys.NegativeCache(max_size=2, ttl=60)
+        for key in ("a", "b", "c"):
+            missing.add(key)
+
+        self.assertNotIn("a", missing)
+        self.assertIn("b", missing)
+        self.assertIn("c", missing)
+
+        expired = keys.NegativeCache(max_size=2, ttl=-1)
+        expired.add("a")
+        self.assertNotIn("a", expired)
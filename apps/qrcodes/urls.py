@@ -5,10 +5,14 @@ from .views import (
     QRCodeListAPIView,
     QRCodeCreateAPIView,
     QRCodeDetailAPIView,
+    QRCodeImageView,
     QRCodeScanAPIView,
     BulkQRCodeGenerateView,
     QRCodeBulkListView,
     BulkQRCodeDownloadView,
+    BulkQRCodeSelectionDownloadView,
+    QRGenerationJobListView,
+    QRGenerationJobDetailView,
     AgentClaimHouseView,
 )
 
@@ -18,12 +22,24 @@ urlpatterns = [
     path("create/", QRCodeCreateAPIView.as_view(), name="qr-create"),
     path("bulk/generate/", BulkQRCodeGenerateView.as_view(), name="qr-bulk-generate"),
     path("bulk/list/", QRCodeBulkListView.as_view(), name="qr-bulk-list"),
+    path("bulk/jobs/", QRGenerationJobListView.as_view(), name="qr-bulk-jobs"),
+    path(
+        "bulk/jobs/<uuid:job_id>/",
+        QRGenerationJobDetailView.as_view(),
+        name="qr-bulk-job-detail",
+    ),
+    path(
+        "bulk/download/",
+        BulkQRCodeSelectionDownloadView.as_view(),
+        name="qr-bulk-download-selection",
+    ),
     path(
         "bulk/download/<str:filename>/",
         BulkQRCodeDownloadView.as_view(),
         name="qr-bulk-download",
     ),
     path("<str:uuid>/", QRCodeDetailAPIView.as_view(), name="qr-detail"),
+    path("<str:uuid>/image.<str:fmt>", QRCodeImageView.as_view(), name="qr-image"),
     path("scan/<str:uuid>/", ScanQRCodeView.as_view(), name="qr-scan"),
     path("claim/<str:uuid>/", ClaimHouseView.as_view(), name="qr-claim"),
     path(
@@ -1,12 +1,12 @@
 from typing import Dict, Any, Optional
 import os
-import zipfile
-from io import BytesIO
 
 from django.db import transaction, IntegrityError
 from django.db.models import Q, Max
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.conf import settings
+from django.urls import reverse
+from django.utils.http import parse_etags
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -14,17 +14,31 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import generics, status
 from rest_framework.request import Request
 
-from apps.qrcodes.models import QRCode
-from apps.scans.models import ScanLog
+from apps.core.downloads import send_file
+from apps.qrcodes.models import QRCode, QRGenerationJob
+from apps.scans.recorder import record_scan
+from apps.users.services import send_registration_success_sms
 from apps.regions.models import Mahalla
-from apps.houses.models import House
 
 from .services import get_client_ip
+from .archive import iter_qr_entries, iter_zip
+from .claims import (
+    ClaimConflict,
+    HouseAlreadyClaimed,
+    QRCodeNotFound,
+    agent_claim_house,
+    claim_house,
+)
+from .generation import generate_qr_codes, write_qr_zip
+from .images import CONTENT_TYPES, get_image, image_etag
+from .scan_cache import get_scan_snapshot
 from .serializers import (
     QRCodeSerializer,
     QRCodeCreateSerializer,
     QRCodeClaimSerializer,
     BulkQRCodeGenerateSerializer,
+    BulkQRCodeDownloadSerializer,
+    QRGenerationJobSerializer,
     AgentCreateUserSerializer,
 )
 
@@ -36,34 +50,8 @@ LEADER_ROLE = "leader"
 AGENT_ROLE = "agent"
 
 
-def _get_location_data(house) -> Dict[str, Dict[str, Any]]:
-    """
-    Format location data consistently.
-
-    Args:
-        house: House object with related mahalla, district, and region
-
-    Returns:
-        Dictionary containing region, district, and mahalla info
-    """
-    return {
-        "region": {
-            "id": house.mahalla.district.region.id,
-            "name": house.mahalla.district.region.name,
-        },
-        "district": {
-            "id": house.mahalla.district.id,
-            "name": house.mahalla.district.name,
-        },
-        "mahalla": {
-            "id": house.mahalla.id,
-            "name": house.mahalla.name,
-        },
-    }
-
-
 def _get_owner_data(
-    owner, user_role: str = ANONYMOUS_ROLE, is_owner: bool = False
+    owner: Dict[str, Any], user_role: str = ANONYMOUS_ROLE, is_owner: bool = False
 ) -> Dict[str, Any]:
     """
     Format owner data based on access level.
@@ -72,7 +60,7 @@ def _get_owner_data(
     full data for admins and house owners.
 
     Args:
-        owner: User object who owns the house
+        owner: Owner entry of a scan snapshot
         user_role: Role of the requesting user
         is_owner: Whether requesting user is the house owner
 
@@ -80,30 +68,32 @@ def _get_owner_data(
         Dictionary containing owner information based on access level
     """
     data = {
-        "id": owner.id,
-        "first_name": owner.first_name,
-        "last_name": owner.last_name,
-        "phone": owner.phone,
+        "id": owner["id"],
+        "first_name": owner["first_name"],
+        "last_name": owner["last_name"],
+        "phone": owner["phone"],
     }
 
     if user_role in ADMIN_ROLES or is_owner:
         data.update(
             {
-                "role": owner.role,
-                "is_verified": owner.is_verified,
+                "role": owner["role"],
+                "is_verified": owner["is_verified"],
             }
         )
 
     return data
 
 
-def _get_user_role_and_ownership(request: Request, qr: QRCode) -> tuple[str, bool]:
+def _get_user_role_and_ownership(
+    request: Request, snapshot: Dict[str, Any]
+) -> tuple[str, bool]:
     """
     Determine user role and ownership status.
 
     Args:
         request: HTTP request object
-        qr: QRCode object being accessed
+        snapshot: Scan snapshot of the QR code being accessed
 
     Returns:
         Tuple of (user_role, is_owner)
@@ -113,8 +103,8 @@ def _get_user_role_and_ownership(request: Request, qr: QRCode) -> tuple[str, boo
 
     if request.user and request.user.is_authenticated:
         user_role = getattr(request.user, "role", "user")
-        if qr.house and qr.house.owner:
-            is_owner = qr.house.owner == request.user
+        if snapshot["owner"]:
+            is_owner = snapshot["owner"]["id"] == request.user.id
 
     return user_role, is_owner
 
@@ -128,18 +118,13 @@ def _log_qr_scan(request: Request, qr: QRCode) -> None:
         request: HTTP request object
         qr: QRCode object being scanned
     """
-    # Mark QR as scanned
-    if not qr.is_scanned:
-        qr.is_scanned = True
-        qr.save(update_fields=["is_scanned"])
+    user = request.user if request.user and request.user.is_authenticated else None
 
-    if request.user and request.user.is_authenticated:
-        ScanLog.objects.create(
-            qr=qr, scanned_by=request.user, ip_address=get_client_ip(request)
-        )
-        request.user.scanned_qr_code = qr.uuid
-        request.user.save(update_fields=["scanned_qr_code"])
+    # Marks the QR as scanned, logs the scan and saves the UUID to the user,
+    # written in batches by the scan recorder
+    record_scan(qr, user, get_client_ip(request))
 
+    if user is not None:
         # QR kod skanerlanganda SMS yuborish
         try:
             from apps.users.services import send_qr_scan_sms
@@ -152,12 +137,12 @@ def _log_qr_scan(request: Request, qr: QRCode) -> None:
             logger.warning(f"QR kod skaner SMS yuborishda xatolik: {e}")
 
 
-def _get_unclaimed_response(qr: QRCode, user_role: str) -> Dict[str, Any]:
+def _get_unclaimed_response(snapshot: Dict[str, Any], user_role: str) -> Dict[str, Any]:
     """
     Build response for unclaimed QR codes.
 
     Args:
-        qr: QRCode object
+        snapshot: Scan snapshot of the QR code
         user_role: Role of the requesting user
 
     Returns:
@@ -170,28 +155,14 @@ def _get_unclaimed_response(qr: QRCode, user_role: str) -> Dict[str, Any]:
             if user_role != ANONYMOUS_ROLE
             else "Bu QR kod hali biriktirilmagan."
         ),
-        "qr": {
-            "id": qr.id,
-            "uuid": qr.uuid,
-            "qr_url": qr.get_qr_url(),
-        },
+        "qr": dict(snapshot["qr"]),
+        "house": dict(snapshot["house"]) if snapshot["house"] else None,
+        "owner": None,
     }
 
-    if qr.house:
-        response_data["house"] = {
-            "id": qr.house.id,
-            "address": qr.house.address,
-            "house_number": qr.house.house_number,
-            **_get_location_data(qr.house),
-        }
-    else:
-        response_data["house"] = None
-
-    response_data["owner"] = None
-
     if user_role != ANONYMOUS_ROLE:
         response_data["can_claim"] = True
-        response_data["claim_url"] = f"/api/qrcodes/claim/{qr.uuid}/"
+        response_data["claim_url"] = f"/api/qrcodes/claim/{snapshot['qr']['uuid']}/"
     else:
         response_data["can_claim"] = False
         response_data["message"] = (
@@ -201,12 +172,14 @@ def _get_unclaimed_response(qr: QRCode, user_role: str) -> Dict[str, Any]:
     return response_data
 
 
-def _get_claimed_response(qr: QRCode, user_role: str, is_owner: bool) -> Dict[str, Any]:
+def _get_claimed_response(
+    snapshot: Dict[str, Any], user_role: str, is_owner: bool
+) -> Dict[str, Any]:
     """
     Build response for claimed QR codes.
 
     Args:
-        qr: QRCode object
+        snapshot: Scan snapshot of the QR code
         user_role: Role of the requesting user
         is_owner: Whether requesting user owns the house
 
@@ -215,22 +188,28 @@ def _get_claimed_response(qr: QRCode, user_role: str, is_owner: bool) -> Dict[st
     """
     return {
         "status": "claimed",
-        "qr": {
-            "id": qr.id,
-            "uuid": qr.uuid,
-            "qr_url": qr.get_qr_url(),
-        },
-        "house": {
-            "id": qr.house.id,
-            "address": qr.house.address,
-            "house_number": qr.house.house_number,
-            **_get_location_data(qr.house),
-        },
-        "owner": _get_owner_data(qr.house.owner, user_role, is_owner),
+        "qr": dict(snapshot["qr"]),
+        "house": dict(snapshot["house"]),
+        "owner": _get_owner_data(snapshot["owner"], user_role, is_owner),
         "is_owner": is_owner,
     }
 
 
+def _get_scan_response(request: Request, snapshot: Dict[str, Any]) -> Response:
+    """Overlay the role-specific fields on a scan snapshot."""
+    user_role, is_owner = _get_user_role_and_ownership(request, snapshot)
+
+    if not snapshot["house"] or not snapshot["owner"]:
+        return Response(_get_unclaimed_response(snapshot, user_role))
+
+    return Response(_get_claimed_response(snapshot, user_role, is_owner))
+
+
+def _snapshot_qr(snapshot: Dict[str, Any]) -> QRCode:
+    """Unsaved QRCode carrying the identity of a snapshot, for scan logging."""
+    return QRCode(id=snapshot["qr"]["id"], uuid=snapshot["qr"]["uuid"])
+
+
 class QRCodeScanAPIView(APIView):
     """
     POST endpoint for QR code scanning.
@@ -291,23 +270,14 @@ class QRCodeScanAPIView(APIView):
                 {"error": "Invalid QR code format"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            qr = QRCode.objects.select_related(
-                "house__owner",
-                "house__mahalla__district__region",
-            ).get(uuid=uuid)
-        except QRCode.DoesNotExist:
+        snapshot = get_scan_snapshot(uuid)
+        if snapshot is None:
             return Response(
                 {"error": "QR code not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        _log_qr_scan(request, qr)
-        user_role, is_owner = _get_user_role_and_ownership(request, qr)
-
-        if not qr.house or not qr.house.owner:
-            return Response(_get_unclaimed_response(qr, user_role))
-
-        return Response(_get_claimed_response(qr, user_role, is_owner))
+        _log_qr_scan(request, _snapshot_qr(snapshot))
+        return _get_scan_response(request, snapshot)
 
 
 class ScanQRCodeView(APIView):
@@ -324,24 +294,14 @@ class ScanQRCodeView(APIView):
 
     def get(self, request: Request, uuid: str) -> Response:
         """Handle QR code scan via GET request."""
-        try:
-            qr = QRCode.objects.select_related(
-                "house__owner",
-                "house__mahalla__district__region",
-            ).get(uuid=uuid)
-        except QRCode.DoesNotExist:
+        snapshot = get_scan_snapshot(uuid)
+        if snapshot is None:
             return Response(
                 {"error": "QR code not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        _log_qr_scan(request, qr)
-
-        user_role, is_owner = _get_user_role_and_ownership(request, qr)
-
-        if not qr.house or not qr.house.owner:
-            return Response(_get_unclaimed_response(qr, user_role))
-
-        return Response(_get_claimed_response(qr, user_role, is_owner))
+        _log_qr_scan(request, _snapshot_qr(snapshot))
+        return _get_scan_response(request, snapshot)
 
     def post(self, request: Request, uuid: str) -> Response:
         """
@@ -353,15 +313,12 @@ class ScanQRCodeView(APIView):
             "last_name": "Doe"
         }
         """
-        try:
-            qr = QRCode.objects.select_related(
-                "house__owner",
-                "house__mahalla__district__region",
-            ).get(uuid=uuid)
-        except QRCode.DoesNotExist:
+        snapshot = get_scan_snapshot(uuid)
+        if snapshot is None:
             return Response(
                 {"error": "QR code not found"}, status=status.HTTP_404_NOT_FOUND
             )
+        qr = _snapshot_qr(snapshot)
 
         # Save user data if authenticated
         if request.user and request.user.is_authenticated:
@@ -380,16 +337,13 @@ class ScanQRCodeView(APIView):
                 request.user.save(
                     update_fields=["first_name", "last_name", "scanned_qr_code"]
                 )
+                # The owner's name may be part of the snapshot
+                snapshot = get_scan_snapshot(uuid) or snapshot
 
         # Log the scan
         _log_qr_scan(request, qr)
 
-        user_role, is_owner = _get_user_role_and_ownership(request, qr)
-
-        if not qr.house or not qr.house.owner:
-            return Response(_get_unclaimed_response(qr, user_role))
-
-        return Response(_get_claimed_response(qr, user_role, is_owner))
+        return _get_scan_response(request, snapshot)
 
 
 class QRCodeListAPIView(generics.ListAPIView):
@@ -481,6 +435,48 @@ class QRCodeDetailAPIView(generics.RetrieveAPIView):
         return queryset
 
 
+class QRCodeImageView(APIView):
+    """
+    Public QR code image rendered on demand.
+
+    GET /api/qrcodes/{uuid}/image.png
+    GET /api/qrcodes/{uuid}/image.svg
+
+    The image of a QR code never changes, so responses carry a strong ETag
+    and may be cached forever by browsers and proxies.
+    """
+
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request: Request, uuid: str, fmt: str) -> HttpResponse:
+        """Return the QR code image, or 304 if the client's copy is current."""
+        if fmt not in CONTENT_TYPES:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+
+        # A deleted code must not be revalidated; the cached scan snapshot
+        # answers this without a query for hot codes
+        if get_scan_snapshot(uuid) is None:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+
+        url = QRCode(uuid=uuid).get_qr_url()
+        etag = image_etag(url, fmt)
+        cache_control = "public, max-age=31536000, immutable"
+
+        # The ETag only depends on the URL, no rendering needed
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = etag
+            response["Cache-Control"] = cache_control
+            return response
+
+        response = HttpResponse(get_image(url, fmt), content_type=CONTENT_TYPES[fmt])
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+
 class ClaimHouseView(APIView):
     """
     Claim house ownership after scanning QR code.
@@ -562,252 +558,94 @@ class ClaimHouseView(APIView):
         logger.info(f"Claim data: {validated_data}")
 
         try:
-            mahalla = Mahalla.objects.get(id=validated_data["mahalla"])
+            mahalla = Mahalla.objects.select_related("district__region").get(
+                id=validated_data["mahalla"]
+            )
         except Mahalla.DoesNotExist:
             return Response(
                 {"error": "Mahalla not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        logger.info("Claim start: Using random House IDs with retry logic")
-
-        # CRITICAL: Cleanup orphaned house_ids BEFORE any transaction attempts
-        # This prevents UNIQUE constraint errors from orphaned references
-        logger.info("Pre-claim cleanup: checking for orphaned house_ids globally")
-
+        # One conditional UPDATE decides the claim, no locks or retries. The
+        # profile update and the SMS (via the outbox) commit together with it.
         try:
-            existing_house_ids = set(House.objects.values_list("id", flat=True))
-            used_house_ids_in_qr = set(
-                QRCode.objects.filter(house_id__isnull=False).values_list(
-                    "house_id", flat=True
-                )
-            )
-            orphaned_ids = used_house_ids_in_qr - existing_house_ids
-
-            if orphaned_ids:
-                logger.warning(
-                    f"Found {len(orphaned_ids)} orphaned house_ids: {sorted(list(orphaned_ids))[:20]}..."
-                )
-                cleaned = QRCode.objects.filter(house_id__in=orphaned_ids).update(
-                    house_id=None
+            with transaction.atomic():
+                result = claim_house(
+                    uuid,
+                    user,
+                    mahalla,
+                    address=validated_data["address"],
+                    house_number=validated_data["house_number"],
                 )
-                logger.info(f"Successfully cleaned up {cleaned} orphaned house_ids")
-            else:
-                logger.info("No orphaned house_ids found. Database is clean.")
-        except Exception as e:
-            logger.error(f"Error during orphaned house_ids cleanup: {str(e)}")
-            # Continue anyway, retry logic will handle conflicts
+                house, qr = result.house, result.qr
 
-        # Retry logic OUTSIDE transaction to avoid "can't execute queries" error
-        import random
+                # Update user info with QR code reference
+                user.first_name = validated_data["first_name"]
+                user.last_name = validated_data["last_name"]
+                user.scanned_qr_code = qr.uuid  # Save scanned QR UUID
+                user.save(update_fields=["first_name", "last_name", "scanned_qr_code"])
 
-        max_attempts = 50
-        last_error = None
-
-        for attempt in range(max_attempts):
-            try:
-                with transaction.atomic():
-                    logger.info(f"Claim attempt {attempt + 1}/{max_attempts}")
-
-                    # Lock ONLY the QR code row (no JOINs to avoid PostgreSQL FOR UPDATE error)
-                    # select_for_update() cannot be used with nullable outer joins
-                    qr = QRCode.objects.select_for_update().get(uuid=uuid)
-
-                    # Access related objects AFTER lock is acquired (separate queries)
-                    # This avoids "FOR UPDATE cannot be applied to nullable side of outer join" error
-                    house = qr.house  # Triggers separate query if needed
-                    owner = (
-                        house.owner if house else None
-                    )  # Triggers separate query if needed
-
-                    logger.info(
-                        f"QR {uuid} - has_house={house is not None}, "
-                        f"has_owner={owner}"
-                    )
-
-                    # Check if already claimed
-                    if house and owner:
-                        if owner == user:
-                            return Response(
-                                {
-                                    "error": "Siz allaqachon bu uyni claim qilgansiz.",
-                                    "error_en": "You have already claimed this house.",
-                                    "house_id": house.id,
-                                    "is_reclaim_attempt": True,
-                                },
-                                status=status.HTTP_400_BAD_REQUEST,
-                            )
-                        return Response(
-                            {
-                                "error": "Bu uy allaqachon boshqa foydalanuvchi tomonidan claim qilingan.",
-                                "error_en": "This house is already claimed by another user.",
-                                "owner": owner.phone,
-                            },
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                    # Update user info with QR code reference
-                    user.first_name = validated_data["first_name"]
-                    user.last_name = validated_data["last_name"]
-                    user.scanned_qr_code = qr.uuid  # Save scanned QR UUID
-                    user.save(
-                        update_fields=["first_name", "last_name", "scanned_qr_code"]
-                    )
-
-                    logger.info(
-                        f"Updated user {user.phone}: {user.first_name} {user.last_name}, "
-                        f"scanned QR: {user.scanned_qr_code}"
-                    )
-
-                    if house:
-                        # Update existing house
-                        logger.info(f"Updating existing house {house.id}")
-                        house.address = validated_data["address"]
-                        house.house_number = validated_data["house_number"]
-                        house.mahalla = mahalla
-                        house.owner = user
-                        house.save()
-                    else:
-                        # Create new house with random 10-digit ID
-                        # Orphaned house_ids already cleaned up before transaction
-                        logger.info("Generating random House ID")
-
-                        random_id = random.randint(1_000_000_000, 9_999_999_999)
-                        logger.info(f"Selected House ID: {random_id}")
-
-                        # Create house with random ID
-                        house = House(
-                            id=random_id,
-                            address=validated_data["address"],
-                            house_number=validated_data["house_number"],
-                            mahalla=mahalla,
-                            owner=user,
-                        )
-                        house.save(force_insert=True)
-                        logger.info(f"Successfully created house with ID {house.id}")
-
-                        # Link QR to house
-                        qr.house = house
-                        qr.save(update_fields=["house"])
-                        logger.info(
-                            f"Successfully linked QR {qr.uuid} to house {house.id}"
-                        )
-
-                    # Log the scan
-                    ScanLog.objects.create(
-                        qr=qr, scanned_by=user, ip_address=get_client_ip(request)
-                    )
-
-                    # Send SMS to user after successful house claim
-                    try:
-                        from apps.users.services import EskizSMSService
-
-                        sms_service = EskizSMSService()
-                        message = "Siz QR MAHALLA tizimida muvaffaqiyatli ro'yxatdan o'tdingiz."
-                        sms_service.send_sms(user.phone, message)
-                        logger.info(f"SMS sent to {user.phone} after house claim")
-                    except Exception as e:
-                        logger.warning(f"Failed to send SMS after house claim: {e}")
-
-                    # Success! Return response
-                    return Response(
-                        {
-                            "message": "House claimed successfully",
-                            "house": {
-                                "id": house.id,
-                                "address": house.address,
-                                "number": house.house_number,
-                                "mahalla": house.mahalla.name,
-                                "district": house.mahalla.district.name,
-                                "region": house.mahalla.district.region.name,
-                            },
-                            "owner": {
-                                "phone": user.phone,
-                                "first_name": user.first_name,
-                                "last_name": user.last_name,
-                                "role": user.role,
-                            },
-                            "qr": {
-                                "id": qr.id,
-                                "uuid": qr.uuid,
-                                "qr_url": qr.get_qr_url(),
-                                "is_claimed": True,
-                            },
-                        }
-                    )
-
-            except IntegrityError as ie:
-                last_error = ie
-                error_msg = str(ie)
-                logger.warning(f"Attempt {attempt + 1} failed: {error_msg}")
-
-                # If UNIQUE constraint on house_id, retry with different ID
-                if (
-                    "unique constraint" in error_msg.lower()
-                    and "house_id" in error_msg.lower()
-                ):
-                    if attempt < max_attempts - 1:
-                        logger.info(f"Will retry with new random ID...")
-                        continue
-
-                # For other IntegrityErrors, stop retrying
-                break
-            except QRCode.DoesNotExist:
-                return Response(
-                    {"error": "QR code not found"}, status=status.HTTP_404_NOT_FOUND
-                )
-            except Exception as e:
-                # Unexpected error, log and retry if possible
-                logger.error(f"Unexpected error in attempt {attempt + 1}: {str(e)}")
-                last_error = e
-                if attempt < max_attempts - 1:
-                    continue
-                break
-
-        # If we get here, all retries failed
-        if last_error:
-            logger.error(f"Failed after {max_attempts} attempts")
-            error_msg = str(last_error)
-
-            if isinstance(last_error, IntegrityError):
-                if (
-                    "unique constraint" in error_msg.lower()
-                    or "duplicate" in error_msg.lower()
-                ):
-                    return Response(
-                        {
-                            "error": "Bu uy allaqachon boshqa QR kod bilan bog'langan.",
-                            "error_en": "This house is already linked to another QR code.",
-                            "detail": error_msg,
-                            "error_type": "house_already_linked",
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+                send_registration_success_sms(user.phone, user=user)
+        except QRCodeNotFound:
+            return Response(
+                {"error": "QR code not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        except HouseAlreadyClaimed as e:
+            if e.owner_id == user.id:
                 return Response(
                     {
-                        "error": "Ma'lumotlar bazasida xatolik yuz berdi.",
-                        "error_en": "Database integrity error occurred.",
-                        "detail": error_msg,
-                        "error_type": "integrity_error",
+                        "error": "Siz allaqachon bu uyni claim qilgansiz.",
+                        "error_en": "You have already claimed this house.",
+                        "house_id": e.house_id,
+                        "is_reclaim_attempt": True,
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-
             return Response(
                 {
-                    "error": "Uyni claim qilishda kutilmagan xatolik yuz berdi.",
-                    "error_en": "An unexpected error occurred while claiming the house.",
-                    "detail": error_msg,
+                    "error": "Bu uy allaqachon boshqa foydalanuvchi tomonidan claim qilingan.",
+                    "error_en": "This house is already claimed by another user.",
+                    "owner": e.owner_phone,
                 },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        except ClaimConflict:
+            return Response(
+                {
+                    "error": "QR kod hozirgina o'zgartirildi. Qayta urinib ko'ring.",
+                    "error_en": "The QR code was changed meanwhile. Please try again.",
+                    "error_type": "claim_conflict",
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        # Log the scan
+        record_scan(qr, user, get_client_ip(request))
 
-        # Should never reach here
         return Response(
             {
-                "error": "Uyni claim qilishda kutilmagan xatolik yuz berdi.",
-                "error_en": "An unexpected error occurred while claiming the house.",
-            },
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": "House claimed successfully",
+                "house": {
+                    "id": house.id,
+                    "address": house.address,
+                    "number": house.house_number,
+                    "mahalla": mahalla.name,
+                    "district": mahalla.district.name,
+                    "region": mahalla.district.region.name,
+                },
+                "owner": {
+                    "phone": user.phone,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                    "role": user.role,
+                },
+                "qr": {
+                    "id": qr.id,
+                    "uuid": qr.uuid,
+                    "qr_url": qr.get_qr_url(),
+                    "is_claimed": True,
+                },
+            }
         )
 
 
@@ -827,13 +665,18 @@ class BulkQRCodeGenerateView(APIView):
 
         Expected payload:
         {
-            "count": 10  // Number of QR codes to generate
+            "count": 10,  // Number of QR codes to generate
+            "background": false  // Optional, force a background job
         }
 
+        Counts above QR_BULK_SYNC_LIMIT are queued as a background job and
+        answered with 202 and a status URL instead.
+
         Returns:
         {
-            "download_url": "/media/qr_downloads/qrcodes_123.zip",
+            "download_url": "/api/qrcodes/bulk/download/qrcodes_123.zip/",
             "count": 10,
+            "codes_per_second": 850.0,
             "message": "QR codes generated successfully"
         }
         """
@@ -855,40 +698,33 @@ class BulkQRCodeGenerateView(APIView):
 
         count = serializer.validated_data["count"]
 
-        try:
-            # Generate QR codes
-            qr_codes = []
-            with transaction.atomic():
-                for _ in range(count):
-                    qr_code = QRCode.objects.create()
-                    qr_codes.append(qr_code)
-
-            # Create zip file in memory
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                for qr in qr_codes:
-                    if qr.image:
-                        # Add QR code image to zip
-                        img_name = f"qr_{qr.uuid}.png"
-                        zip_file.writestr(img_name, qr.image.read())
-
-            # Save zip file to media folder
-            zip_buffer.seek(0)
-            zip_filename = (
-                f"qrcodes_{request.user.id}_{QRCode.objects.latest('id').id}.zip"
+        # Large runs would exceed the request timeout, hand them to the worker
+        sync_limit = getattr(settings, "QR_BULK_SYNC_LIMIT", 1000)
+        if serializer.validated_data["background"] or count > sync_limit:
+            job = QRGenerationJob.objects.create(count=count, created_by=request.user)
+            return Response(
+                {
+                    "job_id": str(job.id),
+                    "status": job.status,
+                    "count": count,
+                    "status_url": request.build_absolute_uri(
+                        reverse("qr-bulk-job-detail", kwargs={"job_id": job.id})
+                    ),
+                    "message": "QR kodlar fonda yaratilmoqda",
+                    "message_en": "QR codes are being generated in the background",
+                },
+                status=status.HTTP_202_ACCEPTED,
             )
-            zip_path = os.path.join(settings.MEDIA_ROOT, "qr_downloads", zip_filename)
 
-            # Create directory if not exists
-            os.makedirs(os.path.dirname(zip_path), exist_ok=True)
+        try:
+            result = generate_qr_codes(count)
 
-            # Write zip file
-            with open(zip_path, "wb") as f:
-                f.write(zip_buffer.getvalue())
+            zip_filename = f"qrcodes_{request.user.id}_{result.codes[-1].id}.zip"
+            write_qr_zip(result, zip_filename)
 
-            # Generate absolute download URL (with domain)
+            # Absolute URL of the permission-checked download (with domain)
             download_url = request.build_absolute_uri(
-                f"/media/qr_downloads/{zip_filename}"
+                reverse("qr-bulk-download", kwargs={"filename": zip_filename})
             )
 
             return Response(
@@ -896,6 +732,8 @@ class BulkQRCodeGenerateView(APIView):
                     "download_url": download_url,
                     "count": count,
                     "filename": zip_filename,
+                    "duration_seconds": round(result.duration, 3),
+                    "codes_per_second": round(result.codes_per_second, 1),
                     "message": "QR kodlar muvaffaqiyatli yaratildi",
                     "message_en": "QR codes generated successfully",
                 },
@@ -913,6 +751,43 @@ class BulkQRCodeGenerateView(APIView):
             )
 
 
+class QRGenerationJobListView(generics.ListAPIView):
+    """
+    List background QR generation jobs.
+
+    GET /api/qrcodes/bulk/jobs/
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = QRGenerationJobSerializer
+
+    def get_queryset(self):
+        """Admins only."""
+        if getattr(self.request.user, "role", None) not in ADMIN_ROLES:
+            return QRGenerationJob.objects.none()
+        return QRGenerationJob.objects.all()
+
+
+class QRGenerationJobDetailView(generics.RetrieveAPIView):
+    """
+    Status and progress of a background QR generation job.
+
+    GET /api/qrcodes/bulk/jobs/{job_id}/
+
+    ``download_url`` is set once the job is completed.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = QRGenerationJobSerializer
+    lookup_url_kwarg = "job_id"
+
+    def get_queryset(self):
+        """Admins only."""
+        if getattr(self.request.user, "role", None) not in ADMIN_ROLES:
+            return QRGenerationJob.objects.none()
+        return QRGenerationJob.objects.all()
+
+
 class QRCodeBulkListView(generics.ListAPIView):
     """
     List recently created QR codes.
@@ -958,7 +833,9 @@ class BulkQRCodeDownloadView(APIView):
     """
     Direct download endpoint for generated ZIP files.
 
-    Alternative to using media URL - provides direct file download.
+    The only way to fetch generated ZIP files: nginx does not serve
+    ``/media/qr_downloads/``. The transfer itself is handed to nginx, see
+    apps.core.downloads.
     """
 
     permission_classes = [IsAuthenticated]
@@ -1003,13 +880,9 @@ class BulkQRCodeDownloadView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Return file as download
+        # Return file as download (resumable, see apps.core.downloads)
         try:
-            response = FileResponse(
-                open(zip_path, "rb"), content_type="application/zip"
-            )
-            response["Content-Disposition"] = f'attachment; filename="{filename}"'
-            return response
+            return send_file(request, zip_path, filename, "application/zip")
         except Exception as e:
             return Response(
                 {
@@ -1021,6 +894,55 @@ class BulkQRCodeDownloadView(APIView):
             )
 
 
+class BulkQRCodeSelectionDownloadView(APIView):
+    """
+    Stream a ZIP archive for any selection of QR codes.
+
+    The archive is built while it is sent, no temporary file is written.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Download selected QR codes as a ZIP file.
+
+        URL: /api/qrcodes/bulk/download/
+        Body: {"uuids": ["abc123...", ...]}
+        """
+        user_role = getattr(request.user, "role", None)
+        if user_role not in ADMIN_ROLES:
+            return Response(
+                {
+                    "error": "Ruxsat yo'q.",
+                    "error_en": "Permission denied.",
+                },
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = BulkQRCodeDownloadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Keep the requested order, drop duplicates
+        uuids = list(dict.fromkeys(serializer.validated_data["uuids"]))
+        if not QRCode.objects.filter(uuid__in=uuids).exists():
+            return Response(
+                {
+                    "error": "QR kodlar topilmadi.",
+                    "error_en": "QR codes not found.",
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        response = StreamingHttpResponse(
+            iter_zip(iter_qr_entries(uuids)), content_type="application/zip"
+        )
+        filename = f"qrcodes_{request.user.id}_selection.zip"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class AgentClaimHouseView(APIView):
     """
     Agent endpoint to create a new user and claim house.
@@ -1043,7 +965,6 @@ class AgentClaimHouseView(APIView):
     def post(self, request: Request, uuid: str) -> Response:
         """Handle agent claim request to create user and associate house."""
         import logging
-        import random
 
         logger = logging.getLogger(__name__)
 
@@ -1068,17 +989,43 @@ class AgentClaimHouseView(APIView):
         validated_data = serializer.validated_data
         logger.info(f"Agent claim data: {validated_data}")
 
-        # Check if QR code exists
+        # Verify mahalla exists
         try:
-            qr = QRCode.objects.select_related("house", "house__owner").get(uuid=uuid)
-        except QRCode.DoesNotExist:
+            mahalla = Mahalla.objects.get(id=validated_data["mahalla"])
+        except Mahalla.DoesNotExist:
             return Response(
-                {"error": "QR kod topilmadi.", "error_en": "QR code not found"},
+                {"error": "Mahalla topilmadi.", "error_en": "Mahalla not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Check if QR code is already claimed
-        if qr.house and qr.house.owner:
+        from apps.users.models import User
+
+        try:
+            with transaction.atomic():
+                # Create new user
+                new_user = User.objects.create(
+                    phone=validated_data["phone"],
+                    first_name=validated_data["first_name"],
+                    last_name=validated_data["last_name"],
+                    role=CLIENT_ROLE,  # New user is a client by default
+                    is_verified=False,  # User will verify later
+                )
+                logger.info(f"Created new user with phone: {new_user.phone}")
+
+                # Link the house; a lost race rolls back the new user too
+                result = agent_claim_house(
+                    uuid,
+                    new_user,
+                    mahalla,
+                    address=validated_data["address"],
+                    house_number=validated_data.get("house_number", ""),
+                )
+        except QRCodeNotFound:
+            return Response(
+                {"error": "QR kod topilmadi.", "error_en": "QR code not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except (HouseAlreadyClaimed, ClaimConflict):
             return Response(
                 {
                     "error": "Bu QR kod allaqachon claim qilingan.",
@@ -1086,152 +1033,57 @@ class AgentClaimHouseView(APIView):
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        # Verify mahalla exists
-        try:
-            mahalla = Mahalla.objects.get(id=validated_data["mahalla"])
-        except Mahalla.DoesNotExist:
+        except IntegrityError as e:
+            # This shouldn't happen as we validated phone uniqueness
+            logger.error(f"Phone number already exists: {validated_data['phone']}")
             return Response(
-                {"error": "Mahalla topilmadi.", "error_en": "Mahalla not found"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        # Cleanup orphaned house_ids
-        logger.info("Pre-agent-claim cleanup: checking for orphaned house_ids")
-        try:
-            from apps.houses.models import House
-
-            existing_house_ids = set(House.objects.values_list("id", flat=True))
-            used_house_ids_in_qr = set(
-                QRCode.objects.filter(house_id__isnull=False).values_list(
-                    "house_id", flat=True
-                )
+                {
+                    "error": "Bu telefon raqami allaqachon ro'yxatdan o'tgan.",
+                    "error_en": "This phone number is already registered.",
+                    "detail": str(e),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            orphaned_ids = used_house_ids_in_qr - existing_house_ids
-
-            if orphaned_ids:
-                logger.warning(f"Found {len(orphaned_ids)} orphaned house_ids")
-                cleaned = QRCode.objects.filter(house_id__in=orphaned_ids).update(
-                    house_id=None
-                )
-                logger.info(f"Successfully cleaned up {cleaned} orphaned house_ids")
         except Exception as e:
-            logger.error(f"Error during orphaned house_ids cleanup: {str(e)}")
+            logger.error(f"Unexpected error during agent claim: {str(e)}")
+            return Response(
+                {
+                    "error": "Kutilmagan xatolik yuz berdi.",
+                    "error_en": "Unexpected error occurred.",
+                    "detail": str(e),
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-        # Retry logic for house creation with transaction
-        max_retries = 50
-        for attempt in range(max_retries):
-            try:
-                with transaction.atomic():
-                    # Create new user
-                    from apps.users.models import User
-
-                    new_user = User.objects.create(
-                        phone=validated_data["phone"],
-                        first_name=validated_data["first_name"],
-                        last_name=validated_data["last_name"],
-                        role=CLIENT_ROLE,  # New user is a client by default
-                        is_verified=False,  # User will verify later
-                    )
-                    logger.info(f"Created new user with phone: {new_user.phone}")
-
-                    # Create house
-                    new_house = House.objects.create(
-                        owner=new_user,
-                        mahalla=mahalla,
-                        address=validated_data["address"],
-                        house_number=validated_data.get("house_number", ""),
-                        created_by_agent=True,
-                    )
-                    logger.info(f"Created house with ID: {new_house.id}")
-
-                    # Update QR code to link to house
-                    qr.house = new_house
-                    qr.save(update_fields=["house"])
-
-                    logger.info(
-                        f"Successfully claimed QR {uuid} for new user {new_user.phone} and house {new_house.id}"
-                    )
-
-                    return Response(
-                        {
-                            "status": "success",
-                            "message": "Yangi user yaratildi va uy birikitirildi.",
-                            "message_en": "New user created and house associated successfully.",
-                            "user": {
-                                "id": new_user.id,
-                                "phone": new_user.phone,
-                                "first_name": new_user.first_name,
-                                "last_name": new_user.last_name,
-                            },
-                            "house": {
-                                "id": new_house.id,
-                                "address": new_house.address,
-                                "house_number": new_house.house_number,
-                                "mahalla": {
-                                    "id": mahalla.id,
-                                    "name": mahalla.name,
-                                },
-                            },
-                            "qr": {
-                                "uuid": qr.uuid,
-                                "qr_url": qr.get_qr_url(),
-                            },
-                        },
-                        status=status.HTTP_201_CREATED,
-                    )
-
-            except IntegrityError as e:
-                error_msg = str(e).lower()
-
-                if "unique constraint" in error_msg and "phone" in error_msg:
-                    # This shouldn't happen as we validated phone uniqueness
-                    logger.error(
-                        f"Phone number already exists: {validated_data['phone']}"
-                    )
-                    return Response(
-                        {
-                            "error": "Bu telefon raqami allaqachon ro'yxatdan o'tgan.",
-                            "error_en": "This phone number is already registered.",
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-                # House ID conflict - retry
-                if attempt < max_retries - 1:
-                    logger.warning(
-                        f"House ID conflict on attempt {attempt + 1}, retrying..."
-                    )
-                    continue
-                else:
-                    logger.error(
-                        f"Failed to create house after {max_retries} attempts: {str(e)}"
-                    )
-                    return Response(
-                        {
-                            "error": "Uyni yaratishda xatolik yuz berdi.",
-                            "error_en": "Error creating house after multiple attempts.",
-                            "detail": str(e),
-                        },
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
-
-            except Exception as e:
-                logger.error(f"Unexpected error during agent claim: {str(e)}")
-                return Response(
-                    {
-                        "error": "Kutilmagan xatolik yuz berdi.",
-                        "error_en": "Unexpected error occurred.",
-                        "detail": str(e),
-                    },
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
+        new_house, qr = result.house, result.qr
+        logger.info(
+            f"Successfully claimed QR {uuid} for new user {new_user.phone} and house {new_house.id}"
+        )
 
-        # This should never be reached due to the return in the except block
         return Response(
             {
-                "error": "Uyni yaratishda xatolik yuz berdi.",
-                "error_en": "Error creating house.",
+                "status": "success",
+                "message": "Yangi user yaratildi va uy birikitirildi.",
+                "message_en": "New user created and house associated successfully.",
+                "user": {
+                    "id": new_user.id,
+                    "phone": new_user.phone,
+                    "first_name": new_user.first_name,
+                    "last_name": new_user.last_name,
+                },
+                "house": {
+                    "id": new_house.id,
+                    "address": new_house.address,
+                    "house_number": new_house.house_number,
+                    "mahalla": {
+                        "id": mahalla.id,
+                        "name": mahalla.name,
+                    },
+                },
+                "qr": {
+                    "uuid": qr.uuid,
+                    "qr_url": qr.get_qr_url(),
+                },
             },
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status=status.HTTP_201_CREATED,
         )
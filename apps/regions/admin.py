@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Region, District, Mahalla
+from .models import Region, District, Mahalla, ExportJob
 
 
 @admin.register(Region)
@@ -33,3 +33,12 @@ class MahallaAdmin(admin.ModelAdmin):
         """Override queryset to ensure proper ordering"""
         qs = super().get_queryset(request)
         return qs.select_related("district", "admin").order_by("id")
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Admin interface for cached house export jobs."""
+
+    list_display = ("id", "export_name", "status", "row_count", "size", "created_at")
+    list_filter = ("status", "created_at")
+    readonly_fields = ("id", "key", "created_at", "started_at", "finished_at")
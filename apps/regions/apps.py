@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class RegionsConfig(AppConfig):
     name = "apps.regions"
+
+    def ready(self):
+        import apps.regions.signals
@@ -0,0 +1,311 @@
+"""
+Cached, deduplicated XLSX house exports.
+
+An export request becomes an ``ExportJob`` keyed by its scope and the data
+version of that scope:
+
+- Identical requests share one job: the first creates it, the others find
+  the pending or running job and wait for it (the unique constraint on
+  active keys settles races between workers).
+- A completed job's file is handed out again until the data changes. The
+  version combines a change counter, bumped by the signals in
+  ``apps.regions.signals``, with the scope's house count and latest
+  ``created_at``, which also catch bulk inserts and deletes.
+- Files are evicted once a newer export of the same scope exists, and
+  least recently used first when the total size exceeds
+  ``EXPORT_CACHE_MAX_MB``.
+
+Scopes up to ``EXPORT_SYNC_LIMIT`` houses are exported within the request;
+larger ones are processed by the ``run_export_jobs`` management command.
+"""
+
+import hashlib
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from apps.core.metrics import Counter
+
+from .exports import ExportScope, house_rows, scope_houses, write_houses_xlsx
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+exports_created = Counter("exports.created", "Export jobs created")
+exports_reused = Counter("exports.reused", "Export requests served by an existing job")
+exports_evicted = Counter("exports.evicted", "Export files evicted")
+
+VERSION_KEY = "exports:data_version"
+ACTIVE_STATUSES = ("pending", "running", "completed")
+
+
+def get_sync_limit() -> int:
+    return getattr(settings, "EXPORT_SYNC_LIMIT", 50000)
+
+
+def exports_dir() -> str:
+    return os.path.join(settings.MEDIA_ROOT, "exports")
+
+
+def job_path(job: ExportJob) -> str:
+    return os.path.join(exports_dir(), job.filename)
+
+
+def bump_data_version() -> None:
+    """Invalidate all cached exports (house, owner or place names changed)."""
+    # A fresh timestamp instead of incr: cache.incr does not keep timeout=None
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def data_version(houses) -> Tuple[str, int]:
+    """
+    Version of the data behind ``houses``.
+
+    Returns:
+        tuple: (version string, number of houses)
+    """
+    counter = cache.get(VERSION_KEY)
+    if counter is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        counter = cache.get(VERSION_KEY)
+    stats = houses.order_by().aggregate(count=Count("id"), latest=Max("created_at"))
+    latest = stats["latest"].isoformat() if stats["latest"] else "-"
+    return f"{counter}:{stats['count']}:{latest}", stats["count"]
+
+
+def job_key(scope_key: str, version: str) -> str:
+    return hashlib.sha256(f"xlsx|{scope_key}|{version}".encode()).hexdigest()
+
+
+def _fail_stale_jobs() -> None:
+    """Release jobs whose worker died, so their key can be requested again."""
+    timeout = getattr(settings, "EXPORT_JOB_TIMEOUT", 1800)
+    cutoff = timezone.now() - timezone.timedelta(seconds=timeout)
+    ExportJob.objects.filter(status="running", started_at__lt=cutoff).update(
+        status="failed",
+        error_message="Timed out",
+        finished_at=timezone.now(),
+    )
+
+
+def _active_job(key: str) -> Optional[ExportJob]:
+    job = ExportJob.objects.filter(key=key, status__in=ACTIVE_STATUSES).first()
+    if job and job.status == "completed" and not os.path.exists(job_path(job)):
+        # File removed behind our back, export again
+        job.delete()
+        return None
+    return job
+
+
+def request_export(scope: ExportScope, user) -> Tuple[ExportJob, bool]:
+    """
+    Job for exporting ``scope`` at its current data version.
+
+    Returns:
+        tuple: (job, created); ``created`` is False when an identical
+        request already made (or is making) the file
+    """
+    version, row_count = data_version(scope.houses)
+    key = job_key(scope.key, version)
+    _fail_stale_jobs()
+
+    job = _active_job(key)
+    if job is None:
+        try:
+            with transaction.atomic():
+                job = ExportJob.objects.create(
+                    key=key,
+                    scope=scope.key,
+                    export_name=scope.name,
+                    data_version=version,
+                    row_count=row_count,
+                    created_by=user,
+                )
+        except IntegrityError:
+            # Another request created it in the meantime
+            job = ExportJob.objects.get(key=key, status__in=ACTIVE_STATUSES)
+        else:
+            exports_created.increment()
+            return job, True
+
+    exports_reused.increment()
+    job.last_accessed_at = timezone.now()
+    job.save(update_fields=["last_accessed_at"])
+    return job, False
+
+
+def claim_job(job: ExportJob) -> bool:
+    """Mark a pending job as running; False if someone else took it."""
+    started_at = timezone.now()
+    claimed = ExportJob.objects.filter(id=job.id, status="pending").update(
+        status="running", started_at=started_at
+    )
+    if claimed:
+        job.status = "running"
+        job.started_at = started_at
+    return bool(claimed)
+
+
+def claim_next_job() -> Optional[ExportJob]:
+    """
+    Mark the oldest pending job as running and return it.
+
+    Rows locked by other workers are skipped, so several workers can run
+    side by side.
+    """
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def run_job(job: ExportJob) -> None:
+    """Write the XLSX file of a running job, then evict old files."""
+    timestamp = timezone.localtime(job.created_at).strftime("%Y%m%d_%H%M%S")
+    job.filename = f"Xonadonlar_{job.export_name}_{timestamp}_{job.id.hex[:8]}.xlsx"
+    path = job_path(job)
+
+    try:
+        os.makedirs(exports_dir(), exist_ok=True)
+        # The file only appears under its final name once complete
+        job.row_count = write_houses_xlsx(
+            house_rows(scope_houses(job.scope)), f"{path}.part"
+        )
+        os.replace(f"{path}.part", path)
+        job.size = os.path.getsize(path)
+    except Exception as e:
+        logger.exception(f"Export job {job.id} failed")
+        job.status = "failed"
+        job.error_message = str(e)
+        job.filename = ""
+    else:
+        job.status = "completed"
+        logger.info(f"Export job {job.id} completed: {job.row_count} houses")
+
+    job.finished_at = timezone.now()
+    job.save(
+        update_fields=[
+            "status",
+            "row_count",
+            "filename",
+            "size",
+            "error_message",
+            "finished_at",
+        ]
+    )
+    if job.status == "completed":
+        evict_exports()
+
+
+def wait_for_job(job: ExportJob, timeout: float) -> ExportJob:
+    """Poll a job until it is finished or ``timeout`` seconds have passed."""
+    deadline = time.monotonic() + timeout
+    while job.status in ("pending", "running") and time.monotonic() < deadline:
+        time.sleep(0.5)
+        job.refresh_from_db()
+    return job
+
+
+def run_pending_jobs() -> int:
+    """
+    Process pending jobs until none are left.
+
+    Returns:
+        Number of jobs processed
+    """
+    _fail_stale_jobs()
+    processed = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return processed
+        run_job(job)
+        processed += 1
+
+
+def _remove(filename: str) -> None:
+    try:
+        os.remove(os.path.join(exports_dir(), filename))
+    except FileNotFoundError:
+        pass
+
+
+def evict_exports(max_bytes: Optional[int] = None) -> int:
+    """
+    Delete export files that are no longer worth keeping.
+
+    - Completed exports superseded by a newer one of the same scope
+    - Least recently used exports beyond the size budget
+    - Failed jobs, and files no job refers to (exports from before jobs,
+      leftover ``.part`` files), once older than ``EXPORT_JOB_TIMEOUT``
+
+    Returns:
+        Number of files deleted
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, "EXPORT_CACHE_MAX_MB", 1024) * 1024 * 1024
+    timeout = getattr(settings, "EXPORT_JOB_TIMEOUT", 1800)
+    cutoff = timezone.now() - timezone.timedelta(seconds=timeout)
+
+    completed = list(
+        ExportJob.objects.filter(status="completed")
+        .order_by("-finished_at")
+        .values("id", "scope", "filename", "size", "last_accessed_at")
+    )
+    evict = []
+    latest_scopes = set()
+    kept = []
+    for job in completed:
+        if job["scope"] in latest_scopes:
+            evict.append(job)
+        else:
+            latest_scopes.add(job["scope"])
+            kept.append(job)
+
+    total = sum(job["size"] for job in kept)
+    for job in sorted(kept, key=lambda job: job["last_accessed_at"]):
+        if total <= max_bytes:
+            break
+        evict.append(job)
+        total -= job["size"]
+
+    # Rows go first, so no request is handed a file that is being deleted
+    ExportJob.objects.filter(id__in=[job["id"] for job in evict]).delete()
+    for job in evict:
+        _remove(job["filename"])
+    ExportJob.objects.filter(status="failed", created_at__lt=cutoff).delete()
+
+    removed = len(evict)
+    known = set(
+        ExportJob.objects.exclude(filename="").values_list("filename", flat=True)
+    )
+    if os.path.isdir(exports_dir()):
+        for entry in os.scandir(exports_dir()):
+            if (
+                entry.is_file()
+                and entry.name not in known
+                and entry.stat().st_mtime < cutoff.timestamp()
+            ):
+                _remove(entry.name)
+                removed += 1
+
+    if removed:
+        exports_evicted.increment(removed)
+        logger.info(f"Evicted {removed} export files")
+    return removed
@@ -1,21 +1,36 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 from datetime import datetime
 import os
 
-from .models import Region, District, Mahalla
-from apps.houses.models import House
+from apps.core.downloads import send_file
 
+from .export_jobs import (
+    claim_job,
+    get_sync_limit,
+    job_path,
+    request_export,
+    run_job,
+    wait_for_job,
+)
+from .exports import ExportScope, scope_houses, stream_csv, stream_ndjson
+from .models import Region, District, Mahalla, ExportJob
+from .serializers import ExportJobSerializer
 
-class ExportHousesView(APIView):
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class HouseExportScopeMixin:
     """
-    Export houses data to Excel.
+    Which houses a user may export, shared by all export formats.
 
     Query parameters:
     - region: Region ID (optional)
@@ -29,7 +44,12 @@ class ExportHousesView(APIView):
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    def get_export_scope(self, request):
+        """
+        Returns:
+            tuple: (ExportScope, None), or (None, error Response) if the
+            export is not allowed
+        """
         user = request.user
         region_id = request.query_params.get("region")
         district_id = request.query_params.get("district")
@@ -39,9 +59,12 @@ class ExportHousesView(APIView):
         if user.role == "leader":
             # Leader can only export their own mahalla
             if not hasattr(user, "mahalla"):
-                return Response(
-                    {"error": "Leader must be assigned to a mahalla"},
-                    status=status.HTTP_403_FORBIDDEN,
+                return (
+                    None,
+                    Response(
+                        {"error": "Leader must be assigned to a mahalla"},
+                        status=status.HTTP_403_FORBIDDEN,
+                    ),
                 )
 
             # Force mahalla_id to user's mahalla
@@ -49,152 +72,234 @@ class ExportHousesView(APIView):
 
             # If leader tries to specify different filters, deny
             if region_id or district_id:
-                return Response(
-                    {"error": "Leader can only export their own mahalla data"},
-                    status=status.HTTP_403_FORBIDDEN,
+                return (
+                    None,
+                    Response(
+                        {"error": "Leader can only export their own mahalla data"},
+                        status=status.HTTP_403_FORBIDDEN,
+                    ),
                 )
 
         elif user.role != "admin":
-            return Response(
-                {"error": "Only admin and leader can export data"},
-                status=status.HTTP_403_FORBIDDEN,
+            return (
+                None,
+                Response(
+                    {"error": "Only admin and leader can export data"},
+                    status=status.HTTP_403_FORBIDDEN,
+                ),
             )
 
-        # Build queryset based on filters
-        houses = House.objects.select_related(
-            "owner", "mahalla__district__region"
-        ).all()
-
         # Apply filters
         if mahalla_id:
-            houses = houses.filter(mahalla_id=mahalla_id)
             try:
                 mahalla = Mahalla.objects.select_related("district__region").get(
                     id=mahalla_id
                 )
                 export_name = f"{mahalla.district.region.name}_{mahalla.district.name}_{mahalla.name}"
+                scope_key = f"mahalla:{mahalla.id}"
             except Mahalla.DoesNotExist:
-                return Response(
-                    {"error": "Mahalla not found"}, status=status.HTTP_404_NOT_FOUND
+                return (
+                    None,
+                    Response(
+                        {"error": "Mahalla not found"}, status=status.HTTP_404_NOT_FOUND
+                    ),
                 )
         elif district_id:
-            houses = houses.filter(mahalla__district_id=district_id)
             try:
                 district = District.objects.select_related("region").get(id=district_id)
                 export_name = f"{district.region.name}_{district.name}"
+                scope_key = f"district:{district.id}"
             except District.DoesNotExist:
-                return Response(
-                    {"error": "District not found"}, status=status.HTTP_404_NOT_FOUND
+                return (
+                    None,
+                    Response(
+                        {"error": "District not found"},
+                        status=status.HTTP_404_NOT_FOUND,
+                    ),
                 )
         elif region_id:
-            houses = houses.filter(mahalla__district__region_id=region_id)
             try:
                 region = Region.objects.get(id=region_id)
                 export_name = region.name
+                scope_key = f"region:{region.id}"
             except Region.DoesNotExist:
-                return Response(
-                    {"error": "Region not found"}, status=status.HTTP_404_NOT_FOUND
+                return (
+                    None,
+                    Response(
+                        {"error": "Region not found"}, status=status.HTTP_404_NOT_FOUND
+                    ),
                 )
         else:
             export_name = "All_Data"
+            scope_key = "all"
 
-        # Create Excel file
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Xonadonlar"
+        # Rows are read as values_list projections, see apps.regions.exports
+        return ExportScope(scope_key, export_name, scope_houses(scope_key)), None
 
-        # Header style
-        header_fill = PatternFill(
-            start_color="4472C4", end_color="4472C4", fill_type="solid"
-        )
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        header_alignment = Alignment(horizontal="center", vertical="center")
-
-        # Headers
-        headers = [
-            "ID",
-            "Viloyat",
-            "Tuman",
-            "Mahalla",
-            "Manzil",
-            "Uy raqami",
-            "Egasining telefoni",
-            "Egasining ismi",
-            "Egasining familiyasi",
-            "Yaratilgan sana",
-        ]
-
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-
-        # Data rows
-        for row_idx, house in enumerate(houses, 2):
-            ws.cell(row=row_idx, column=1, value=house.id)
-            ws.cell(row=row_idx, column=2, value=house.mahalla.district.region.name)
-            ws.cell(row=row_idx, column=3, value=house.mahalla.district.name)
-            ws.cell(row=row_idx, column=4, value=house.mahalla.name)
-            ws.cell(row=row_idx, column=5, value=house.address)
-            ws.cell(row=row_idx, column=6, value=house.house_number)
-            ws.cell(
-                row=row_idx, column=7, value=house.owner.phone if house.owner else ""
-            )
-            ws.cell(
-                row=row_idx,
-                column=8,
-                value=house.owner.first_name if house.owner else "",
-            )
-            ws.cell(
-                row=row_idx,
-                column=9,
-                value=house.owner.last_name if house.owner else "",
-            )
-            ws.cell(
-                row=row_idx,
-                column=10,
-                value=house.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            )
-
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Save file to media/exports directory
+    @staticmethod
+    def export_filename(export_name, extension):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"Xonadonlar_{export_name}_{timestamp}.xlsx"
+        return f"Xonadonlar_{export_name}_{timestamp}.{extension}"
 
-        # Create exports directory if it doesn't exist
-        exports_dir = os.path.join(settings.MEDIA_ROOT, "exports")
-        os.makedirs(exports_dir, exist_ok=True)
 
-        # Save file
-        file_path = os.path.join(exports_dir, filename)
-        wb.save(file_path)
+class ExportHousesView(HouseExportScopeMixin, APIView):
+    """
+    Export houses data to Excel.
 
-        # Generate URL
-        file_url = f"{settings.MEDIA_URL}exports/{filename}"
+    Query parameters and permissions: see HouseExportScopeMixin.
 
-        # Build full URL if request is available
-        if request:
-            file_url = request.build_absolute_uri(file_url)
+    Exports are cached jobs (see apps.regions.export_jobs): an unchanged
+    scope gets the existing file back, and identical concurrent requests
+    share one job. Scopes above EXPORT_SYNC_LIMIT houses are exported in
+    the background and answered with 202 and a status URL.
+    """
+
+    def get(self, request):
+        scope, error = self.get_export_scope(request)
+        if error:
+            return error
+
+        job, created = request_export(scope, request.user)
+        if job.row_count <= get_sync_limit():
+            if created and claim_job(job):
+                run_job(job)
+            else:
+                wait_for_job(job, getattr(settings, "EXPORT_WAIT_SECONDS", 20))
+
+        if job.status == "completed":
+            urls = ExportJobSerializer(job, context={"request": request}).data
+            return Response(
+                {
+                    "success": True,
+                    "message": "Excel fayl muvaffaqiyatli yaratildi",
+                    "file_url": urls["file_url"],
+                    "download_url": urls["download_url"],
+                    "filename": job.filename,
+                    "job_id": str(job.id),
+                    "cached": not created,
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        if job.status == "failed":
+            return Response(
+                {
+                    "error": "Excel fayl yaratishda xatolik yuz berdi.",
+                    "error_en": "Error occurred while generating the Excel file.",
+                    "detail": job.error_message,
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
         return Response(
             {
-                "success": True,
-                "message": "Excel fayl muvaffaqiyatli yaratildi",
-                "file_url": file_url,
-                "filename": filename,
+                "job_id": str(job.id),
+                "status": job.status,
+                "status_url": request.build_absolute_uri(
+                    reverse("export-job-detail", kwargs={"job_id": job.id})
+                ),
+                "message": "Excel fayl fonda yaratilmoqda",
+                "message_en": "The Excel file is being generated in the background",
             },
-            status=status.HTTP_200_OK,
+            status=status.HTTP_202_ACCEPTED,
         )
+
+
+class ExportJobDetailView(generics.RetrieveAPIView):
+    """
+    Status of a house export job.
+
+    GET /api/export/houses/jobs/{job_id}/
+
+    ``download_url`` (and its alias ``file_url``) is set once the job is
+    completed. Leaders see the jobs of their own mahalla.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = ExportJobSerializer
+    lookup_url_kwarg = "job_id"
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == "admin":
+            return ExportJob.objects.all()
+        if user.role == "leader" and user.mahalla_id:
+            return ExportJob.objects.filter(scope=f"mahalla:{user.mahalla_id}")
+        return ExportJob.objects.none()
+
+
+class ExportJobDownloadView(ExportJobDetailView):
+    """
+    Download the XLSX file of a completed export job.
+
+    GET /api/export/houses/jobs/{job_id}/download/
+
+    Same permissions as the job status; the transfer is handed to nginx
+    (see apps.core.downloads).
+    """
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        path = job_path(job) if job.filename else None
+        if job.status != "completed" or not path or not os.path.exists(path):
+            return Response(
+                {
+                    "error": "Fayl topilmadi.",
+                    "error_en": "File not found.",
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        # Downloads count as use for the LRU eviction
+        ExportJob.objects.filter(id=job.id).update(last_accessed_at=timezone.now())
+        return send_file(request, path, job.filename, XLSX_CONTENT_TYPE)
+
+
+class StreamingHouseExportView(HouseExportScopeMixin, APIView):
+    """
+    Base for exports streamed straight to the client.
+
+    Rows are rendered chunk by chunk from a server-side cursor while the
+    response is being sent: nothing is written to MEDIA_ROOT, memory stays
+    constant and the first bytes go out before the query finishes.
+    """
+
+    extension = None
+    content_type = None
+
+    def render(self, houses):
+        raise NotImplementedError
+
+    def get(self, request):
+        scope, error = self.get_export_scope(request)
+        if error:
+            return error
+
+        response = StreamingHttpResponse(
+            self.render(scope.houses), content_type=self.content_type
+        )
+        response["Content-Disposition"] = content_disposition_header(
+            True, self.export_filename(scope.name, self.extension)
+        )
+        # Let nginx pass chunks through instead of buffering the whole dump
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class ExportHousesCSVView(StreamingHouseExportView):
+    """Export houses data as CSV (UTF-8, same columns as the Excel export)."""
+
+    extension = "csv"
+    content_type = "text/csv; charset=utf-8"
+
+    def render(self, houses):
+        return stream_csv(houses)
+
+
+class ExportHousesNDJSONView(StreamingHouseExportView):
+    """Export houses data as newline-delimited JSON, one house per line."""
+
+    extension = "ndjson"
+    content_type = "application/x-ndjson"
+
+    def render(self, houses):
+        return stream_ndjson(houses)
@@ -0,0 +1,234 @@
+"""
+House export writers.
+
+Rows are read with a ``values_list`` projection and ``.iterator()`` (a
+server-side cursor on PostgreSQL), so no model instances are built and only
+one chunk of rows is in memory at a time.
+
+- XLSX: an openpyxl write-only worksheet, which streams rows to a temporary
+  file instead of keeping a cell object per value.
+- CSV and NDJSON: generators of bytes for a ``StreamingHttpResponse``; no
+  file is written at all.
+"""
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List, NamedTuple, Sequence
+
+from django.conf import settings
+from django.db.models import QuerySet
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from apps.houses.models import House
+
+HEADERS = [
+    "ID",
+    "Viloyat",
+    "Tuman",
+    "Mahalla",
+    "Manzil",
+    "Uy raqami",
+    "Egasining telefoni",
+    "Egasining ismi",
+    "Egasining familiyasi",
+    "Yaratilgan sana",
+]
+
+# values_list projection, in HEADERS order
+FIELDS = [
+    "id",
+    "mahalla__district__region__name",
+    "mahalla__district__name",
+    "mahalla__name",
+    "address",
+    "house_number",
+    "owner__phone",
+    "owner__first_name",
+    "owner__last_name",
+    "created_at",
+]
+
+# NDJSON keys, in HEADERS order
+JSON_KEYS = [
+    "id",
+    "region",
+    "district",
+    "mahalla",
+    "address",
+    "house_number",
+    "owner_phone",
+    "owner_first_name",
+    "owner_last_name",
+    "created_at",
+]
+
+MAX_COLUMN_WIDTH = 50
+# Rows rendered per chunk of a streaming response
+STREAM_BATCH_SIZE = 500
+
+
+# Scope level -> House lookup
+SCOPE_LOOKUPS = {
+    "region": "mahalla__district__region_id",
+    "district": "mahalla__district_id",
+    "mahalla": "mahalla_id",
+}
+
+
+class ExportScope(NamedTuple):
+    """The houses an export covers."""
+
+    key: str  # "all", "region:<id>", "district:<id>" or "mahalla:<id>"
+    name: str  # Used in file names
+    houses: QuerySet
+
+
+def scope_houses(key: str) -> QuerySet:
+    """House queryset of a scope key."""
+    if key == "all":
+        return House.objects.all()
+    level, pk = key.split(":")
+    return House.objects.filter(**{SCOPE_LOOKUPS[level]: int(pk)})
+
+
+def export_chunk_size() -> int:
+    return getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+
+def house_values(houses, chunk_size: int = None) -> Iterator[tuple]:
+    """Raw FIELDS values of ``houses`` (a House queryset), one tuple per house."""
+    return houses.values_list(*FIELDS).iterator(
+        chunk_size=chunk_size or export_chunk_size()
+    )
+
+
+def house_rows(houses, chunk_size: int = None) -> Iterator[tuple]:
+    """
+    Export rows of ``houses`` (a House queryset), one tuple per house.
+
+    Houses without an owner get empty owner columns.
+    """
+    for row in house_values(houses, chunk_size):
+        row = ["" if value is None else value for value in row]
+        row[-1] = row[-1].strftime("%Y-%m-%d %H:%M:%S")
+        yield tuple(row)
+
+
+class ColumnWidths:
+    """Running maximum of the text length per column."""
+
+    def __init__(self, columns: int):
+        self.lengths = [0] * columns
+
+    def update(self, row: Sequence) -> None:
+        for i, value in enumerate(row):
+            length = len(str(value))
+            if length > self.lengths[i]:
+                self.lengths[i] = length
+
+    def widths(self) -> List[int]:
+        return [min(length + 2, MAX_COLUMN_WIDTH) for length in self.lengths]
+
+
+def write_houses_xlsx(rows: Iterable[tuple], target, sample_size: int = None) -> int:
+    """
+    Write export rows to an XLSX file with a styled header.
+
+    A write-only sheet has to declare column widths before its first row, so
+    the widths are taken from the header and the first ``sample_size`` rows
+    (default: one iterator chunk), which are held back until then.
+
+    Args:
+        rows: Tuples from ``house_rows``
+        target: File path or binary file object
+        sample_size: Rows used to size the columns
+
+    Returns:
+        int: Number of data rows written
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Xonadonlar")
+
+    widths = ColumnWidths(len(HEADERS))
+    widths.update(HEADERS)
+
+    rows = iter(rows)
+    sample = []
+    for row in rows:
+        sample.append(row)
+        widths.update(row)
+        if len(sample) >= (sample_size or export_chunk_size()):
+            break
+
+    for col, width in enumerate(widths.widths(), 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    header_fill = PatternFill(
+        start_color="4472C4", end_color="4472C4", fill_type="solid"
+    )
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    header = []
+    for title in HEADERS:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header.append(cell)
+    ws.append(header)
+
+    count = 0
+    for row in sample:
+        ws.append(row)
+        count += 1
+    for row in rows:
+        ws.append(row)
+        count += 1
+
+    wb.save(target)
+    return count
+
+
+def _batched(rows: Iterator, size: int = STREAM_BATCH_SIZE) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(houses) -> Iterator[bytes]:
+    """CSV of ``houses`` (UTF-8, header first), in chunks of encoded rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    # Sent before the query runs, so the client gets its first byte at once
+    writer.writerow(HEADERS)
+    yield flush()
+    for batch in _batched(house_rows(houses)):
+        writer.writerows(batch)
+        yield flush()
+
+
+def stream_ndjson(houses) -> Iterator[bytes]:
+    """One JSON object per house and line; missing owner fields are null."""
+    for batch in _batched(house_values(houses)):
+        lines = []
+        for row in batch:
+            record = dict(zip(JSON_KEYS, row))
+            record["created_at"] = record["created_at"].isoformat()
+            lines.append(json.dumps(record, ensure_ascii=False))
+        yield ("\n".join(lines) + "\n").encode()
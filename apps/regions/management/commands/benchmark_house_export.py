@@ -0,0 +1,155 @@
+import os
+import resource
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font, PatternFill
+
+from apps.houses.models import House
+from apps.regions.exports import HEADERS, house_rows, write_houses_xlsx
+from apps.regions.models import District, Mahalla, Region
+from apps.users.models import User
+
+BATCH_SIZE = 5000
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def legacy_export(houses, path) -> None:
+    """The previous in-memory implementation, for comparison."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Xonadonlar"
+    header_fill = PatternFill(
+        start_color="4472C4", end_color="4472C4", fill_type="solid"
+    )
+    for col, header in enumerate(HEADERS, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.fill = header_fill
+        cell.font = Font(bold=True, color="FFFFFF", size=12)
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+
+    houses = houses.select_related("owner", "mahalla__district__region")
+    for row_idx, house in enumerate(houses, 2):
+        owner = house.owner
+        values = [
+            house.id,
+            house.mahalla.district.region.name,
+            house.mahalla.district.name,
+            house.mahalla.name,
+            house.address,
+            house.house_number,
+            owner.phone if owner else "",
+            owner.first_name if owner else "",
+            owner.last_name if owner else "",
+            house.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        ]
+        for col, value in enumerate(values, 1):
+            ws.cell(row=row_idx, column=col, value=value)
+
+    for column in ws.columns:
+        max_length = max(len(str(cell.value)) for cell in column)
+        ws.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+    wb.save(path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the house XLSX export at a given size. Test houses are "
+        "created inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--houses",
+            type=int,
+            nargs="+",
+            default=[100_000, 1_000_000],
+            help="House counts to measure (default: 100000 1000000)",
+        )
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Also run the previous in-memory export (slow at 1M)",
+        )
+
+    def handle(self, *args, **options):
+        if min(options["houses"]) < 1:
+            raise CommandError("--houses must be positive")
+
+        for count in sorted(options["houses"]):
+            try:
+                with transaction.atomic():
+                    houses = self.create_houses(count)
+                    self.measure("streaming", count, houses, self.streaming_export)
+                    if options["legacy"]:
+                        self.measure("legacy", count, houses, legacy_export)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def create_houses(self, count: int):
+        self.stdout.write(f"Creating {count} houses...")
+        region = Region.objects.create(name="Export benchmark")
+        district = District.objects.create(region=region, name="Benchmark")
+        mahallas = [
+            Mahalla.objects.create(district=district, name=f"Benchmark {i}")
+            for i in range(10)
+        ]
+        owner = User.objects.create(
+            phone="+998000000000", first_name="Benchmark", last_name="Owner"
+        )
+        now = timezone.now()
+
+        for start in range(0, count, BATCH_SIZE):
+            size = min(BATCH_SIZE, count - start)
+            ids = House.allocate_ids(size)
+            House.objects.bulk_create(
+                [
+                    House(
+                        id=house_id,
+                        mahalla=mahallas[i % len(mahallas)],
+                        # Every other house has no owner, like unclaimed QR codes
+                        owner=owner if i % 2 else None,
+                        address=f"Benchmark ko'chasi, {start + i}",
+                        house_number=str(start + i),
+                        created_at=now,
+                    )
+                    for i, house_id in enumerate(ids)
+                ]
+            )
+        return House.objects.filter(mahalla__district=district)
+
+    @staticmethod
+    def streaming_export(houses, path) -> None:
+        write_houses_xlsx(house_rows(houses), path)
+
+    def measure(self, label, count, houses, export) -> None:
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        rss_before = _peak_rss_mb()
+        started = time.perf_counter()
+        try:
+            export(houses, path)
+            elapsed = time.perf_counter() - started
+            size_mb = os.path.getsize(path) / 1024 / 1024
+        finally:
+            os.remove(path)
+
+        self.stdout.write(
+            f"  {label:<9} {count} houses: {elapsed:.1f}s "
+            f"({count / elapsed:.0f} rows/s), file {size_mb:.1f} MB, "
+            f"peak RSS {_peak_rss_mb():.0f} MB "
+            f"(+{_peak_rss_mb() - rss_before:.0f} MB)"
+        )
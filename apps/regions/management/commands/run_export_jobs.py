@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.regions.export_jobs import evict_exports, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Process background house export jobs and evict old export files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the pending jobs and exit instead of polling",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Processing house export jobs")
+
+        try:
+            while True:
+                processed = run_pending_jobs()
+                if processed:
+                    self.stdout.write(self.style.SUCCESS(f"✓ {processed} exports done"))
+                evict_exports()
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
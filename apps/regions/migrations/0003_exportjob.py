@@ -0,0 +1,129 @@
+# Generated by Django 5.2 on 2026-10-18 17:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("regions", "0002_alter_district_id_alter_mahalla_id_alter_region_id"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, verbose_name="Cache key")),
+                (
+                    "scope",
+                    models.CharField(
+                        help_text='"all", "region:<id>", "district:<id>" or "mahalla:<id>"',
+                        max_length=50,
+                        verbose_name="Scope",
+                    ),
+                ),
+                (
+                    "export_name",
+                    models.CharField(max_length=255, verbose_name="Export name"),
+                ),
+                (
+                    "data_version",
+                    models.CharField(max_length=100, verbose_name="Data version"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "row_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Rows"),
+                ),
+                (
+                    "filename",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="XLSX file"
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveBigIntegerField(default=0, verbose_name="File size"),
+                ),
+                (
+                    "error_message",
+                    models.TextField(blank=True, null=True, verbose_name="Error"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Started at"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Finished at"
+                    ),
+                ),
+                (
+                    "last_accessed_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Last accessed at"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="export_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Created by",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Export Job",
+                "verbose_name_plural": "Export Jobs",
+                "ordering": ["-created_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(
+                            ("status__in", ["pending", "running", "completed"])
+                        ),
+                        fields=("key",),
+                        name="unique_active_export_job",
+                    )
+                ],
+            },
+        ),
+    ]
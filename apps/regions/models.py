@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from apps.utils import GapFillingIDMixin
 from apps.users.models import User
@@ -58,3 +60,78 @@ class Mahalla(GapFillingIDMixin, models.Model):
 
     def __str__(self):
         return f"{self.district.name} - {self.name}"
+
+
+class ExportJob(models.Model):
+    """
+    XLSX house export, shared by identical requests and cached on disk.
+
+    ``key`` identifies the scope and the data version the file was made
+    from; there is at most one pending, running or completed job per key.
+    See apps.regions.export_jobs.
+    """
+
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    )
+
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False, verbose_name="ID"
+    )
+    key = models.CharField(max_length=64, verbose_name="Cache key")
+    scope = models.CharField(
+        max_length=50,
+        verbose_name="Scope",
+        help_text='"all", "region:<id>", "district:<id>" or "mahalla:<id>"',
+    )
+    export_name = models.CharField(max_length=255, verbose_name="Export name")
+    data_version = models.CharField(max_length=100, verbose_name="Data version")
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="pending",
+        verbose_name="Status",
+        db_index=True,
+    )
+    row_count = models.PositiveIntegerField(default=0, verbose_name="Rows")
+    filename = models.CharField(max_length=255, blank=True, verbose_name="XLSX file")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="File size")
+    error_message = models.TextField(blank=True, null=True, verbose_name="Error")
+
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="export_jobs",
+        verbose_name="Created by",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created at")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started at")
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Finished at"
+    )
+    last_accessed_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Last accessed at"
+    )
+
+    class Meta:
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+        ordering = ["-created_at"]
+        constraints = [
+            # Identical concurrent requests end up on the same job
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status__in=["pending", "running", "completed"]),
+                name="unique_active_export_job",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"Export {self.export_name} ({self.status})"
@@ -1,5 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Region, District, Mahalla
+from .models import Region, District, Mahalla, ExportJob
 from apps.users.models import User
 from apps.houses.models import House
 
@@ -81,11 +82,13 @@ class MahallaNestedSerializer(serializers.ModelSerializer):
         Returns:
             list: List of unique user IDs.
         """
-        houses = House.objects.filter(mahalla=obj, owner__isnull=False).select_related(
-            "owner"
+        owner_ids = (
+            House.objects.filter(mahalla=obj, owner__isnull=False)
+            .order_by()
+            .values_list("owner_id", flat=True)
+            .distinct()
         )
-        user_ids = list(set(house.owner.id for house in houses))
-        return user_ids
+        return sorted(owner_ids)
 
 
 class DistrictSerializer(serializers.ModelSerializer):
@@ -333,3 +336,43 @@ class RegionDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Region
         fields = ("id", "name", "districts")
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """
+    House export job with download URL.
+    """
+
+    file_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            "id",
+            "status",
+            "scope",
+            "export_name",
+            "row_count",
+            "filename",
+            "size",
+            "file_url",
+            "download_url",
+            "error_message",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_file_url(self, obj: ExportJob):
+        """Alias of ``download_url``, kept for older clients."""
+        return self.get_download_url(obj)
+
+    def get_download_url(self, obj: ExportJob):
+        """Return the permission-checked, resumable download URL."""
+        if obj.status != "completed" or not obj.filename:
+            return None
+        url = reverse("export-job-download", kwargs={"job_id": obj.id})
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,61 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.houses.models import House
+from apps.users.models import User
+
+from .export_jobs import bump_data_version
+from .models import District, Mahalla, Region
+from .tree import bump_tree_version
+
+# User fields that appear in house exports and as mahalla admin names
+EXPORTED_USER_FIELDS = {"phone", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=House)
+@receiver(post_delete, sender=House)
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+@receiver(post_save, sender=Mahalla)
+@receiver(post_delete, sender=Mahalla)
+def invalidate_exports(sender, **kwargs):
+    """Cached house exports are stale once exported data changes."""
+    bump_data_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_exports_for_owner(sender, instance, update_fields=None, **kwargs):
+    """Owner or mahalla admin names changed; logins (last_login only) are ignored."""
+    if update_fields is None or EXPORTED_USER_FIELDS & set(update_fields):
+        bump_data_version()
+        bump_tree_version()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_tree_for_user(sender, **kwargs):
+    # Mahalla.admin is cleared with an UPDATE that sends no signal
+    bump_tree_version()
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+@receiver(post_save, sender=Mahalla)
+@receiver(post_delete, sender=Mahalla)
+@receiver(post_delete, sender=House)
+def invalidate_tree(sender, **kwargs):
+    """The cached geography tree is stale once its places change."""
+    bump_tree_version()
+
+
+@receiver(post_save, sender=House)
+def invalidate_tree_for_house(sender, instance, created, update_fields=None, **kwargs):
+    """Only house ownership appears in the tree."""
+    if created:
+        if instance.owner_id:
+            bump_tree_version()
+    elif update_fields is None or "owner" in update_fields:
+        bump_tree_version()
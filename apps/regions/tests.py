@@ -0,0 +1,276 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from apps.houses.models import House
+from apps.qrcodes.claims import claim_house
+from apps.qrcodes.models import QRCode
+from apps.users.models import User
+from . import export_jobs
+from .export_jobs import evict_exports, request_export, run_pending_jobs
+from .exports import ExportScope, scope_houses
+from .models import District, ExportJob, Mahalla, Region
+from .tree import build_tree
+
+
+class ExportTestMixin:
+    """Three houses in a mahalla and a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        region = Region.objects.create(name="Toshkent")
+        district = District.objects.create(region=region, name="Chilonzor")
+        self.mahalla = Mahalla.objects.create(district=district, name="Qatortol")
+        self.other = Mahalla.objects.create(district=district, name="Boshqa")
+        for number in range(3):
+            House.objects.create(mahalla=self.mahalla, address=f"{number}-uy")
+
+    def scope(self, mahalla=None):
+        mahalla = mahalla or self.mahalla
+        key = f"mahalla:{mahalla.id}"
+        return ExportScope(key=key, name=mahalla.name, houses=scope_houses(key))
+
+    def export(self, mahalla=None):
+        job, created = request_export(self.scope(mahalla), None)
+        run_pending_jobs()
+        job.refresh_from_db()
+        return job, created
+
+
+class ExportJobTests(ExportTestMixin, TestCase):
+    def test_identical_requests_share_a_job(self):
+        first, created = request_export(self.scope(), None)
+        second, created_again = request_export(self.scope(), None)
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+    def test_completed_job_is_reused_until_data_changes(self):
+        job, _ = self.export()
+
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.row_count, 3)
+        sheet = load_workbook(export_jobs.job_path(job), read_only=True).active
+        # Header and one row per house
+        self.assertEqual(len(list(sheet.iter_rows())), 4)
+
+        reused, created = request_export(self.scope(), None)
+        self.assertFalse(created)
+        self.assertEqual(reused.id, job.id)
+
+        House.objects.create(mahalla=self.mahalla, address="Yangi")
+        fresh, created = request_export(self.scope(), None)
+        self.assertTrue(created)
+        self.assertNotEqual(fresh.id, job.id)
+
+    def test_newer_export_evicts_the_old_file(self):
+        old, _ = self.export()
+        House.objects.create(mahalla=self.mahalla, address="Yangi")
+        new, _ = self.export()
+
+        self.assertEqual(new.row_count, 4)
+        self.assertFalse(ExportJob.objects.filter(id=old.id).exists())
+        self.assertFalse(os.path.exists(export_jobs.job_path(old)))
+        self.assertTrue(os.path.exists(export_jobs.job_path(new)))
+
+    def test_missing_file_is_exported_again(self):
+        job, _ = self.export()
+        os.remove(export_jobs.job_path(job))
+
+        again, created = request_export(self.scope(), None)
+
+        self.assertTrue(created)
+        self.assertNotEqual(again.id, job.id)
+
+    def test_least_recently_used_export_goes_over_budget(self):
+        used, _ = self.export()
+        unused, _ = self.export(self.other)
+        ExportJob.objects.filter(id=unused.id).update(
+            last_accessed_at=timezone.now() - timedelta(days=1)
+        )
+
+        self.assertEqual(evict_exports(max_bytes=used.size), 1)
+        self.assertEqual(
+            list(ExportJob.objects.values_list("id", flat=True)), [used.id]
+        )
+
+    def test_stale_running_job_is_released(self):
+        job, _ = request_export(self.scope(), None)
+        ExportJob.objects.filter(id=job.id).update(
+            status="running", started_at=timezone.now() - timedelta(hours=1)
+        )
+
+        with override_settings(EXPORT_JOB_TIMEOUT=60):
+            again, created = request_export(self.scope(), None)
+
+        self.assertTrue(created)
+        self.assertEqual(ExportJob.objects.get(id=job.id).status, "failed")
+
+    def test_failed_export_is_recorded(self):
+        job, _ = request_export(self.scope(), None)
+        with self.assertLogs("apps.regions.export_jobs", level="ERROR"):
+            with mock.patch.object(
+                export_jobs, "write_houses_xlsx", side_effect=OSError("disk full")
+            ):
+                run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.filename, "")
+        self.assertEqual(job.error_message, "disk full")
+        self.assertEqual(os.listdir(export_jobs.exports_dir()), [])
+
+    def test_unwritable_directory_fails_the_job(self):
+        job, _ = request_export(self.scope(), None)
+        with self.assertLogs("apps.regions.export_jobs", level="ERROR"):
+            with mock.patch.object(
+                export_jobs.os, "makedirs", side_effect=PermissionError("denied")
+            ):
+                run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, DOWNLOADS_ACCEL_REDIRECT=False)
+class ExportJobDownloadTests(ExportTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.job, _ = self.export()
+        self.client = APIClient()
+
+    def detail(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get(f"/api/export/houses/jobs/{self.job.id}/")
+
+    def test_job_links_to_the_protected_download(self):
+        admin = User.objects.create(phone="+998901111111", role="admin")
+
+        data = self.detail(admin).json()
+
+        self.assertEqual(data["file_url"], data["download_url"])
+        self.assertTrue(
+            data["download_url"].endswith(
+                f"/api/export/houses/jobs/{self.job.id}/download/"
+            )
+        )
+        response = self.client.get(data["download_url"], HTTP_RANGE="bytes=0-3")
+        self.assertEqual(response.status_code, 206)
+        # XLSX files are ZIP archives
+        self.assertEqual(b"".join(response.streaming_content), b"PK\x03\x04")
+
+    def test_leader_of_the_mahalla_may_download(self):
+        leader = User.objects.create(
+            phone="+998902222222", role="leader", mahalla=self.mahalla
+        )
+        self.client.force_authenticate(leader)
+
+        response = self.client.get(f"/api/export/houses/jobs/{self.job.id}/download/")
+
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_other_users_cannot_download(self):
+        leader = User.objects.create(
+            phone="+998903333333", role="leader", mahalla=self.other
+        )
+        url = f"/api/export/houses/jobs/{self.job.id}/download/"
+
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_authenticate(leader)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RegionTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.region = Region.objects.create(name="Toshkent")
+        district = District.objects.create(region=self.region, name="Chilonzor")
+        self.mahalla = Mahalla.objects.create(district=district, name="Qatortol")
+        self.owner = User.objects.create(phone="+998901111111", role="client")
+        House.objects.create(owner=self.owner, mahalla=self.mahalla, address="1-uy")
+        House.objects.create(owner=self.owner, mahalla=self.mahalla, address="2-uy")
+        self.url = f"/api/regions/{self.region.id}/"
+
+    def test_tree_lists_owners_once_per_mahalla(self):
+        [region] = build_tree()
+        [district] = region["districts"]
+        [mahalla] = district["neighborhoods"]
+
+        self.assertEqual(mahalla["users"], [self.owner.id])
+        self.assertNotIn(
+            "users",
+            build_tree(include_users=False)[0]["districts"][0]["neighborhoods"][0],
+        )
+
+    def test_matching_etag_is_not_modified_without_queries(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+    def test_etag_depends_on_the_query(self):
+        plain = self.client.get(self.url, {"include_users": "false"})
+        full = self.client.get(self.url)
+
+        self.assertNotEqual(plain["ETag"], full["ETag"])
+        self.assertNotIn("users", plain.json()["districts"][0]["neighborhoods"][0])
+
+    def test_place_change_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.mahalla.name = "Yangi nom"
+        self.mahalla.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        mahalla = response.json()["districts"][0]["neighborhoods"][0]
+        self.assertEqual(mahalla["name"], "Yangi nom")
+
+    def test_unowned_house_keeps_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        House.objects.create(mahalla=self.mahalla, address="3-uy")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_claim_changes_etag(self):
+        # Claims write with a conditional UPDATE, which sends no signal
+        house = House.objects.create(mahalla=self.mahalla, address="3-uy")
+        qr = QRCode.objects.create(house=house)
+        other = User.objects.create(phone="+998902222222", role="client")
+        etag = self.client.get(self.url)["ETag"]
+
+        claim_house(qr.uuid, other, self.mahalla, "3-uy")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        mahalla = response.json()["districts"][0]["neighborhoods"][0]
+        self.assertEqual(mahalla["users"], sorted([self.owner.id, other.id]))
+
+    def test_unknown_region(self):
+        response = self.client.get("/api/regions/999999/")
+
+        self.assertEqual(response.status_code, 404)
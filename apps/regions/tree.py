@@ -0,0 +1,135 @@
+"""
+Cached geography tree: regions > districts > neighborhoods.
+
+The tree is built from flat ``values()`` queries, one per level, plus one
+aggregated query for the owner IDs per mahalla, instead of prefetching
+every house and owner in the country. It is cached under a version that
+the signals in ``apps.regions.signals`` bump when regions, districts,
+mahallas, mahalla admins or house ownership change, so a cached tree is
+never stale and the version can serve as the ETag.
+
+The output matches ``RegionDetailSerializer``.
+"""
+
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from apps.core.metrics import Counter
+from apps.houses.models import House
+
+from .models import District, Mahalla, Region
+
+tree_builds = Counter("regions.tree.builds", "Geography tree rebuilds")
+
+VERSION_KEY = "regions:tree:version"
+
+
+def bump_tree_version() -> None:
+    """Drop the cached tree (a region, district, mahalla or owner changed)."""
+    # A fresh timestamp instead of incr: cache.incr does not keep timeout=None
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def tree_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def mahalla_users() -> Dict[int, List[int]]:
+    """Sorted IDs of the house owners of each mahalla, from one query."""
+    houses = House.objects.filter(owner__isnull=False).order_by()
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.aggregates import ArrayAgg
+
+        rows = houses.values("mahalla_id").annotate(
+            users=ArrayAgg("owner_id", distinct=True)
+        )
+        return {row["mahalla_id"]: sorted(row["users"]) for row in rows}
+
+    users = defaultdict(list)
+    pairs = houses.values_list("mahalla_id", "owner_id").distinct()
+    for mahalla_id, owner_id in pairs.order_by("mahalla_id", "owner_id").iterator():
+        users[mahalla_id].append(owner_id)
+    return users
+
+
+def build_tree(include_users: bool = True) -> List[dict]:
+    """All regions with their districts and neighborhoods."""
+    tree_builds.increment()
+
+    regions = [
+        {"id": row["id"], "name": row["name"], "districts": []}
+        for row in Region.objects.order_by("name").values("id", "name")
+    ]
+    regions_by_id = {region["id"]: region for region in regions}
+
+    districts_by_id = {}
+    for row in District.objects.order_by("name").values("id", "name", "region_id"):
+        district = {"id": row["id"], "name": row["name"], "neighborhoods": []}
+        districts_by_id[row["id"]] = district
+        regions_by_id[row["region_id"]]["districts"].append(district)
+
+    users = mahalla_users() if include_users else None
+    mahallas = Mahalla.objects.order_by("name").values(
+        "id",
+        "name",
+        "district_id",
+        "admin_id",
+        "admin__first_name",
+        "admin__last_name",
+    )
+    for row in mahallas:
+        mahalla = {
+            "id": row["id"],
+            "name": row["name"],
+            "admin": row["admin_id"],
+            "admin_name": (
+                f"{row['admin__first_name']} {row['admin__last_name']}"
+                if row["admin_id"]
+                else None
+            ),
+        }
+        if include_users:
+            mahalla["users"] = users.get(row["id"], [])
+        districts_by_id[row["district_id"]]["neighborhoods"].append(mahalla)
+
+    return regions
+
+
+def get_tree(include_users: bool = True) -> Tuple[int, List[dict]]:
+    """
+    The cached tree, rebuilt if the data changed since it was cached.
+
+    Returns:
+        tuple: (version, list of region dicts)
+    """
+    version = tree_version()
+    key = f"regions:tree:{version}:{'users' if include_users else 'plain'}"
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree(include_users)
+        cache.set(key, tree, getattr(settings, "REGION_TREE_CACHE_TIMEOUT", 86400))
+    return version, tree
+
+
+def find_region(tree: List[dict], region_id) -> Optional[dict]:
+    for region in tree:
+        if str(region["id"]) == str(region_id):
+            return region
+    return None
+
+
+def find_district(tree: List[dict], district_id) -> Optional[dict]:
+    for region in tree:
+        for district in region["districts"]:
+            if str(district["id"]) == str(district_id):
+                return district
+    return None
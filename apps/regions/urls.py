@@ -1,7 +1,13 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import RegionViewSet, DistrictViewSet, MahallaViewSet
-from .export_views import ExportHousesView
+from .export_views import (
+    ExportHousesCSVView,
+    ExportHousesNDJSONView,
+    ExportHousesView,
+    ExportJobDetailView,
+    ExportJobDownloadView,
+)
 
 router = DefaultRouter()
 router.register("regions", RegionViewSet, basename="region")
@@ -12,4 +18,8 @@ router.register(
 
 urlpatterns = [
     path('export/houses/', ExportHousesView.as_view(), name='export-houses'),
+    path('export/houses/csv/', ExportHousesCSVView.as_view(), name='export-houses-csv'),
+    path('export/houses/ndjson/', ExportHousesNDJSONView.as_view(), name='export-houses-ndjson'),
+    path('export/houses/jobs/<uuid:job_id>/', ExportJobDetailView.as_view(), name='export-job-detail'),
+    path('export/houses/jobs/<uuid:job_id>/download/', ExportJobDownloadView.as_view(), name='export-job-download'),
 ] + router.urls
@@ -1,3 +1,7 @@
+import hashlib
+
+from django.http import Http404
+from django.utils.cache import get_conditional_response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
@@ -18,12 +22,41 @@ from .serializers import (
     MahallaNestedWriteSerializer,
 )
 from .permissions import IsAdmin, IsAdminOrGov
+from .tree import find_district, find_region, get_tree, tree_version
+
+
+def include_users(request) -> bool:
+    """``?include_users=false`` leaves the owner ID lists out of the tree."""
+    value = request.query_params.get("include_users", "true")
+    return value.lower() not in ("false", "0", "no")
+
+
+def tree_response(request, build):
+    """
+    Serve a response built from the cached geography tree, with an ETag.
+
+    The ETag comes from the tree version, so a matching If-None-Match is
+    answered with 304 without building anything.
+    """
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]
+    etag = f'"{tree_version()}-{path}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build(get_tree(include_users(request))[1])
+        response["ETag"] = etag
+    # Clients may keep the tree, but must check the ETag before reusing it
+    response["Cache-Control"] = "no-cache"
+    return response
 
 
 class RegionViewSet(ModelViewSet):
-    queryset = Region.objects.prefetch_related(
-        "districts__mahallas__admin", "districts__mahallas__houses__owner"
-    ).all()
+    """
+    Regions with their districts and neighborhoods.
+
+    List and retrieve are served from the cached tree (apps.regions.tree).
+    """
+
+    queryset = Region.objects.all()
 
     def get_permissions(self):
         """
@@ -41,6 +74,24 @@ class RegionViewSet(ModelViewSet):
             return RegionWriteSerializer
         return RegionDetailSerializer
 
+    def list(self, request, *args, **kwargs):
+        def build(tree):
+            page = self.paginate_queryset(tree)
+            if page is not None:
+                return self.get_paginated_response(page)
+            return Response(tree)
+
+        return tree_response(request, build)
+
+    def retrieve(self, request, *args, **kwargs):
+        def build(tree):
+            region = find_region(tree, kwargs["pk"])
+            if region is None:
+                raise Http404("No Region matches the given query.")
+            return Response(region)
+
+        return tree_response(request, build)
+
     @action(detail=True, methods=["get", "post"], url_path="districts")
     def districts(self, request, pk=None):
         """
@@ -49,20 +100,21 @@ class RegionViewSet(ModelViewSet):
         GET: List all districts in this region.
         POST: Create a new district in this region.
         """
-        region = self.get_object()
-
         if request.method == "GET":
-            districts = District.objects.filter(region=region).prefetch_related(
-                "mahallas__admin"
-            )
-            serializer = DistrictNestedSerializer(districts, many=True)
-            return Response(serializer.data)
 
-        elif request.method == "POST":
-            serializer = DistrictNestedWriteSerializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save(region=region)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            def build(tree):
+                region = find_region(tree, pk)
+                if region is None:
+                    raise Http404("No Region matches the given query.")
+                return Response(region["districts"])
+
+            return tree_response(request, build)
+
+        region = self.get_object()
+        serializer = DistrictNestedWriteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(region=region)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["get", "post"], url_path="neighborhoods")
     def neighborhoods(self, request, pk=None):
@@ -115,6 +167,17 @@ class DistrictViewSet(ModelViewSet):
             return DistrictNestedSerializer
         return DistrictSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        """District with its neighborhoods, from the cached tree."""
+
+        def build(tree):
+            district = find_district(tree, kwargs["pk"])
+            if district is None:
+                raise Http404("No District matches the given query.")
+            return Response(district)
+
+        return tree_response(request, build)
+
     @action(detail=True, methods=["get", "post"], url_path="neighborhoods")
     def neighborhoods(self, request, pk=None):
         """
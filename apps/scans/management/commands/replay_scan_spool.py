@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.scans.recorder import get_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Write scan batches that were spooled to disk because the database "
+        "was unavailable when they were flushed"
+    )
+
+    def handle(self, *args, **options):
+        buffer = get_buffer()
+        written = buffer.replay_spool()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {written} spooled scans written ({buffer.spool_dir})"
+            )
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 16:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scans", "0003_alter_scanlog_id"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="scanlog",
+            name="scanned_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="Scanned at",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scans", "0004_alter_scanlog_scanned_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="scanlog",
+            name="id",
+            field=models.BigIntegerField(
+                primary_key=True, serialize=False, verbose_name="ID"
+            ),
+        ),
+    ]
@@ -1,10 +1,17 @@
 from django.db import models
+from django.utils import timezone
 from apps.utils import GapFillingIDMixin
 from apps.qrcodes.models import QRCode
 from apps.users.models import User
 
 
 class ScanLog(GapFillingIDMixin, models.Model):
+    # Append-only log: IDs never need to be reused
+    id_strategy = "sequence"
+
+    # 64-bit, so the log can also use the time_ordered strategy
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID")
+
     qr = models.ForeignKey(QRCode, on_delete=models.CASCADE, verbose_name="QR Code")
     scanned_by = models.ForeignKey(
         User,
@@ -13,7 +20,10 @@ class ScanLog(GapFillingIDMixin, models.Model):
         blank=True,
         verbose_name="Scanned by",
     )
-    scanned_at = models.DateTimeField(auto_now_add=True, verbose_name="Scanned at")
+    # Set by the scan recorder, which writes scans after a short delay
+    scanned_at = models.DateTimeField(
+        default=timezone.now, editable=False, verbose_name="Scanned at"
+    )
     ip_address = models.GenericIPAddressField(
         null=True, blank=True, verbose_name="IP address"
     )
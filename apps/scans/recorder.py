@@ -0,0 +1,106 @@
+"""
+Buffered recording of QR code scans.
+
+A scan used to cost three writes inside the request (QR ``is_scanned``,
+a ScanLog row and the user's ``scanned_qr_code``). Scans are now queued per
+worker and written in batches: one ``bulk_create`` of ScanLog rows, one
+``UPDATE`` of the QR codes and one ``bulk_update`` of the users.
+
+Set ``SCAN_RECORDER_SYNC = True`` to write every scan immediately (tests,
+management commands).
+"""
+
+import os
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.buffer import WriteBehindBuffer
+
+_buffer: Optional[WriteBehindBuffer] = None
+
+
+def flush_scans(events: List[dict]) -> None:
+    """Write a batch of scan events in one transaction."""
+    from apps.qrcodes.models import QRCode
+    from apps.users.models import User
+    from .models import ScanLog
+
+    logged = [event for event in events if event["user_id"]]
+
+    # Last scanned code per user, in scan order
+    last_scanned = {}
+    for event in logged:
+        last_scanned[event["user_id"]] = event["qr_uuid"]
+
+    with transaction.atomic():
+        if logged:
+            ids = ScanLog.allocate_ids(len(logged))
+            ScanLog.objects.bulk_create(
+                [
+                    ScanLog(
+                        id=scan_id,
+                        qr_id=event["qr_id"],
+                        scanned_by_id=event["user_id"],
+                        ip_address=event["ip_address"],
+                        scanned_at=parse_datetime(event["scanned_at"]),
+                    )
+                    for scan_id, event in zip(ids, logged)
+                ]
+            )
+
+        QRCode.objects.filter(
+            id__in={event["qr_id"] for event in events}, is_scanned=False
+        ).update(is_scanned=True)
+
+        if last_scanned:
+            User.objects.bulk_update(
+                [
+                    User(id=user_id, scanned_qr_code=qr_uuid)
+                    for user_id, qr_uuid in last_scanned.items()
+                ],
+                ["scanned_qr_code"],
+            )
+
+
+def get_buffer() -> WriteBehindBuffer:
+    global _buffer
+    if _buffer is None:
+        _buffer = WriteBehindBuffer(
+            "scans",
+            flush_scans,
+            max_size=getattr(settings, "SCAN_BUFFER_SIZE", 200),
+            max_delay=getattr(settings, "SCAN_BUFFER_MAX_DELAY", 2.0),
+            spool_dir=os.path.join(
+                getattr(settings, "WRITE_BEHIND_SPOOL_DIR", "spool"), "scans"
+            ),
+        )
+    return _buffer
+
+
+def record_scan(qr, user=None, ip_address: Optional[str] = None) -> None:
+    """
+    Record a scan of ``qr`` by ``user`` (None for anonymous scans).
+
+    The in-memory objects are updated right away so the current request
+    sees the new state; the database writes follow with the next flush.
+    """
+    qr.is_scanned = True
+    if user is not None:
+        user.scanned_qr_code = qr.uuid
+
+    event = {
+        "qr_id": qr.id,
+        "qr_uuid": qr.uuid,
+        "user_id": user.id if user is not None else None,
+        "ip_address": ip_address,
+        "scanned_at": timezone.now().isoformat(),
+    }
+
+    if getattr(settings, "SCAN_RECORDER_SYNC", False):
+        flush_scans([event])
+    else:
+        get_buffer().add(event)
@@ -41,17 +41,27 @@ class SMSLogAdmin(admin.ModelAdmin):
         "sms_type",
         "status",
         "user",
+        "attempts",
         "created_at",
         "sent_at",
     ]
     list_filter = ["sms_type", "status", "created_at"]
     search_fields = ["phone", "user__phone", "message"]
-    readonly_fields = ["created_at", "sent_at", "eskiz_response"]
+    readonly_fields = [
+        "created_at",
+        "sent_at",
+        "eskiz_response",
+        "attempts",
+        "next_attempt_at",
+    ]
 
     fieldsets = (
         ("Asosiy ma'lumotlar", {"fields": ("phone", "user", "sms_type", "status")}),
         ("SMS matni", {"fields": ("message",)}),
-        ("Vaqt ma'lumotlari", {"fields": ("created_at", "sent_at")}),
+        (
+            "Vaqt ma'lumotlari",
+            {"fields": ("created_at", "sent_at", "attempts", "next_attempt_at")},
+        ),
         (
             "Qo'shimcha",
             {"fields": ("error_message", "eskiz_response"), "classes": ("collapse",)},
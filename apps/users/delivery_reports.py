@@ -0,0 +1,110 @@
+"""
+Eskiz delivery reports.
+
+Eskiz POSTs a report to the callback URL sent with every message
+(``ESKIZ_CALLBACK_URL``) whenever the message changes state. The callback
+view only queues the report; reports are applied per worker in batches with
+one UPDATE per final state (delivered / undelivered), matching messages by
+``provider_message_id`` (single sends) or by our own ID, which batch sends
+pass to Eskiz as ``user_sms_id``.
+"""
+
+import logging
+import os
+import uuid
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.buffer import WriteBehindBuffer
+from apps.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+reports_received = Counter("sms.reports.received", "Eskiz delivery reports received")
+reports_delivered = Counter("sms.reports.delivered", "SMS marked delivered")
+reports_undelivered = Counter("sms.reports.undelivered", "SMS marked undelivered")
+
+# Final report statuses; intermediate ones (ACCEPTD, TRANSMTD, waiting) are ignored
+DELIVERED_STATUSES = ("DELIVRD", "DELIVERED")
+UNDELIVERED_STATUSES = ("UNDELIV", "UNDELIVERABLE", "EXPIRED", "REJECTD", "REJECTED")
+
+# Fields kept from the callback body
+REPORT_FIELDS = ("message_id", "user_sms_id", "status", "status_date")
+
+_buffer: Optional[WriteBehindBuffer] = None
+
+
+def _matching(reports: List[dict]) -> Q:
+    provider_ids = {str(r["message_id"]) for r in reports if r.get("message_id")}
+    own_ids = set()
+    for report in reports:
+        try:
+            own_ids.add(uuid.UUID(str(report.get("user_sms_id"))))
+        except ValueError:
+            pass
+    return Q(provider_message_id__in=provider_ids) | Q(id__in=own_ids)
+
+
+def flush_reports(reports: List[dict]) -> None:
+    """Apply a batch of delivery reports with one UPDATE per final state."""
+    from .models_sms import SMSLog
+
+    delivered, undelivered = [], []
+    for report in reports:
+        state = str(report.get("status") or "").upper()
+        if state in DELIVERED_STATUSES:
+            delivered.append(report)
+        elif state in UNDELIVERED_STATUSES:
+            undelivered.append(report)
+
+    with transaction.atomic():
+        if delivered:
+            count = (
+                SMSLog.objects.filter(_matching(delivered))
+                .exclude(status="delivered")
+                .update(status="delivered", delivered_at=timezone.now())
+            )
+            reports_delivered.increment(count)
+        if undelivered:
+            # Never downgrade a message already reported delivered; pending
+            # rows are messages whose send outcome is not written yet
+            count = (
+                SMSLog.objects.filter(_matching(undelivered))
+                .filter(status__in=("pending", "sent"))
+                .update(status="failed", error_message="Eskiz: SMS yetkazilmadi")
+            )
+            reports_undelivered.increment(count)
+
+    logger.info(
+        f"Eskiz reports: {len(delivered)} delivered, {len(undelivered)} undelivered "
+        f"of {len(reports)}"
+    )
+
+
+def get_buffer() -> WriteBehindBuffer:
+    global _buffer
+    if _buffer is None:
+        _buffer = WriteBehindBuffer(
+            "sms_reports",
+            flush_reports,
+            max_size=getattr(settings, "SMS_REPORT_BUFFER_SIZE", 200),
+            max_delay=getattr(settings, "SMS_REPORT_BUFFER_MAX_DELAY", 2.0),
+            spool_dir=os.path.join(
+                getattr(settings, "WRITE_BEHIND_SPOOL_DIR", "spool"), "sms_reports"
+            ),
+        )
+    return _buffer
+
+
+def record_report(data) -> None:
+    """Queue one delivery report (the callback body)."""
+    reports_received.increment()
+    report = {field: data.get(field) for field in REPORT_FIELDS}
+    if getattr(settings, "SMS_REPORT_SYNC", False):
+        flush_reports([report])
+    else:
+        get_buffer().add(report)
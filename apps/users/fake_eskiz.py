@@ -0,0 +1,237 @@
+"""
+Local stand-in for the Eskiz SMS API.
+
+Implements the endpoints the app uses (``/auth/login``,
+``/message/sms/send``, ``/message/sms/send-batch``) with configurable
+latency and failures, and records every message it accepts. Accepted
+messages are reported DELIVRD to their ``callback_url``, if any. Point
+``ESKIZ_API_URL`` at it to exercise the outbox offline::
+
+    python manage.py run_fake_eskiz --port 8025 --latency 0.05 --failure-rate 0.1
+    ESKIZ_API_URL=http://127.0.0.1:8025/api python manage.py dispatch_sms_outbox
+
+Nothing here is used in production.
+"""
+
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+API_PREFIX = "/api"
+
+
+def make_token(lifetime: float) -> str:
+    """Unsigned JWT-shaped token with an ``exp`` claim, like Eskiz issues."""
+
+    def encode(data: dict) -> str:
+        raw = json.dumps(data).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    header = encode({"alg": "none", "typ": "JWT"})
+    payload = encode({"exp": int(time.time() + lifetime), "jti": uuid.uuid4().hex})
+    return f"{header}.{payload}.fake"
+
+
+class FakeEskizServer:
+    """
+    Threaded fake Eskiz server.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        latency: Seconds added to every response
+        failure_rate: Share of send requests answered with HTTP 500
+        fail_phones: Numbers (digits only) whose messages are rejected
+        token_lifetime: Lifetime of issued tokens in seconds
+        report_delay: Seconds before a delivery report is posted
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        fail_phones: Optional[List[str]] = None,
+        token_lifetime: float = 30 * 24 * 3600,
+        report_delay: float = 0.1,
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_phones = set(fail_phones or [])
+        self.token_lifetime = token_lifetime
+        self.report_delay = report_delay
+
+        self.tokens = set()
+        self.messages: List[dict] = []
+        self.requests = {"login": 0, "send": 0, "send-batch": 0}
+        self.reports_sent = 0
+        self._lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "FakeEskizServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="fake-eskiz", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def expire_tokens(self) -> None:
+        """Reject all issued tokens, as after an expiry."""
+        with self._lock:
+            self.tokens.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Request handling
+
+    def _report(self, callback_url: Optional[str], reports: List[dict]) -> None:
+        """Post DELIVRD reports to ``callback_url`` after ``report_delay``."""
+        if not callback_url or not reports:
+            return
+
+        def post():
+            for report in reports:
+                request = urllib.request.Request(
+                    callback_url,
+                    data=json.dumps({**report, "status": "DELIVRD"}).encode(),
+                    headers={"Content-Type": "application/json"},
+                )
+                try:
+                    urllib.request.urlopen(request, timeout=5).close()
+                    with self._lock:
+                        self.reports_sent += 1
+                except OSError:
+                    pass
+
+        timer = threading.Timer(self.report_delay, post)
+        timer.daemon = True
+        timer.start()
+
+    def _login(self, body: dict):
+        token = make_token(self.token_lifetime)
+        with self._lock:
+            self.requests["login"] += 1
+            self.tokens.add(token)
+        return 200, {"message": "token_generated", "data": {"token": token}}
+
+    def _accept(self, phone: str, text: str, user_sms_id=None) -> str:
+        phone = "".join(filter(str.isdigit, str(phone)))
+        if phone in self.fail_phones:
+            return "rejected"
+        with self._lock:
+            self.messages.append(
+                {"phone": phone, "text": text, "user_sms_id": user_sms_id}
+            )
+        return "waiting"
+
+    def _send(self, body: dict):
+        with self._lock:
+            self.requests["send"] += 1
+        if random.random() < self.failure_rate:
+            return 500, {"message": "Internal error (fake)"}
+        status = self._accept(body.get("mobile_phone", ""), body.get("message", ""))
+        if status == "rejected":
+            return 400, {"message": "Invalid phone number (fake)"}
+        message_id = uuid.uuid4().hex
+        self._report(body.get("callback_url"), [{"message_id": message_id}])
+        return 200, {"id": message_id, "message": "Waiting for SMS provider"}
+
+    def _send_batch(self, body: dict):
+        with self._lock:
+            self.requests["send-batch"] += 1
+        if random.random() < self.failure_rate:
+            return 500, {"message": "Internal error (fake)"}
+        messages = body.get("messages", [])
+        statuses = [
+            self._accept(m.get("to", ""), m.get("text", ""), m.get("user_sms_id"))
+            for m in messages
+        ]
+        self._report(
+            body.get("callback_url"),
+            [
+                {"message_id": uuid.uuid4().hex, "user_sms_id": m.get("user_sms_id")}
+                for m, status in zip(messages, statuses)
+                if status == "waiting"
+            ],
+        )
+        return 200, {
+            "id": uuid.uuid4().hex,
+            "message": "Waiting for SMS provider",
+            "status": [
+                {"user_sms_id": m.get("user_sms_id"), "status": status}
+                for m, status in zip(messages, statuses)
+            ],
+        }
+
+    def _make_handler(self):
+        server = self
+        routes = {
+            f"{API_PREFIX}/auth/login": (server._login, False),
+            f"{API_PREFIX}/message/sms/send": (server._send, True),
+            f"{API_PREFIX}/message/sms/send-batch": (server._send_batch, True),
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length).decode()
+                if server.latency:
+                    time.sleep(server.latency)
+
+                route = routes.get(self.path)
+                if route is None:
+                    return self._reply(404, {"message": "Not found"})
+                handler, needs_auth = route
+
+                if needs_auth:
+                    token = self.headers.get("Authorization", "")[len("Bearer ") :]
+                    if token not in server.tokens:
+                        return self._reply(401, {"message": "Expired token"})
+
+                if "json" in self.headers.get("Content-Type", ""):
+                    body = json.loads(raw or "{}")
+                else:
+                    body = {k: v[0] for k, v in parse_qs(raw).items()}
+                self._reply(*handler(body))
+
+            def _reply(self, code: int, data: dict):
+                payload = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,116 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.users.fake_eskiz import FakeEskizServer
+from apps.users.models_sms import SMSLog
+from apps.users.outbox import dispatch_pending, enqueue_bulk_sms
+from apps.users.services import eskiz_breaker
+
+PHONE_PREFIX = "+99800"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure SMS outbox throughput against an in-process fake Eskiz "
+        "server. Only the benchmark's own messages are dispatched and they "
+        "are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Simulated Eskiz latency per request in seconds",
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.0,
+            help="Share of requests the fake answers with HTTP 500",
+        )
+        parser.add_argument(
+            "--no-batch",
+            action="store_true",
+            help="Send one request per message instead of batch requests",
+        )
+        parser.add_argument("--chunk-size", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["messages"] < 1:
+            raise CommandError("--messages must be positive")
+
+        server = FakeEskizServer(
+            latency=options["latency"], failure_rate=options["failure_rate"]
+        ).start()
+        overrides = {
+            "ESKIZ_API_URL": server.url,
+            "ESKIZ_EMAIL": "benchmark",
+            "ESKIZ_PASSWORD": "benchmark",
+            "ESKIZ_FROM": "4546",
+            "SMS_OUTBOX_ENABLED": True,
+            "SMS_BATCH_ENABLED": not options["no_batch"],
+            # Retry failed messages right away so the run drains
+            "SMS_OUTBOX_RETRY_DELAY": 0,
+        }
+        if options["chunk_size"]:
+            overrides["SMS_BATCH_CHUNK_SIZE"] = options["chunk_size"]
+
+        ids = []
+        try:
+            with override_settings(**overrides):
+                eskiz_breaker.reset()
+                logs = enqueue_bulk_sms(
+                    (
+                        (f"{PHONE_PREFIX}{i:07d}", None)
+                        for i in range(options["messages"])
+                    ),
+                    "QR MAHALLA benchmark",
+                    "notification",
+                )
+                ids = [sms_log.id for sms_log in logs]
+                queryset = SMSLog.objects.filter(id__in=ids)
+
+                totals = {"sent": 0, "retried": 0, "failed": 0}
+                passes = 0
+                started = time.perf_counter()
+                while True:
+                    result = dispatch_pending(
+                        workers=options["workers"], queryset=queryset
+                    )
+                    if not result.total:
+                        break
+                    passes += 1
+                    for outcome in totals:
+                        totals[outcome] += getattr(result, outcome)
+                elapsed = time.perf_counter() - started
+        finally:
+            server.stop()
+            SMSLog.objects.filter(id__in=ids).delete()
+
+        mode = "one request per message" if options["no_batch"] else "batch API"
+        self.stdout.write(
+            f"{options['messages']} messages ({mode}) in {elapsed:.2f}s: "
+            f"{options['messages'] / elapsed:.0f} msg/s over {passes} passes"
+        )
+        self.stdout.write(
+            f"  sent {totals['sent']}, retried {totals['retried']}, "
+            f"failed {totals['failed']}"
+        )
+        self.stdout.write(f"  fake Eskiz requests: {server.requests}")
+        breaker = eskiz_breaker.status()
+        if breaker["state"] != "closed":
+            self.stdout.write(
+                f"  Eskiz circuit {breaker['state']} "
+                f"(failure rate {breaker['failure_rate']:.0%}), "
+                f"remaining messages were deferred"
+            )
+        if len(server.messages) < totals["sent"]:
+            raise CommandError(
+                f"Fake server accepted {len(server.messages)} messages, "
+                f"{totals['sent']} were marked sent"
+            )
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.outbox import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Send pending SMS from the outbox (SMSLog rows with status pending)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the due messages and exit instead of polling",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls when nothing is due",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Messages leased per pass (default: SMS_OUTBOX_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Concurrent sends (default: SMS_OUTBOX_WORKERS)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Dispatching SMS outbox")
+
+        try:
+            while True:
+                result = dispatch_pending(options["batch_size"], options["workers"])
+                if result.total:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"✓ {result.sent} sent, {result.retried} retried, "
+                            f"{result.failed} failed"
+                        )
+                    )
+                if options["once"] and not result.total:
+                    break
+                if not result.total:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
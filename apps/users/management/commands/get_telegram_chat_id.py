@@ -1,19 +1,16 @@
-import requests
 from django.core.management.base import BaseCommand
-from django.conf import settings
+
+from apps.core import telegram
 
 
 class Command(BaseCommand):
     help = "Get Telegram chat ID for SMS notifications"
 
     def handle(self, *args, **options):
-        bot_token = settings.TELEGRAM_BOT_TOKEN
-
         self.stdout.write(self.style.WARNING("\n📱 Getting Telegram Chat ID...\n"))
 
         try:
-            bot_info_url = f"https://api.telegram.org/bot{bot_token}/getMe"
-            bot_response = requests.get(bot_info_url, timeout=5)
+            bot_response = telegram.api_request("getMe")
 
             if bot_response.status_code == 200:
                 bot_data = bot_response.json()
@@ -27,8 +24,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"❌ Error getting bot info: {e}"))
 
         try:
-            url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
-            response = requests.get(url, timeout=5)
+            response = telegram.api_request("getUpdates")
 
             if response.status_code == 200:
                 data = response.json()
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.fake_eskiz import FakeEskizServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Eskiz SMS API. Set ESKIZ_API_URL to the "
+        "printed URL to send SMS to it instead of Eskiz."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8025)
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="Seconds added per response"
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.0,
+            help="Share of send requests answered with HTTP 500 (0-1)",
+        )
+        parser.add_argument(
+            "--fail-phone",
+            action="append",
+            default=[],
+            help="Reject messages to this number (digits only, repeatable)",
+        )
+        parser.add_argument(
+            "--token-lifetime",
+            type=float,
+            default=30 * 24 * 3600,
+            help="Lifetime of issued tokens in seconds",
+        )
+
+    def handle(self, *args, **options):
+        server = FakeEskizServer(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            failure_rate=options["failure_rate"],
+            fail_phones=options["fail_phone"],
+            token_lifetime=options["token_lifetime"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Fake Eskiz API at {server.url}"))
+        self.stdout.write(f"  ESKIZ_API_URL={server.url}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.stdout.write(
+                f"\n{len(server.messages)} messages accepted, requests: "
+                f"{server.requests}"
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_smslog"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smslog",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Urinishlar soni"
+            ),
+        ),
+        migrations.AddField(
+            model_name="smslog",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Keyingi urinish vaqti"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smslog",
+            index=models.Index(
+                fields=["status", "next_attempt_at"],
+                name="users_smslo_status_de2c97_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_smslog_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smslog",
+            name="delivered_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Yetkazilgan vaqti"
+            ),
+        ),
+        migrations.AddField(
+            model_name="smslog",
+            name="provider_message_id",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=64,
+                null=True,
+                verbose_name="Eskiz xabar ID",
+            ),
+        ),
+    ]
@@ -75,6 +75,26 @@ class SMSLog(models.Model):
         null=True, blank=True, verbose_name="Eskiz API javobi"
     )
 
+    # Outbox: pending rows are sent by the dispatch_sms_outbox command
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Urinishlar soni"
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Keyingi urinish vaqti"
+    )
+
+    # Eskiz delivery reports (callback) are matched by this ID
+    provider_message_id = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name="Eskiz xabar ID",
+    )
+    delivered_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Yetkazilgan vaqti"
+    )
+
     class Meta:
         verbose_name = "SMS Log"
         verbose_name_plural = "SMS Logs"
@@ -83,6 +103,7 @@ class SMSLog(models.Model):
             models.Index(fields=["-created_at", "status"]),
             models.Index(fields=["phone", "-created_at"]),
             models.Index(fields=["sms_type", "-created_at"]),
+            models.Index(fields=["status", "next_attempt_at"]),
         ]
 
     def __str__(self):
@@ -0,0 +1,383 @@
+"""
+SMS outbox.
+
+Request handlers do not talk to Eskiz. ``enqueue_sms`` writes a pending
+``SMSLog`` row in the caller's transaction, so the message exists exactly
+when the change that caused it is committed. The ``dispatch_sms_outbox``
+command sends pending rows concurrently, retries transient failures with
+exponential backoff and records the outcome with a single UPDATE.
+
+With ``SMS_OUTBOX_ENABLED = False`` messages are sent inline (after the
+current transaction commits). Verification codes are always sent that way:
+they are only useful right away, so they never wait for a dispatcher or a
+retry. Inline rows are inserted as pending before Eskiz is called, without
+``next_attempt_at`` so no dispatcher picks them up.
+
+Outcomes are only written to rows that are still pending: a delivery report
+(``apps.users.delivery_reports``) can arrive before the outcome of the send
+is recorded, and a delivered message must not go back to "sent".
+"""
+
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.http import Deadline
+from apps.core.metrics import Counter
+from .models_sms import SMSLog
+from .services import EskizSMSService, batch_statuses, eskiz_breaker
+
+logger = logging.getLogger(__name__)
+
+sms_sent = Counter("sms.outbox.sent", "Outbox SMS accepted by Eskiz")
+sms_retried = Counter("sms.outbox.retried", "Outbox SMS rescheduled after a failure")
+sms_failed = Counter("sms.outbox.failed", "Outbox SMS given up on")
+OUTCOME_COUNTERS = {"sent": sms_sent, "retried": sms_retried, "failed": sms_failed}
+
+OUTCOME_FIELDS = [
+    "status",
+    "attempts",
+    "sent_at",
+    "error_message",
+    "next_attempt_at",
+    "eskiz_response",
+    "provider_message_id",
+]
+
+# Sent inline after commit with a single attempt, even with the outbox enabled
+INLINE_SMS_TYPES = ("verification",)
+
+# 4xx responses worth retrying; other client errors fail the message at once
+RETRYABLE_CLIENT_ERRORS = (401, 408, 429)
+
+
+@dataclass
+class DispatchResult:
+    """Outcome counts of one dispatcher pass."""
+
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.retried + self.failed
+
+
+def outbox_enabled() -> bool:
+    return getattr(settings, "SMS_OUTBOX_ENABLED", True)
+
+
+def enqueue_sms(phone: str, message: str, sms_type: str, user=None) -> SMSLog:
+    """
+    Queue an SMS for the dispatcher.
+
+    Call inside the transaction that makes the message true; nothing is
+    sent if it rolls back. INLINE_SMS_TYPES are sent once the transaction
+    commits instead of being queued.
+
+    Returns:
+        The SMSLog row (pending, or already sent when sent inline outside a
+        transaction)
+    """
+    sms_log = SMSLog(
+        phone=phone,
+        message=message,
+        sms_type=sms_type,
+        user=user,
+        status="pending",
+        next_attempt_at=timezone.now(),
+    )
+    if outbox_enabled() and sms_type not in INLINE_SMS_TYPES:
+        sms_log.save(force_insert=True)
+    else:
+        transaction.on_commit(lambda: _send_inline(sms_log))
+    return sms_log
+
+
+def enqueue_bulk_sms(
+    recipients: Iterable[Tuple[str, Optional[object]]], message: str, sms_type: str
+) -> List[SMSLog]:
+    """
+    Queue the same SMS for many recipients with one INSERT.
+
+    The dispatcher sends such messages through the Eskiz batch API.
+
+    Args:
+        recipients: (phone, user or None) pairs
+        message: SMS text
+        sms_type: SMSLog.sms_type
+
+    Returns:
+        The created SMSLog rows
+    """
+    now = timezone.now()
+    logs = [
+        SMSLog(
+            phone=phone,
+            message=message,
+            sms_type=sms_type,
+            user=user,
+            status="pending",
+            next_attempt_at=now,
+        )
+        for phone, user in recipients
+    ]
+    if not logs:
+        return logs
+    if outbox_enabled():
+        SMSLog.objects.bulk_create(logs, batch_size=1000)
+    else:
+        transaction.on_commit(lambda: _send_inline_batch(logs))
+    return logs
+
+
+def _save_outcomes(logs: List[SMSLog]) -> None:
+    """
+    Write the outcome fields of ``logs`` with one UPDATE.
+
+    Rows that are no longer pending keep their state: a delivery report
+    that arrived during the send has already moved them on.
+    """
+    SMSLog.objects.filter(status="pending").bulk_update(logs, OUTCOME_FIELDS)
+
+
+def _send_inline_batch(logs: List[SMSLog]) -> None:
+    chunk_size = getattr(settings, "SMS_BATCH_CHUNK_SIZE", 100)
+    for start in range(0, len(logs), chunk_size):
+        chunk = logs[start : start + chunk_size]
+        for sms_log in chunk:
+            sms_log.next_attempt_at = None
+        # Rows exist before Eskiz can report on them
+        SMSLog.objects.bulk_create(chunk)
+
+        service = EskizSMSService()
+        results = service.send_batch(
+            [(sms_log.id, sms_log.phone, sms_log.message) for sms_log in chunk]
+        )
+        for sms_log in chunk:
+            ok = results[str(sms_log.id)]
+            _apply_outcome(sms_log, ok, service)
+            sms_log.attempts = 1
+            if not ok:
+                sms_log.status = "failed"
+                sms_log.next_attempt_at = None
+        _save_outcomes(chunk)
+
+
+def _send_inline(sms_log: SMSLog) -> None:
+    sms_log.next_attempt_at = None
+    # Rows exist before Eskiz can report on them
+    sms_log.save(force_insert=True)
+
+    service = EskizSMSService()
+    ok = service.send_sms(sms_log.phone, sms_log.message)
+    _apply_outcome(sms_log, ok, service, service.last_response)
+    sms_log.attempts = 1
+    if not ok:
+        # A single attempt: inline messages are never retried
+        sms_log.status = "failed"
+        sms_log.next_attempt_at = None
+    _save_outcomes([sms_log])
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = getattr(settings, "SMS_OUTBOX_RETRY_DELAY", 30)
+    delay = min(
+        base * 2 ** (attempts - 1), getattr(settings, "SMS_OUTBOX_MAX_DELAY", 3600)
+    )
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _is_permanent(status_code: Optional[int]) -> bool:
+    """Client errors won't succeed on retry (except auth and rate limits)."""
+    if status_code is None:
+        return False
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+
+
+def claim_batch(batch_size: int, queryset=None) -> List[SMSLog]:
+    """
+    Lease up to ``batch_size`` due messages to this dispatcher.
+
+    The lease pushes ``next_attempt_at`` forward, so a dispatcher that dies
+    mid-send hands its messages to the next one after SMS_OUTBOX_LEASE
+    seconds. Rows locked by other dispatchers are skipped.
+
+    Args:
+        batch_size: Maximum number of messages to lease
+        queryset: Restrict the lease to these SMSLog rows (default: all)
+    """
+    if queryset is None:
+        queryset = SMSLog.objects.all()
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, "SMS_OUTBOX_LEASE", 300))
+
+    with transaction.atomic():
+        ids = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        SMSLog.objects.filter(id__in=ids).update(
+            attempts=F("attempts") + 1, next_attempt_at=now + lease
+        )
+    return list(SMSLog.objects.filter(id__in=ids))
+
+
+def _apply_outcome(sms_log: SMSLog, ok: bool, service, response=None) -> str:
+    """
+    Set the outcome of a send attempt on ``sms_log`` (not saved).
+
+    Returns:
+        "sent", "retried" or "failed"
+    """
+    sms_log.eskiz_response = response
+    if ok:
+        if isinstance(response, dict) and response.get("id"):
+            # Single sends only; batch reports are matched by user_sms_id
+            sms_log.provider_message_id = str(response["id"])
+        sms_log.status = "sent"
+        sms_log.sent_at = timezone.now()
+        sms_log.error_message = None
+        return "sent"
+
+    sms_log.error_message = service.last_error or "SMS yuborishda xatolik"
+    if service.circuit_open:
+        # Eskiz was not called, so this does not use up an attempt
+        sms_log.attempts -= 1
+        sms_log.next_attempt_at = timezone.now() + timedelta(
+            seconds=max(eskiz_breaker.retry_after(), 1)
+        )
+        return "retried"
+
+    max_attempts = getattr(settings, "SMS_OUTBOX_MAX_ATTEMPTS", 5)
+    if sms_log.attempts >= max_attempts or _is_permanent(service.last_status_code):
+        sms_log.status = "failed"
+        sms_log.next_attempt_at = None
+        return "failed"
+
+    sms_log.next_attempt_at = timezone.now() + _retry_delay(sms_log.attempts)
+    return "retried"
+
+
+def _send_budget() -> Deadline:
+    return Deadline(getattr(settings, "SMS_OUTBOX_SEND_BUDGET", 15))
+
+
+def deliver(sms_log: SMSLog) -> List[str]:
+    """
+    Send one leased message and record the outcome with one conditional
+    UPDATE.
+
+    Returns:
+        The outcome ("sent", "retried" or "failed") in a list, like
+        ``deliver_batch``
+    """
+    service = EskizSMSService()
+    try:
+        ok = service.send_sms(sms_log.phone, sms_log.message, deadline=_send_budget())
+        outcome = _apply_outcome(sms_log, ok, service, service.last_response)
+        _save_outcomes([sms_log])
+    finally:
+        # Runs in a pool thread with its own connection
+        connections.close_all()
+
+    OUTCOME_COUNTERS[outcome].increment()
+    return [outcome]
+
+
+def deliver_batch(chunk: List[SMSLog]) -> List[str]:
+    """
+    Send leased messages with one Eskiz batch request and record each
+    message's outcome with one conditional ``bulk_update``.
+
+    Returns:
+        The outcome of every message in ``chunk``
+    """
+    service = EskizSMSService()
+    try:
+        results = service.send_batch(
+            [(sms_log.id, sms_log.phone, sms_log.message) for sms_log in chunk],
+            deadline=_send_budget(),
+        )
+        body = service.last_response or {}
+        statuses = batch_statuses(body) or {}
+
+        outcomes = []
+        for sms_log in chunk:
+            response = None
+            if service.last_status_code == 200:
+                response = {"batch_id": body.get("id")}
+                if str(sms_log.id) in statuses:
+                    response["status"] = statuses[str(sms_log.id)]
+            elif body:
+                response = body
+            outcomes.append(
+                _apply_outcome(sms_log, results[str(sms_log.id)], service, response)
+            )
+        _save_outcomes(chunk)
+    finally:
+        connections.close_all()
+
+    for outcome in outcomes:
+        OUTCOME_COUNTERS[outcome].increment()
+    return outcomes
+
+
+def dispatch_pending(
+    batch_size: Optional[int] = None, workers: Optional[int] = None, queryset=None
+) -> DispatchResult:
+    """
+    Send one lease of due messages concurrently.
+
+    With ``SMS_BATCH_ENABLED`` the lease is split into Eskiz batch requests
+    of ``SMS_BATCH_CHUNK_SIZE`` messages; otherwise every message is its own
+    request.
+    """
+    batch_size = batch_size or getattr(settings, "SMS_OUTBOX_BATCH_SIZE", 500)
+    workers = workers or getattr(settings, "SMS_OUTBOX_WORKERS", 8)
+
+    result = DispatchResult()
+    if eskiz_breaker.is_open():
+        logger.info(
+            f"SMS outbox: Eskiz circuit open, next try in "
+            f"{eskiz_breaker.retry_after():.0f}s"
+        )
+        return result
+
+    batch = claim_batch(batch_size, queryset)
+    if not batch:
+        return result
+
+    if getattr(settings, "SMS_BATCH_ENABLED", True) and len(batch) > 1:
+        chunk_size = getattr(settings, "SMS_BATCH_CHUNK_SIZE", 100)
+        tasks = [
+            batch[start : start + chunk_size]
+            for start in range(0, len(batch), chunk_size)
+        ]
+        send = deliver_batch
+    else:
+        tasks, send = batch, deliver
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        for outcomes in pool.map(send, tasks):
+            for outcome in outcomes:
+                setattr(result, outcome, getattr(result, outcome) + 1)
+
+    logger.info(
+        f"SMS outbox: {result.sent} sent, {result.retried} retried, "
+        f"{result.failed} failed"
+    )
+    return result
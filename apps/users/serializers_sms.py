@@ -35,6 +35,7 @@ class SMSStatisticsSerializer(serializers.Serializer):
 
     total_sms = serializers.IntegerField(read_only=True)
     sent_sms = serializers.IntegerField(read_only=True)
+    delivered_sms = serializers.IntegerField(read_only=True)
     failed_sms = serializers.IntegerField(read_only=True)
     pending_sms = serializers.IntegerField(read_only=True)
 
@@ -44,3 +45,4 @@ class SMSStatisticsSerializer(serializers.Serializer):
     notification_sms = serializers.IntegerField(read_only=True)
 
     success_rate = serializers.FloatField(read_only=True)
+    delivery_rate = serializers.FloatField(read_only=True)
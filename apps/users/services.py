@@ -1,28 +1,195 @@
+import base64
+import hashlib
+import json
 import logging
-import requests
+import time
+import uuid
+from typing import Callable, Dict, Optional
+from urllib.parse import urlencode
+
 from django.conf import settings
+from django.core.cache import cache
+
+import requests
+
+from apps.core import http
+from apps.core.circuit_breaker import CircuitBreaker, CircuitOpen
+from apps.core.metrics import Counter
 
 logger = logging.getLogger(__name__)
 
+ESKIZ_TOKEN_CACHE_PREFIX = "eskiz:token:"
 
-def _log_sms(phone, message, sms_type, user=None):
-    """
-    SMS yuborilishini log qilish.
+# Per-message statuses of a batch response that mean the message was not taken
+BATCH_REJECTED_STATUSES = ("rejected", "failed", "error")
 
-    Args:
-        phone: Telefon raqami
-        message: SMS matni
-        sms_type: SMS turi ('verification', 'registration', 'qr_scan', 'notification')
-        user: Foydalanuvchi obyekti (optional)
+
+def batch_statuses(body):
+    """
+    Per-message statuses of an Eskiz batch response, keyed by user_sms_id.
 
     Returns:
-        SMSLog obyekti
+        dict: user_sms_id -> status, or None if the response carries no
+        per-message statuses (the whole batch was accepted). Entries without
+        a user_sms_id cannot be matched to a message and are skipped.
+    """
+    statuses = body.get("status") if isinstance(body, dict) else None
+    if not isinstance(statuses, list):
+        return None
+    return {
+        str(entry["user_sms_id"]): entry.get("status")
+        for entry in statuses
+        if isinstance(entry, dict) and entry.get("user_sms_id") is not None
+    }
+
+
+token_cache_hits = Counter(
+    "eskiz.token.cache_hits", "Eskiz requests that reused a shared token"
+)
+token_refreshes = Counter("eskiz.token.refreshes", "Eskiz logins that issued a token")
+token_refresh_failures = Counter(
+    "eskiz.token.refresh_failures", "Eskiz logins that failed"
+)
+token_invalidations = Counter(
+    "eskiz.token.invalidations", "Shared tokens rejected by Eskiz (401)"
+)
+
+# Shared by all workers; tuned with the ESKIZ_BREAKER_* settings
+eskiz_breaker = CircuitBreaker("eskiz", settings_prefix="ESKIZ_BREAKER")
+
+
+def _token_expiry(token: str) -> float:
+    """Expiry (unix time) from the token's JWT ``exp`` claim, or now + TTL."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + getattr(settings, "ESKIZ_TOKEN_TTL", 86400)
+
+
+class EskizTokenStore:
     """
-    from .models_sms import SMSLog
+    Eskiz auth token shared by all workers through the cache.
 
-    return SMSLog.objects.create(
-        phone=phone, message=message, sms_type=sms_type, user=user, status="pending"
-    )
+    A token is reused until ``ESKIZ_TOKEN_REFRESH_MARGIN`` seconds before it
+    expires. Then one worker (the one holding the refresh lock) logs in again
+    while the others keep using the old token. Without any usable token, the
+    workers that miss the lock wait for the new token instead of all logging
+    in at once.
+    """
+
+    def __init__(self, api_url: str):
+        # Tokens of different Eskiz endpoints (e.g. a local fake) never mix
+        url_hash = hashlib.sha256(api_url.encode()).hexdigest()[:12]
+        self.cache_key = f"{ESKIZ_TOKEN_CACHE_PREFIX}{url_hash}"
+        self.lock_key = f"{self.cache_key}:lock"
+        self._local: Optional[dict] = None  # Saves a cache round trip per SMS
+
+    def get(self, login: Callable[[], Optional[str]]) -> Optional[str]:
+        """Return a valid token, calling ``login`` only when it must be renewed."""
+        margin = getattr(settings, "ESKIZ_TOKEN_REFRESH_MARGIN", 3600)
+        now = time.time()
+
+        entry = self._local
+        if entry is None or entry["expires_at"] - margin <= now:
+            entry = cache.get(self.cache_key)
+            self._local = entry
+
+        if entry and entry["expires_at"] - margin > now:
+            token_cache_hits.increment()
+            return entry["token"]
+
+        if entry and entry["expires_at"] > now:
+            # Due for renewal but still valid: only the lock holder renews
+            lock_id = self._acquire_lock()
+            if lock_id:
+                return self._refresh(login, lock_id) or entry["token"]
+            token_cache_hits.increment()
+            return entry["token"]
+
+        return self._refresh_or_wait(login)
+
+    def invalidate(self, token: str) -> None:
+        """Forget ``token`` after Eskiz rejected it."""
+        token_invalidations.increment()
+        if self._local and self._local["token"] == token:
+            self._local = None
+        entry = cache.get(self.cache_key)
+        # Another worker may already have stored a newer token
+        if entry and entry["token"] == token:
+            cache.delete(self.cache_key)
+
+    def _refresh_or_wait(self, login) -> Optional[str]:
+        timeout = getattr(settings, "ESKIZ_TOKEN_LOCK_TIMEOUT", 15)
+        deadline = time.monotonic() + timeout
+        while True:
+            lock_id = self._acquire_lock()
+            if lock_id:
+                return self._refresh(login, lock_id)
+
+            time.sleep(0.1)
+            entry = cache.get(self.cache_key)
+            if entry and entry["expires_at"] > time.time():
+                self._local = entry
+                token_cache_hits.increment()
+                return entry["token"]
+
+            if time.monotonic() >= deadline:
+                logger.warning("Eskiz token lock not released, logging in anyway")
+                return self._refresh(login, None)
+
+    def _refresh(self, login, lock_id: Optional[str]) -> Optional[str]:
+        try:
+            token = login()
+            if not token:
+                token_refresh_failures.increment()
+                return None
+
+            expires_at = _token_expiry(token)
+            entry = {"token": token, "expires_at": expires_at}
+            cache.set(
+                self.cache_key,
+                entry,
+                timeout=max(1, int(expires_at - time.time())),
+            )
+            self._local = entry
+            token_refreshes.increment()
+            return token
+        finally:
+            if lock_id and cache.get(self.lock_key) == lock_id:
+                cache.delete(self.lock_key)
+
+    def _acquire_lock(self) -> Optional[str]:
+        lock_id = uuid.uuid4().hex
+        timeout = getattr(settings, "ESKIZ_TOKEN_LOCK_TIMEOUT", 15)
+        if cache.add(self.lock_key, lock_id, timeout=timeout):
+            return lock_id
+        return None
+
+
+_token_stores: Dict[str, EskizTokenStore] = {}
+
+
+def get_token_store(api_url: str) -> EskizTokenStore:
+    store = _token_stores.get(api_url)
+    if store is None:
+        store = _token_stores[api_url] = EskizTokenStore(api_url)
+    return store
+
+
+def delivery_callback_url() -> Optional[str]:
+    """
+    URL Eskiz posts delivery reports to, or None when reports are off.
+
+    Needs both ESKIZ_CALLBACK_URL and ESKIZ_CALLBACK_TOKEN; the token is
+    passed as a query parameter and checked by the callback view.
+    """
+    url = getattr(settings, "ESKIZ_CALLBACK_URL", "")
+    token = getattr(settings, "ESKIZ_CALLBACK_TOKEN", "")
+    if not (url and token):
+        return None
+    return f"{url}?{urlencode({'token': token})}"
 
 
 class EskizSMSService:
@@ -33,68 +200,141 @@ class EskizSMSService:
         self.email = settings.ESKIZ_EMAIL
         self.password = settings.ESKIZ_PASSWORD
         self.from_number = settings.ESKIZ_FROM
+        self.token_store = get_token_store(self.api_url)
         self.token = None
-
-    def get_token(self):
-        """Eskiz API dan token olish"""
+        # Oxirgi send_sms natijasi (outbox dispatcher uchun)
+        self.last_status_code = None
+        self.last_response = None
+        self.last_error = None
+        # So'rov circuit breaker tomonidan to'xtatilgan (Eskiz chaqirilmagan)
+        self.circuit_open = False
+
+    def _remember(self, response):
+        self.last_status_code = response.status_code
+        try:
+            self.last_response = response.json()
+        except ValueError:
+            self.last_response = None
+        self.last_error = None if response.status_code == 200 else response.text
+
+    def get_token(self, deadline=None):
+        """Umumiy (shared) tokenni olish, kerak bo'lsa yangilash"""
+        self.token = self.token_store.get(lambda: self.login(deadline))
+        return self.token
+
+    def _call(self, url, deadline, **kwargs):
+        """
+        Circuit breaker orqali Eskiz ga POST so'rov.
+
+        5xx javoblar, tarmoq xatolari va ESKIZ_BREAKER_SLOW_CALL dan sekin
+        javoblar breaker uchun xato hisoblanadi.
+
+        Raises:
+            CircuitOpen: Eskiz ishlamayapti, so'rov yuborilmadi
+        """
+        if not eskiz_breaker.allow():
+            self.circuit_open = True
+            raise CircuitOpen("Eskiz vaqtincha ishlamayapti (circuit open)")
+
+        started = time.monotonic()
+        try:
+            response = http.post(url, deadline=deadline, **kwargs)
+        except http.DeadlineExceeded:
+            # Vaqt chegarasi so'rovdan oldin tugagan, Eskiz aybdor emas
+            raise
+        except requests.RequestException:
+            eskiz_breaker.record(False)
+            raise
+        eskiz_breaker.record(response.status_code < 500, time.monotonic() - started)
+        return response
+
+    def login(self, deadline=None):
+        """Eskiz API dan yangi token olish"""
         try:
             url = f"{self.api_url}/auth/login"
             payload = {"email": self.email, "password": self.password}
-            response = requests.post(url, data=payload, timeout=10)
+            response = self._call(url, deadline, data=payload)
 
             if response.status_code == 200:
                 data = response.json()
-                self.token = data.get("data", {}).get("token")
                 logger.info("Eskiz token muvaffaqiyatli olindi")
-                return self.token
+                return data.get("data", {}).get("token")
             else:
                 logger.error(f"Eskiz token olishda xato: {response.text}")
                 return None
+        except CircuitOpen:
+            raise
         except Exception as e:
             logger.error(f"Eskiz token olishda xato: {e}")
             return None
 
-    def send_sms(self, phone, message):
-        """Eskiz orqali SMS yuborish"""
-        try:
-            # Agar token bo'lmasa, yangi token olamiz
-            if not self.token:
-                self.get_token()
+    def _post(self, path, deadline, **kwargs):
+        """
+        Token bilan POST so'rov; token eskirgan bo'lsa (401) bir marta yangilab
+        qayta yuboradi.
+
+        Returns:
+            Response yoki None (token olinmasa)
+        """
+        # Agar token bo'lmasa, yangi token olamiz
+        if not self.token:
+            self.get_token(deadline)
+
+        if not self.token:
+            logger.error("Eskiz token yo'q, SMS yuborib bo'lmaydi")
+            self.last_error = "Eskiz token olinmadi"
+            return None
 
-            if not self.token:
-                logger.error("Eskiz token yo'q, SMS yuborib bo'lmaydi")
-                return False
+        url = f"{self.api_url}{path}"
+        headers = {"Authorization": f"Bearer {self.token}"}
+        response = self._call(url, deadline, headers=headers, **kwargs)
+        self._remember(response)
+
+        if response.status_code == 401:
+            # Token muddati tugagan, yangi token olamiz va qayta urinib ko'ramiz
+            logger.warning("Eskiz token muddati tugagan, yangilanmoqda...")
+            self.token_store.invalidate(self.token)
+            self.get_token(deadline)
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+                response = self._call(url, deadline, headers=headers, **kwargs)
+                self._remember(response)
+        return response
+
+    def send_sms(self, phone, message, deadline=None):
+        """
+        Eskiz orqali SMS yuborish
+
+        Args:
+            phone: Telefon raqami
+            message: SMS matni
+            deadline: Umumiy vaqt chegarasi (apps.core.http.Deadline),
+                berilmasa Deadline.for_request()
+        """
+        if deadline is None:
+            deadline = http.Deadline.for_request()
+        self.last_status_code = self.last_response = self.last_error = None
+        self.circuit_open = False
 
+        try:
             # Telefon raqamini formatlash (faqat raqamlar)
             phone_clean = "".join(filter(str.isdigit, phone))
-
-            url = f"{self.api_url}/message/sms/send"
-            headers = {"Authorization": f"Bearer {self.token}"}
             payload = {
                 "mobile_phone": phone_clean,
                 "message": message,
                 "from": self.from_number,
             }
+            callback_url = delivery_callback_url()
+            if callback_url:
+                payload["callback_url"] = callback_url
 
-            response = requests.post(url, data=payload, headers=headers, timeout=10)
+            response = self._post("/message/sms/send", deadline, data=payload)
+            if response is None:
+                return False
 
             if response.status_code == 200:
                 logger.info(f"SMS muvaffaqiyatli yuborildi: {phone}")
                 return True
-            elif response.status_code == 401:
-                # Token muddati tugagan, yangi token olamiz va qayta urinib ko'ramiz
-                logger.warning("Eskiz token muddati tugagan, yangilanmoqda...")
-                self.get_token()
-                if self.token:
-                    headers["Authorization"] = f"Bearer {self.token}"
-                    response = requests.post(
-                        url, data=payload, headers=headers, timeout=10
-                    )
-                    if response.status_code == 200:
-                        logger.info(
-                            f"SMS muvaffaqiyatli yuborildi (2-urinish): {phone}"
-                        )
-                        return True
 
             logger.error(
                 f"SMS yuborishda xato: {response.status_code} - {response.text}"
@@ -103,77 +343,126 @@ class EskizSMSService:
 
         except Exception as e:
             logger.error(f"SMS yuborishda xato: {e}")
+            self.last_error = str(e)
             return False
 
+    def send_batch(self, messages, deadline=None):
+        """
+        Bir nechta SMS ni bitta Eskiz batch so'rovi bilan yuborish
+
+        Args:
+            messages: (sms_id, phone, text) lar ro'yxati; sms_id Eskizga
+                user_sms_id sifatida yuboriladi
+            deadline: Umumiy vaqt chegarasi (apps.core.http.Deadline)
+
+        Returns:
+            dict: str(sms_id) -> yuborilgan bo'lsa True. Batch rad etilsa
+            hammasi False; sabab last_status_code / last_error da.
+        """
+        if deadline is None:
+            deadline = http.Deadline.for_request()
+        self.last_status_code = self.last_response = self.last_error = None
+        self.circuit_open = False
+        results = {str(sms_id): False for sms_id, _, _ in messages}
+
+        try:
+            payload = {
+                "messages": [
+                    {
+                        "user_sms_id": str(sms_id),
+                        "to": int("".join(filter(str.isdigit, phone))),
+                        "text": text,
+                    }
+                    for sms_id, phone, text in messages
+                ],
+                "from": self.from_number,
+            }
+            callback_url = delivery_callback_url()
+            if callback_url:
+                payload["callback_url"] = callback_url
+
+            response = self._post("/message/sms/send-batch", deadline, json=payload)
+            if response is None:
+                return results
+
+            if response.status_code != 200:
+                logger.error(
+                    f"Batch SMS yuborishda xato: {response.status_code} - {response.text}"
+                )
+                return results
+
+            # Statuslar user_sms_id bo'yicha moslanadi; javobda topilmagan
+            # xabar yuborilmagan hisoblanadi
+            statuses = batch_statuses(self.last_response)
+            for sms_id in results:
+                if statuses is None:
+                    results[sms_id] = True
+                else:
+                    status = statuses.get(sms_id)
+                    results[sms_id] = (
+                        status is not None and status not in BATCH_REJECTED_STATUSES
+                    )
+
+            logger.info(f"Batch SMS yuborildi: {sum(results.values())}/{len(results)}")
+            return results
+
+        except Exception as e:
+            logger.error(f"Batch SMS yuborishda xato: {e}")
+            self.last_error = str(e)
+            return results
+
 
 def send_sms(phone, code):
     """
     Send SMS verification code via Eskiz SMS service.
 
+    The code is not queued in the outbox: it is sent once, right after
+    the current transaction commits (at once outside a transaction), so an
+    expired code is never delivered late by a retry.
+
     Args:
         phone: User's phone number
         code: 6-digit verification code
 
     Returns:
-        bool: True if message was successfully sent, False otherwise
+        bool: False if sending failed, True otherwise
     """
+    from .outbox import enqueue_sms
+
     # SMS matni - Eskizda tasdiqlangan matn
     message = f"QR MAHALLA tizimiga kirish uchun tasdiqlash kodi: {code}"
 
-    # Log yaratish
-    sms_log = _log_sms(phone, message, "verification")
-
     try:
-        eskiz = EskizSMSService()
-        result = eskiz.send_sms(phone, message)
-
-        if result:
-            sms_log.mark_as_sent()
-            logger.info(f"SMS yuborildi (Eskiz): {phone} -> {code}")
-            return True
-        else:
-            sms_log.mark_as_failed("SMS yuborishda xatolik")
-            logger.error(f"SMS yuborishda xatolik: {phone}")
-            return False
-
+        sms_log = enqueue_sms(phone, message, "verification")
+        logger.info(f"Tasdiqlash kodi yuborildi: {phone}")
+        return sms_log.status != "failed"
     except Exception as e:
-        sms_log.mark_as_failed(str(e))
         logger.error(f"SMS yuborishda xatolik: {e}")
         return False
 
 
-def send_registration_success_sms(phone, user_name=""):
+def send_registration_success_sms(phone, user_name="", user=None):
     """
     Send SMS after successful registration.
 
     Args:
         phone: User's phone number
         user_name: Optional user's name
+        user: Optional user the message is logged for
 
     Returns:
-        bool: True if message was successfully sent, False otherwise
+        bool: True if the message was queued (or sent), False otherwise
     """
+    from .outbox import enqueue_sms
+
     # SMS matni - Eskizda tasdiqlangan matn
     message = "Siz QR MAHALLA tizimida muvaffaqiyatli ro'yxatdan o'tdingiz."
 
-    # Log yaratish
-    sms_log = _log_sms(phone, message, "registration")
-
     try:
-        eskiz = EskizSMSService()
-        result = eskiz.send_sms(phone, message)
-
-        if result:
-            sms_log.mark_as_sent()
-            logger.info(f"Ro'yxatdan o'tish SMS yuborildi: {phone}")
-            return True
-        else:
-            sms_log.mark_as_failed("SMS yuborishda xatolik")
-            logger.error(f"Ro'yxatdan o'tish SMS yuborishda xatolik: {phone}")
-            return False
-
+        sms_log = enqueue_sms(phone, message, "registration", user=user)
+        logger.info(f"Ro'yxatdan o'tish SMS navbatga qo'yildi: {phone}")
+        return sms_log.status != "failed"
     except Exception as e:
-        sms_log.mark_as_failed(str(e))
         logger.error(f"Ro'yxatdan o'tish SMS yuborishda xatolik: {e}")
         return False
 
@@ -187,28 +476,17 @@ def send_qr_scan_sms(phone, qr_code):
         qr_code: QR code that was scanned
 
     Returns:
-        bool: True if message was successfully sent, False otherwise
+        bool: True if the message was queued (or sent), False otherwise
     """
+    from .outbox import enqueue_sms
+
     # SMS matni
     message = f"Sizning QR kodingiz muvaffaqiyatli skanerlandi.\n\nQR kod: {qr_code}"
 
-    # Log yaratish
-    sms_log = _log_sms(phone, message, "qr_scan")
-
     try:
-        eskiz = EskizSMSService()
-        result = eskiz.send_sms(phone, message)
-
-        if result:
-            sms_log.mark_as_sent()
-            logger.info(f"QR kod skaner SMS yuborildi: {phone}")
-            return True
-        else:
-            sms_log.mark_as_failed("SMS yuborishda xatolik")
-            logger.error(f"QR kod skaner SMS yuborishda xatolik: {phone}")
-            return False
-
+        sms_log = enqueue_sms(phone, message, "qr_scan")
+        logger.info(f"QR kod skaner SMS navbatga qo'yildi: {phone}")
+        return sms_log.status != "failed"
     except Exception as e:
-        sms_log.mark_as_failed(str(e))
         logger.error(f"QR kod skaner SMS yuborishda xatolik: {e}")
         return False
@@ -0,0 +1,316 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .delivery_reports import flush_reports
+from .fake_eskiz import FakeEskizServer
+from .models_sms import SMSLog
+from .outbox import dispatch_pending, enqueue_bulk_sms, enqueue_sms
+from .services import EskizSMSService, eskiz_breaker
+
+
+class FakeEskizMixin:
+    """Point the Eskiz client at a local FakeEskizServer for each test."""
+
+    server_options = {}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.server = FakeEskizServer(**self.server_options).start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(
+            ESKIZ_API_URL=self.server.url,
+            ESKIZ_EMAIL="test@example.com",
+            ESKIZ_PASSWORD="secret",
+            ESKIZ_FROM="4546",
+            ESKIZ_CALLBACK_URL="",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+@override_settings(SMS_OUTBOX_ENABLED=True)
+class OutboxTests(FakeEskizMixin, TransactionTestCase):
+    def test_rolled_back_message_is_not_queued(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue_sms("+998901111111", "Salom", "notification")
+                raise RuntimeError
+
+        self.assertFalse(SMSLog.objects.exists())
+
+    def test_dispatch_sends_pending_message(self):
+        sms_log = enqueue_sms("+998901111111", "Salom", "notification")
+
+        result = dispatch_pending()
+
+        self.assertEqual((result.sent, result.retried, result.failed), (1, 0, 0))
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "sent")
+        self.assertEqual(sms_log.attempts, 1)
+        self.assertIsNotNone(sms_log.provider_message_id)
+        self.assertEqual(self.server.messages[0]["phone"], "998901111111")
+        self.assertEqual(dispatch_pending().total, 0)
+
+    @override_settings(SMS_OUTBOX_MAX_ATTEMPTS=2)
+    def test_server_error_is_retried_then_failed(self):
+        self.server.failure_rate = 1.0
+        sms_log = enqueue_sms("+998901111111", "Salom", "notification")
+
+        self.assertEqual(dispatch_pending().retried, 1)
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "pending")
+        self.assertGreater(sms_log.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(dispatch_pending().total, 0)
+
+        SMSLog.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(dispatch_pending().failed, 1)
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "failed")
+        self.assertEqual(sms_log.attempts, 2)
+        self.assertIsNone(sms_log.next_attempt_at)
+
+    def test_rejected_number_fails_at_once(self):
+        self.server.fail_phones = {"998900000000"}
+        sms_log = enqueue_sms("+998900000000", "Salom", "notification")
+
+        self.assertEqual(dispatch_pending().failed, 1)
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "failed")
+        self.assertEqual(sms_log.attempts, 1)
+
+    def test_expired_lease_is_claimed_again(self):
+        sms_log = enqueue_sms("+998901111111", "Salom", "notification")
+        # A dispatcher that leased the row and died
+        SMSLog.objects.update(
+            attempts=1, next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(dispatch_pending().sent, 1)
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.attempts, 2)
+
+    def test_verification_code_is_sent_inline_after_commit(self):
+        with transaction.atomic():
+            sms_log = enqueue_sms("+998901111111", "Kod: 123456", "verification")
+            self.assertFalse(SMSLog.objects.exists())
+            self.assertEqual(self.server.messages, [])
+
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "sent")
+        self.assertIsNone(sms_log.next_attempt_at)
+        # Never picked up again by the dispatcher
+        self.assertEqual(dispatch_pending().total, 0)
+
+
+@override_settings(SMS_OUTBOX_ENABLED=True)
+class BatchSendTests(FakeEskizMixin, TransactionTestCase):
+    def test_dispatch_uses_one_batch_request(self):
+        self.server.fail_phones = {"998900000002"}
+        logs = enqueue_bulk_sms(
+            [(f"+99890000000{i}", None) for i in (1, 2, 3)],
+            "Yig'ilish",
+            "notification",
+        )
+
+        result = dispatch_pending()
+
+        self.assertEqual(self.server.requests["send-batch"], 1)
+        self.assertEqual(self.server.requests["send"], 0)
+        self.assertEqual((result.sent, result.retried), (2, 1))
+        statuses = dict(SMSLog.objects.values_list("phone", "status"))
+        self.assertEqual(statuses["+998900000001"], "sent")
+        self.assertEqual(statuses["+998900000002"], "pending")
+        self.assertEqual(statuses["+998900000003"], "sent")
+        rejected = SMSLog.objects.get(id=logs[1].id)
+        self.assertEqual(rejected.eskiz_response["status"], "rejected")
+
+    def test_statuses_are_matched_by_user_sms_id(self):
+        def post(service, path, deadline, **kwargs):
+            # Reordered, with one message missing and one unknown entry
+            service.last_status_code = 200
+            service.last_response = {
+                "id": "batch",
+                "status": [
+                    {"user_sms_id": "c", "status": "waiting"},
+                    {"user_sms_id": "zzz", "status": "waiting"},
+                    {"user_sms_id": "a", "status": "rejected"},
+                ],
+            }
+            return SimpleNamespace(status_code=200)
+
+        with mock.patch.object(EskizSMSService, "_post", post):
+            results = EskizSMSService().send_batch(
+                [
+                    ("a", "+998900000001", "x"),
+                    ("b", "+998900000002", "x"),
+                    ("c", "+998900000003", "x"),
+                ]
+            )
+
+        self.assertEqual(results, {"a": False, "b": False, "c": True})
+
+    def test_batch_without_statuses_is_accepted_whole(self):
+        def post(service, path, deadline, **kwargs):
+            service.last_status_code = 200
+            service.last_response = {"id": "batch"}
+            return SimpleNamespace(status_code=200)
+
+        with mock.patch.object(EskizSMSService, "_post", post):
+            results = EskizSMSService().send_batch(
+                [("a", "+998900000001", "x"), ("b", "+998900000002", "x")]
+            )
+
+        self.assertEqual(results, {"a": True, "b": True})
+
+    def test_rejected_batch_fails_every_message(self):
+        self.server.failure_rate = 1.0
+
+        results = EskizSMSService().send_batch(
+            [("a", "+998900000001", "x"), ("b", "+998900000002", "x")]
+        )
+
+        self.assertEqual(results, {"a": False, "b": False})
+
+
+class EskizBreakerTests(FakeEskizMixin, TransactionTestCase):
+    def test_dispatcher_waits_while_open(self):
+        enqueue_sms("+998901111111", "Salom", "notification")
+        eskiz_breaker._open()
+
+        self.assertEqual(dispatch_pending().total, 0)
+        self.assertEqual(self.server.requests["send"], 0)
+        self.assertEqual(SMSLog.objects.get().attempts, 0)
+
+    def test_refused_send_keeps_its_attempt(self):
+        sms_log = enqueue_sms("+998901111111", "Salom", "notification")
+        # Opens between the dispatcher's check and the send
+        with mock.patch.object(eskiz_breaker, "allow", return_value=False):
+            self.assertEqual(dispatch_pending().retried, 1)
+
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "pending")
+        self.assertEqual(sms_log.attempts, 0)
+        self.assertEqual(self.server.requests["send"], 0)
+
+
+class DeliveryReportTests(TestCase):
+    def create_log(self, status="sent", **fields):
+        return SMSLog.objects.create(
+            phone="+998901111111", message="Salom", status=status, **fields
+        )
+
+    def test_reports_match_provider_and_own_ids(self):
+        single = self.create_log(provider_message_id="abc")
+        batched = self.create_log()
+
+        flush_reports(
+            [
+                {"message_id": "abc", "status": "DELIVRD"},
+                {
+                    "message_id": "x",
+                    "user_sms_id": str(batched.id),
+                    "status": "UNDELIV",
+                },
+                {"message_id": "y", "user_sms_id": "not-a-uuid", "status": "DELIVRD"},
+            ]
+        )
+
+        single.refresh_from_db()
+        batched.refresh_from_db()
+        self.assertEqual(single.status, "delivered")
+        self.assertIsNotNone(single.delivered_at)
+        self.assertEqual(batched.status, "failed")
+
+    def test_intermediate_and_late_reports_do_not_downgrade(self):
+        sms_log = self.create_log(status="delivered", provider_message_id="abc")
+
+        flush_reports(
+            [
+                {"message_id": "abc", "status": "TRANSMTD"},
+                {"message_id": "abc", "status": "EXPIRED"},
+            ]
+        )
+
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "delivered")
+
+
+@override_settings(
+    ESKIZ_CALLBACK_TOKEN="secret", SMS_REPORT_SYNC=True, SECURE_SSL_REDIRECT=False
+)
+class DeliveryCallbackViewTests(TestCase):
+    url = "/api/users/sms/eskiz-callback/"
+
+    def test_report_is_applied(self):
+        sms_log = SMSLog.objects.create(
+            phone="+998901111111",
+            message="Salom",
+            status="sent",
+            provider_message_id="abc",
+        )
+
+        response = self.client.post(
+            f"{self.url}?token=secret",
+            {"message_id": "abc", "status": "DELIVRD"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        sms_log.refresh_from_db()
+        self.assertEqual(sms_log.status, "delivered")
+
+    def test_wrong_token_is_rejected(self):
+        response = self.client.post(
+            f"{self.url}?token=wrong",
+            {"message_id": "abc", "status": "DELIVRD"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_non_object_body_is_a_bad_request(self):
+        response = self.client.post(
+            f"{self.url}?token=secret",
+            [{"message_id": "abc", "status": "DELIVRD"}],
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error_en", response.json())
+
+
+@override_settings(SMS_OUTBOX_ENABLED=False)
+class EarlyReportTests(FakeEskizMixin, TransactionTestCase):
+    def test_report_before_outcome_is_kept(self):
+        original = EskizSMSService.send_batch
+
+        def send_batch(service, messages, deadline=None):
+            results = original(service, messages, deadline)
+            # Eskiz reports delivery before the outcome is written
+            flush_reports(
+                [
+                    {"user_sms_id": str(sms_id), "status": "DELIVRD"}
+                    for sms_id, _, _ in messages
+                ]
+            )
+            return results
+
+        with mock.patch.object(EskizSMSService, "send_batch", send_batch):
+            logs = enqueue_bulk_sms(
+                [("+998900000001", None), ("+998900000002", None)],
+                "Yig'ilish",
+                "notification",
+            )
+
+        self.assertEqual(len(logs), 2)
+        self.assertEqual(
+            set(SMSLog.objects.values_list("status", flat=True)), {"delivered"}
+        )
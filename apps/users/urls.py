@@ -11,6 +11,7 @@ from .views import (
     UserViewSet,
     SMSLogViewSet,
     SMSStatisticsAPIView,
+    EskizDeliveryCallbackAPIView,
 )
 
 router = DefaultRouter()
@@ -26,5 +27,10 @@ urlpatterns = [
     path("logout-all/", LogoutAllDevicesAPIView.as_view(), name="logout-all"),
     path("token/refresh/", CustomTokenRefreshView.as_view(), name="token_refresh"),
     path("sms-statistics/", SMSStatisticsAPIView.as_view(), name="sms-statistics"),
+    path(
+        "sms/eskiz-callback/",
+        EskizDeliveryCallbackAPIView.as_view(),
+        name="eskiz-callback",
+    ),
     path("", include(router.urls)),
 ]
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.conf import settings
+import hmac
 import logging
 
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -605,34 +606,76 @@ class SMSStatisticsAPIView(APIView):
         from .models_sms import SMSLog
         from django.db.models import Count, Q
 
-        # Umumiy statistika
-        total_sms = SMSLog.objects.count()
-        sent_sms = SMSLog.objects.filter(status="sent").count()
-        failed_sms = SMSLog.objects.filter(status="failed").count()
-        pending_sms = SMSLog.objects.filter(status="pending").count()
-
-        # SMS turlari bo'yicha
-        verification_sms = SMSLog.objects.filter(sms_type="verification").count()
-        registration_sms = SMSLog.objects.filter(sms_type="registration").count()
-        qr_scan_sms = SMSLog.objects.filter(sms_type="qr_scan").count()
-        notification_sms = SMSLog.objects.filter(sms_type="notification").count()
+        # Umumiy statistika (bitta so'rovda)
+        counts = SMSLog.objects.aggregate(
+            total_sms=Count("id"),
+            sent_sms=Count("id", filter=Q(status="sent")),
+            delivered_sms=Count("id", filter=Q(status="delivered")),
+            failed_sms=Count("id", filter=Q(status="failed")),
+            pending_sms=Count("id", filter=Q(status="pending")),
+            # SMS turlari bo'yicha
+            verification_sms=Count("id", filter=Q(sms_type="verification")),
+            registration_sms=Count("id", filter=Q(sms_type="registration")),
+            qr_scan_sms=Count("id", filter=Q(sms_type="qr_scan")),
+            notification_sms=Count("id", filter=Q(sms_type="notification")),
+        )
+        total_sms = counts["total_sms"]
+        # Eskiz qabul qilgan xabarlar (yetkazilganlari ham)
+        accepted_sms = counts["sent_sms"] + counts["delivered_sms"]
 
         # Success rate
-        success_rate = (sent_sms / total_sms * 100) if total_sms > 0 else 0
+        success_rate = (accepted_sms / total_sms * 100) if total_sms > 0 else 0
+        # Delivery rate: Eskiz qabul qilganlardan yetkazilganlari (callback)
+        delivery_rate = (
+            (counts["delivered_sms"] / accepted_sms * 100) if accepted_sms > 0 else 0
+        )
 
         data = {
-            "total_sms": total_sms,
-            "sent_sms": sent_sms,
-            "failed_sms": failed_sms,
-            "pending_sms": pending_sms,
-            "verification_sms": verification_sms,
-            "registration_sms": registration_sms,
-            "qr_scan_sms": qr_scan_sms,
-            "notification_sms": notification_sms,
+            **counts,
             "success_rate": round(success_rate, 2),
+            "delivery_rate": round(delivery_rate, 2),
         }
 
         from .serializers_sms import SMSStatisticsSerializer
 
         serializer = SMSStatisticsSerializer(data)
         return Response(serializer.data)
+
+
+class EskizDeliveryCallbackAPIView(APIView):
+    """
+    Eskiz yetkazish hisobotlari (delivery report) uchun callback.
+
+    Eskiz har bir xabar holati o'zgarganda shu manzilga POST yuboradi.
+    So'rov ESKIZ_CALLBACK_TOKEN bilan tekshiriladi; hisobotlar navbatga
+    qo'yiladi va SMSLog ga guruhlab yoziladi (apps.users.delivery_reports).
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        from .delivery_reports import record_report
+
+        expected = getattr(settings, "ESKIZ_CALLBACK_TOKEN", "")
+        token = request.query_params.get("token", "")
+        if not expected or not hmac.compare_digest(token, expected):
+            return Response(
+                {
+                    "error": "Noto'g'ri token",
+                    "error_en": "Invalid token",
+                },
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if not isinstance(request.data, dict):
+            return Response(
+                {
+                    "error": "Noto'g'ri hisobot",
+                    "error_en": "Report body must be a JSON object",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        record_report(request.data)
+        return Response({"ok": True})
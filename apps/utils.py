@@ -1,75 +1,79 @@
-from django.db import models
+from typing import Iterable, List, Optional, Set
+
+from django.db import models, transaction
 
 
 class GapFillingIDMixin(models.Model):
     """
-    Mixin that automatically fills gaps in ID sequence when creating new records.
-    Instead of always incrementing, finds first available ID.
+    Mixin that assigns IDs through a pluggable allocation strategy.
+
+    The default ``gap_reuse`` strategy fills gaps left by deleted records
+    from a free-list instead of scanning the whole table on every insert.
+    See ``apps.core.id_allocation`` for the available strategies.
     """
 
     id = models.IntegerField(primary_key=True, verbose_name="ID")
 
+    # Default strategy, can be overridden via settings.ID_ALLOCATION_STRATEGIES
+    id_strategy = "gap_reuse"
+
+    # Upper bound of the sequence range; IDs above it are ignored when the
+    # sequence is synced with the table (None = no bound)
+    id_sequence_max = None
+
     class Meta:
         abstract = True
 
     @classmethod
-    def get_next_available_id(cls):
-        """
-        Find the first available ID (fills gaps from deleted records).
+    def get_id_strategy(cls):
+        """Return the ID allocation strategy configured for this model."""
+        from apps.core.id_allocation import get_strategy_for_model
 
-        For models with OneToOne relationships (like House with QRCode),
-        also checks if the ID is safe to use (no existing related records).
+        return get_strategy_for_model(cls)
 
-        Returns:
-            int: First available ID in the sequence
+    @classmethod
+    def get_next_available_id(cls) -> int:
         """
-        import logging
-
-        logger = logging.getLogger(__name__)
-
-        existing_ids = set(cls.objects.values_list("id", flat=True))
-        logger.info(f"{cls.__name__}: Existing IDs count: {len(existing_ids)}")
-
-        # Additional safety check for House model with QRCode relationship
-        # to avoid OneToOne constraint violations
-        if cls.__name__ == "House":
-            # Import here to avoid circular imports
-            from apps.qrcodes.models import QRCode
-
-            # Get ALL house_ids currently referenced in QRCode table
-            # This is critical because these IDs CANNOT be reused
-            reserved_by_qrcodes = set(
-                QRCode.objects.filter(house_id__isnull=False).values_list(
-                    "house_id", flat=True
-                )
-            )
-
-            logger.info(f"House: QRCode reserved IDs count: {len(reserved_by_qrcodes)}")
+        Allocate the next ID for a new record.
 
-            # Combine both sets - we can't use IDs from either set
-            all_used_ids = existing_ids | reserved_by_qrcodes
+        Returns:
+            int: ID that is safe to insert
+        """
+        return cls.get_id_strategy().allocate(cls)
 
-            logger.info(
-                f"House: Total used IDs (houses + qrcodes): {len(all_used_ids)}"
-            )
+    @classmethod
+    def allocate_ids(cls, count: int) -> List[int]:
+        """
+        Allocate IDs for ``count`` new records in one step (for bulk_create).
 
-            # Find first available ID that's NOT in either set
-            expected_id = 1
-            while expected_id in all_used_ids:
-                expected_id += 1
+        Returns:
+            list: IDs in ascending order
+        """
+        return cls.get_id_strategy().allocate_many(cls, count)
 
-            logger.info(f"House: Found available ID: {expected_id}")
-            return expected_id
+    @classmethod
+    def get_reserved_ids(cls, candidates: Optional[Iterable[int]] = None) -> Set[int]:
+        """
+        IDs that must not be reused even though no row of this model has them.
 
-        # For other models, just find gap in existing IDs
-        expected_id = 1
-        while expected_id in existing_ids:
-            expected_id += 1
+        Args:
+            candidates: Only check these IDs. If None, return all reserved IDs.
 
-        logger.info(f"{cls.__name__}: Selected ID: {expected_id}")
-        return expected_id
+        Returns:
+            set: Reserved IDs
+        """
+        return set()
 
     def save(self, *args, **kwargs):
-        if not self.id:
+        if self.id:
+            return super().save(*args, **kwargs)
+
+        # Allocate in the same transaction as the insert, so an ID taken
+        # from the free-list goes back to it if the insert fails
+        with transaction.atomic():
             self.id = self.__class__.get_next_available_id()
-        super().save(*args, **kwargs)
+            try:
+                super().save(*args, **kwargs)
+            except BaseException:
+                self.id = None
+                raise
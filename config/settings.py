@@ -21,14 +21,94 @@ TELEGRAM_BOT_TOKEN = os.getenv(
 )
 TELEGRAM_BOT_USERNAME = os.getenv("TELEGRAM_BOT_USERNAME", "qrmahallabot")
 TELEGRAM_CHAT_IDS = os.getenv("TELEGRAM_CHAT_IDS", "8055309446,5323321097").split(",")
+# House notifications are sent after commit by a background pool per worker
+TELEGRAM_SENDER_WORKERS = int(os.getenv("TELEGRAM_SENDER_WORKERS", "4"))
+# Time budget for one Telegram message (connect + read)
+TELEGRAM_SEND_BUDGET = float(os.getenv("TELEGRAM_SEND_BUDGET", "10"))
+# Bot API limits, enforced across workers: messages per second for the bot
+# and per chat (with a small burst); 429 answers are retried after retry_after
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+# Network and 5xx failures are retried with backoff up to this many times
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", "5"))
+# "immediate": one message per new house; "digest": one summary per group
+# (region, district or mahalla) per window, sent by `send_house_digests`
+TELEGRAM_NOTIFICATION_MODE = os.getenv("TELEGRAM_NOTIFICATION_MODE", "immediate")
+TELEGRAM_DIGEST_GROUP_BY = os.getenv("TELEGRAM_DIGEST_GROUP_BY", "district")
+TELEGRAM_DIGEST_WINDOW = int(os.getenv("TELEGRAM_DIGEST_WINDOW", "300"))
+TELEGRAM_DIGEST_RETENTION_DAYS = int(os.getenv("TELEGRAM_DIGEST_RETENTION_DAYS", "7"))
 
 # Eskiz SMS Settings
 ESKIZ_EMAIL = os.getenv("ESKIZ_EMAIL", "")
 ESKIZ_PASSWORD = os.getenv("ESKIZ_PASSWORD", "")
-ESKIZ_API_URL = "https://notify.eskiz.uz/api"
+# Point at `python manage.py run_fake_eskiz` to test without sending real SMS
+ESKIZ_API_URL = os.getenv("ESKIZ_API_URL", "https://notify.eskiz.uz/api")
 ESKIZ_FROM = os.getenv(
     "ESKIZ_FROM", "4546"
 )  # Sizning Eskiz da ro'yxatdan o'tgan raqamingiz
+# The auth token is shared by all workers through the cache. It is renewed
+# this many seconds before it expires; the TTL is used if the token carries
+# no expiry of its own.
+ESKIZ_TOKEN_REFRESH_MARGIN = int(os.getenv("ESKIZ_TOKEN_REFRESH_MARGIN", "3600"))
+ESKIZ_TOKEN_TTL = int(os.getenv("ESKIZ_TOKEN_TTL", "86400"))
+# How long other workers wait for the one logging in before trying themselves
+ESKIZ_TOKEN_LOCK_TIMEOUT = int(os.getenv("ESKIZ_TOKEN_LOCK_TIMEOUT", "15"))
+
+# Eskiz circuit breaker (state shared through the cache). Opens when at least
+# MIN_CALLS calls in the last WINDOW seconds were made and FAILURE_RATE of them
+# failed (5xx, network error or slower than SLOW_CALL seconds); calls then
+# fail fast for OPEN_SECONDS before a single probe is let through.
+ESKIZ_BREAKER_FAILURE_RATE = float(os.getenv("ESKIZ_BREAKER_FAILURE_RATE", "0.5"))
+ESKIZ_BREAKER_MIN_CALLS = int(os.getenv("ESKIZ_BREAKER_MIN_CALLS", "10"))
+ESKIZ_BREAKER_WINDOW = int(os.getenv("ESKIZ_BREAKER_WINDOW", "60"))
+ESKIZ_BREAKER_OPEN_SECONDS = int(os.getenv("ESKIZ_BREAKER_OPEN_SECONDS", "30"))
+ESKIZ_BREAKER_SLOW_CALL = float(os.getenv("ESKIZ_BREAKER_SLOW_CALL", "5"))
+
+# Outbound HTTP (Eskiz, Telegram): pooled keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# Total time one API request may spend on outbound notification calls
+HTTP_REQUEST_BUDGET = float(os.getenv("HTTP_REQUEST_BUDGET", "8"))
+
+# SMS outbox: handlers queue SMSLog rows, dispatch_sms_outbox sends them.
+# Disable to send inline after commit (no dispatcher needed).
+SMS_OUTBOX_ENABLED = os.getenv("SMS_OUTBOX_ENABLED", "True").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+# Messages leased per dispatcher pass
+SMS_OUTBOX_BATCH_SIZE = int(os.getenv("SMS_OUTBOX_BATCH_SIZE", "500"))
+SMS_OUTBOX_WORKERS = int(os.getenv("SMS_OUTBOX_WORKERS", "8"))
+# Send leased messages through the Eskiz batch API, this many per request
+SMS_BATCH_ENABLED = os.getenv("SMS_BATCH_ENABLED", "True").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+SMS_BATCH_CHUNK_SIZE = int(os.getenv("SMS_BATCH_CHUNK_SIZE", "100"))
+# Failed sends are retried after RETRY_DELAY * 2^(attempt-1) seconds, capped
+SMS_OUTBOX_MAX_ATTEMPTS = int(os.getenv("SMS_OUTBOX_MAX_ATTEMPTS", "5"))
+SMS_OUTBOX_RETRY_DELAY = int(os.getenv("SMS_OUTBOX_RETRY_DELAY", "30"))
+SMS_OUTBOX_MAX_DELAY = int(os.getenv("SMS_OUTBOX_MAX_DELAY", "3600"))
+# Messages leased by a dispatcher that died are picked up again after this
+SMS_OUTBOX_LEASE = int(os.getenv("SMS_OUTBOX_LEASE", "300"))
+# Time budget for one send (token login + send + token retry)
+SMS_OUTBOX_SEND_BUDGET = float(os.getenv("SMS_OUTBOX_SEND_BUDGET", "15"))
+# Eskiz delivery reports: set both to the public callback URL
+# (https://<domain>/api/users/sms/eskiz-callback/) and a random secret
+ESKIZ_CALLBACK_URL = os.getenv("ESKIZ_CALLBACK_URL", "")
+ESKIZ_CALLBACK_TOKEN = os.getenv("ESKIZ_CALLBACK_TOKEN", "")
+# Reports are applied to SMSLog in batches (see apps.users.delivery_reports)
+SMS_REPORT_SYNC = os.getenv("SMS_REPORT_SYNC", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+SMS_REPORT_BUFFER_SIZE = int(os.getenv("SMS_REPORT_BUFFER_SIZE", "200"))
+SMS_REPORT_BUFFER_MAX_DELAY = float(os.getenv("SMS_REPORT_BUFFER_MAX_DELAY", "2.0"))
 
 INSTALLED_APPS = [
     "corsheaders",
@@ -42,6 +122,7 @@ INSTALLED_APPS = [
     "rest_framework.authtoken",
     "rest_framework_simplejwt",
     "drf_yasg",
+    "apps.core",
     "apps.users",
     "apps.regions",
     "apps.houses",
@@ -50,6 +131,13 @@ INSTALLED_APPS = [
 ]
 
 AUTH_USER_MODEL = "users.User"
+
+# ID allocation strategy overrides per model: "scan", "sequence", "gap_reuse"
+# or "time_ordered". Models not listed use their declared id_strategy.
+# "time_ordered" needs a 64-bit primary key, which scans.ScanLog has.
+# Example: {"regions.Region": "sequence", "scans.ScanLog": "time_ordered"}
+ID_ALLOCATION_STRATEGIES = {}
+
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 USE_X_FORWARDED_HOST = True
 
@@ -164,6 +252,44 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "config.wsgi.application"
 
+# QR code generation
+# Batches smaller than this are rendered inline instead of in a process pool
+QR_RENDER_POOL_THRESHOLD = int(os.getenv("QR_RENDER_POOL_THRESHOLD", "200"))
+# Process pool size for rendering (defaults to CPU count)
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", "0")) or None
+# Store a PNG per QR code in MEDIA_ROOT (images are rendered on demand otherwise)
+QR_STORE_IMAGES = os.getenv("QR_STORE_IMAGES", "False").lower() in ("true", "1", "yes")
+# Number of rendered images kept in the per-process LRU cache
+QR_IMAGE_CACHE_SIZE = int(os.getenv("QR_IMAGE_CACHE_SIZE", "1024"))
+# Bulk requests above this count run as a background job (run_qr_generation_jobs)
+QR_BULK_SYNC_LIMIT = int(os.getenv("QR_BULK_SYNC_LIMIT", "1000"))
+# Codes generated and committed per step of a background job
+QR_JOB_CHUNK_SIZE = int(os.getenv("QR_JOB_CHUNK_SIZE", "1000"))
+# Running jobs without progress for this many seconds are failed: their
+# worker died (workers report progress after every chunk)
+QR_JOB_TIMEOUT = int(os.getenv("QR_JOB_TIMEOUT", "600"))
+# Secret for the tag of new QR keys (defaults to SECRET_KEY). Changing it
+# turns existing signed keys into legacy keys, which still work.
+QR_KEY_SECRET = os.getenv("QR_KEY_SECRET", "")
+# Unknown keys remembered per process, and for how many seconds
+QR_NEGATIVE_CACHE_SIZE = int(os.getenv("QR_NEGATIVE_CACHE_SIZE", "10000"))
+QR_NEGATIVE_CACHE_TTL = int(os.getenv("QR_NEGATIVE_CACHE_TTL", "300"))
+# Seconds between background rebuilds of the Bloom filter of legacy keys
+QR_KEY_BLOOM_REBUILD_SECONDS = int(os.getenv("QR_KEY_BLOOM_REBUILD_SECONDS", "3600"))
+
+# Scan recording
+# Write scans immediately instead of buffering them (use in tests)
+SCAN_RECORDER_SYNC = os.getenv("SCAN_RECORDER_SYNC", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+# Buffered scans are flushed at this many events or after this many seconds
+SCAN_BUFFER_SIZE = int(os.getenv("SCAN_BUFFER_SIZE", "200"))
+SCAN_BUFFER_MAX_DELAY = float(os.getenv("SCAN_BUFFER_MAX_DELAY", "2.0"))
+# Batches that could not be written are kept here and replayed later
+WRITE_BEHIND_SPOOL_DIR = os.getenv("WRITE_BEHIND_SPOOL_DIR", str(BASE_DIR / "spool"))
+
 # Database
 DATABASES = {
     "default": {
@@ -177,6 +303,54 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by all gunicorn workers so signal-driven invalidation reaches every
+# process. The database cache needs `python manage.py createcachetable`.
+#
+# - "default" holds coordination state: the Eskiz token and circuit breaker,
+#   Telegram rate limits, metrics counters and data version keys. It must
+#   never be culled, or those features silently reset.
+# - "scans" holds the per-UUID scan payloads, which are cheap to rebuild and
+#   numerous, so only this alias has a small culling limit.
+CACHE_BACKEND = os.getenv(
+    "CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+)
+CACHE_LOCATION = os.getenv("CACHE_LOCATION", "django_cache")
+# Backends that cull at MAX_ENTRIES; Redis and Memcached evict on their own
+# and do not accept the option
+CULLING_CACHE_BACKENDS = (
+    "django.core.cache.backends.db.DatabaseCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+)
+if CACHE_BACKEND in CULLING_CACHE_BACKENDS:
+    SCAN_CACHE_LOCATION = os.getenv("SCAN_CACHE_LOCATION", "django_scan_cache")
+    DEFAULT_CACHE_OPTIONS = {
+        "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "1000000"))
+    }
+    SCAN_CACHE_OPTIONS = {
+        "MAX_ENTRIES": int(os.getenv("SCAN_CACHE_MAX_ENTRIES", "50000"))
+    }
+else:
+    SCAN_CACHE_LOCATION = os.getenv("SCAN_CACHE_LOCATION", CACHE_LOCATION)
+    DEFAULT_CACHE_OPTIONS = SCAN_CACHE_OPTIONS = {}
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_LOCATION,
+        "OPTIONS": DEFAULT_CACHE_OPTIONS,
+    },
+    "scans": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": SCAN_CACHE_LOCATION,
+        "OPTIONS": SCAN_CACHE_OPTIONS,
+    },
+}
+# Lifetime of cached scan responses (they are also invalidated on change)
+SCAN_CACHE_TIMEOUT = int(os.getenv("SCAN_CACHE_TIMEOUT", "3600"))
+# Lifetime of the cached region tree (it is also invalidated on change)
+REGION_TREE_CACHE_TIMEOUT = int(os.getenv("REGION_TREE_CACHE_TIMEOUT", "86400"))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -206,6 +380,25 @@ STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Let nginx send protected downloads (X-Accel-Redirect to an internal
+# location aliasing MEDIA_ROOT, see server_setup.sh); off: Django sends them
+DOWNLOADS_ACCEL_REDIRECT = os.getenv("DOWNLOADS_ACCEL_REDIRECT", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+DOWNLOADS_ACCEL_PREFIX = os.getenv("DOWNLOADS_ACCEL_PREFIX", "/protected/")
+# House exports read this many rows per database round trip
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+# XLSX exports of up to this many houses run within the request, larger
+# ones in the run_export_jobs worker (0: always in the worker)
+EXPORT_SYNC_LIMIT = int(os.getenv("EXPORT_SYNC_LIMIT", "50000"))
+# How long a request waits for an identical export already running
+EXPORT_WAIT_SECONDS = int(os.getenv("EXPORT_WAIT_SECONDS", "20"))
+# Running export jobs older than this are considered dead (seconds)
+EXPORT_JOB_TIMEOUT = int(os.getenv("EXPORT_JOB_TIMEOUT", "1800"))
+# Size budget of cached export files in media/exports
+EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "1024"))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt",
     "drf_yasg",
     # local apps
+    "apps.core",
     "apps.users",
     "apps.regions",
     "apps.houses",
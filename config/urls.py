@@ -29,6 +29,7 @@ urlpatterns = [
     path("api/", include("apps.houses.urls")),  # Houses endpoint
     path("api/qrcodes/", include("apps.qrcodes.urls")),
     path("api/scans/", include("apps.scans.urls")),  # Scan logs endpoint
+    path("api/metrics/", include("apps.core.urls")),  # Operational counters
 ]
 
 # Only expose swagger in debug mode or if explicitly enabled
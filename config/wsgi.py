@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Each worker loads this module, so each one warms its own key index
+from apps.qrcodes.keys import start_key_index  # noqa: E402
+
+start_key_index()
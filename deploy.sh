@@ -22,6 +22,7 @@ pip install -r requirements.txt
 # Run migrations
 echo "🗄️  Running database migrations..."
 python manage.py migrate
+python manage.py createcachetable
 
 # Collect static files
 echo "📁 Collecting static files..."
@@ -30,5 +31,7 @@ python manage.py collectstatic --noinput
 # Restart service
 echo "♻️  Restarting service..."
 sudo systemctl restart qr-mahalla
+# Background workers (QR generation jobs, SMS outbox, digests, exports), if installed
+sudo systemctl try-restart qr-mahalla-qrjobs qr-mahalla-sms qr-mahalla-digests qr-mahalla-exports
 
 echo "✅ Deployment completed successfully!"
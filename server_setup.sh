@@ -73,6 +73,7 @@ echo "⚠️  Please edit /var/www/qr-mahalla/.env and set your environment vari
 # Run migrations
 echo "🗄️  Running database migrations..."
 python manage.py migrate
+python manage.py createcachetable
 
 # Create superuser
 echo "👤 Creating superuser..."
@@ -101,6 +102,86 @@ ExecStart=/var/www/qr-mahalla/venv/bin/gunicorn --workers 3 --bind unix:/var/www
 WantedBy=multi-user.target
 EOF
 
+# Setup background QR generation worker
+echo "⚙️  Setting up QR generation worker..."
+sudo tee /etc/systemd/system/qr-mahalla-qrjobs.service > /dev/null << EOF
+[Unit]
+Description=QR Mahalla bulk QR generation worker
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=/var/www/qr-mahalla
+Environment="PATH=/var/www/qr-mahalla/venv/bin"
+EnvironmentFile=/var/www/qr-mahalla/.env
+ExecStart=/var/www/qr-mahalla/venv/bin/python manage.py run_qr_generation_jobs
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Setup SMS outbox dispatcher
+echo "⚙️  Setting up SMS dispatcher..."
+sudo tee /etc/systemd/system/qr-mahalla-sms.service > /dev/null << EOF
+[Unit]
+Description=QR Mahalla SMS outbox dispatcher
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=/var/www/qr-mahalla
+Environment="PATH=/var/www/qr-mahalla/venv/bin"
+EnvironmentFile=/var/www/qr-mahalla/.env
+ExecStart=/var/www/qr-mahalla/venv/bin/python manage.py dispatch_sms_outbox
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Setup Telegram digest sender (used with TELEGRAM_NOTIFICATION_MODE=digest)
+echo "⚙️  Setting up Telegram digest sender..."
+sudo tee /etc/systemd/system/qr-mahalla-digests.service > /dev/null << EOF
+[Unit]
+Description=QR Mahalla Telegram house digests
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=/var/www/qr-mahalla
+Environment="PATH=/var/www/qr-mahalla/venv/bin"
+EnvironmentFile=/var/www/qr-mahalla/.env
+ExecStart=/var/www/qr-mahalla/venv/bin/python manage.py send_house_digests
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Setup house export worker (exports above EXPORT_SYNC_LIMIT houses)
+echo "⚙️  Setting up house export worker..."
+sudo tee /etc/systemd/system/qr-mahalla-exports.service > /dev/null << EOF
+[Unit]
+Description=QR Mahalla house export jobs
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=/var/www/qr-mahalla
+Environment="PATH=/var/www/qr-mahalla/venv/bin"
+EnvironmentFile=/var/www/qr-mahalla/.env
+ExecStart=/var/www/qr-mahalla/venv/bin/python manage.py run_export_jobs
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 # Setup Nginx
 echo "🌐 Setting up Nginx..."
 sudo tee /etc/nginx/sites-available/qr-mahalla > /dev/null << 'EOF'
@@ -120,6 +201,17 @@ server {
         alias /var/www/qr-mahalla/media/;
     }
 
+    # Generatsiya qilingan fayllar faqat /protected/ orqali (ruxsat tekshiriladi)
+    location ~ ^/media/(qr_downloads|exports)/ {
+        deny all;
+    }
+
+    # Himoyalangan yuklab olishlar: faqat Django X-Accel-Redirect orqali
+    location /protected/ {
+        internal;
+        alias /var/www/qr-mahalla/media/;
+    }
+
     location / {
         include proxy_params;
         proxy_pass http://unix:/var/www/qr-mahalla/qr-mahalla.sock;
@@ -139,6 +231,14 @@ sudo systemctl restart nginx
 echo "▶️  Starting services..."
 sudo systemctl start qr-mahalla
 sudo systemctl enable qr-mahalla
+sudo systemctl start qr-mahalla-qrjobs
+sudo systemctl enable qr-mahalla-qrjobs
+sudo systemctl start qr-mahalla-sms
+sudo systemctl enable qr-mahalla-sms
+sudo systemctl start qr-mahalla-digests
+sudo systemctl enable qr-mahalla-digests
+sudo systemctl start qr-mahalla-exports
+sudo systemctl enable qr-mahalla-exports
 sudo systemctl restart nginx
 sudo systemctl enable nginx
 
@@ -154,7 +254,7 @@ echo ""
 echo "📝 Next steps:"
 echo "1. Edit /var/www/qr-mahalla/.env file with your settings"
 echo "2. Update Nginx config: sudo nano /etc/nginx/sites-available/qr-mahalla"
-echo "3. Restart services: sudo systemctl restart qr-mahalla nginx"
+echo "3. Restart services: sudo systemctl restart qr-mahalla qr-mahalla-qrjobs qr-mahalla-sms qr-mahalla-digests qr-mahalla-exports nginx"
 echo ""
 echo "🔒 For SSL certificate (recommended):"
 echo "   sudo apt install certbot python3-certbot-nginx"
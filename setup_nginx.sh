@@ -43,6 +43,17 @@ server {
         alias $PROJECT_DIR/media/;
     }
 
+    # Generatsiya qilingan fayllar faqat /protected/ orqali (ruxsat tekshiriladi)
+    location ~ ^/media/(qr_downloads|exports)/ {
+        deny all;
+    }
+
+    # Himoyalangan yuklab olishlar: faqat Django X-Accel-Redirect orqali
+    location /protected/ {
+        internal;
+        alias $PROJECT_DIR/media/;
+    }
+
     location / {
         proxy_pass http://127.0.0.1:8000;
         proxy_set_header Host \$host;